@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import logging
+import os
 import secrets
 from collections.abc import Iterable
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Any
 
 from aiogram import Bot
@@ -20,10 +23,11 @@ from sqlalchemy.orm import Session
 
 from app.bot import dp
 from app.config import get_settings
-from app.core.assets import ASSET_CACHE
+from app.core.assets import ASSET_CACHE, warm_start
+from app.core.assets.watch import AssetSync, AssetWatcher
 from app.core.telemetry import TelemetryEvent
 from app.db.models import Event, User
-from app.db.session import get_session
+from app.db.session import SessionLocal, get_session
 
 ALLOWED_UPDATES = [
     "message",
@@ -32,6 +36,8 @@ ALLOWED_UPDATES = [
     "pre_checkout_query",
 ]
 
+log = logging.getLogger(__name__)
+
 router = APIRouter()
 settings = get_settings()
 
@@ -159,6 +165,20 @@ async def admin_broadcast(
     return {"sent": sent}
 
 
+def _warm_assets() -> None:
+    # Workers forked by the preload server inherit the master's index.
+    if not ASSET_CACHE:
+        try:
+            with SessionLocal() as session:
+                warm_start(session)
+        except Exception as exc:
+            log.warning("Asset warm start failed: %s", exc)
+    if os.environ.get("ASSETS_WATCH", "").lower() in {"1", "true", "yes"}:
+        atlas = os.environ.get("ASSET_ATLAS", "").lower() in {"1", "true", "yes"}
+        # One process per assets tree ingests, the others follow the DB.
+        AssetSync(AssetWatcher(Path("assets"), SessionLocal, atlas=atlas)).start()
+
+
 def create_app() -> FastAPI:
     app = FastAPI()
     _setup_observability(app)
@@ -167,6 +187,7 @@ def create_app() -> FastAPI:
 
     @app.on_event("startup")
     async def on_startup() -> None:
+        _warm_assets()
         if bot is not None:
             webhook_url = settings.telegram_webhook_url
             if webhook_url:
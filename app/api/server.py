@@ -0,0 +1,174 @@
+"""Pre-fork preload server.
+
+``python -m app.api.server`` loads everything a worker would otherwise load
+lazily in the master process: plugins, the ``ASSET_CACHE`` index from the
+database and the decoded card images of every pyramid level that compose
+uses.  It then freezes the garbage collector, so collections in the workers
+do not touch the preloaded objects, binds the listening socket and forks
+uvicorn workers.  The preloaded memory is shared copy-on-write and workers
+serve their first request without warming up.  Dead workers are respawned.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from pathlib import Path
+from types import FrameType
+
+import uvicorn
+
+from app.api.main import app
+from app.core.assets import ASSET_CACHE, AssetValidationError, get_deck, warm_start
+from app.core.assets.loader import ATLAS_MAX_EDGE
+from app.core.compose import IMAGE_CACHE
+from app.core.plugins import available, load
+from app.db.session import SessionLocal, engine
+
+log = logging.getLogger(__name__)
+
+# Minimum lifetime of a worker before it is respawned without delay.
+_RESPAWN_BACKOFF = 1.0
+
+
+def preload(root: Path = Path("assets"), *, max_edge: int = ATLAS_MAX_EDGE) -> int:
+    """Import plugins, load deck index and card images into this process.
+
+    Images of pyramid levels whose cards fit ``max_edge`` are decoded into
+    the shared image cache.  The database pool is disposed afterwards so no
+    connection is inherited by forked workers.
+
+    Returns:
+        Number of images preloaded.
+    """
+
+    for plugin_id in available():
+        load(plugin_id)
+    try:
+        with SessionLocal() as session:
+            warm_start(session, root)
+    except Exception as exc:
+        log.warning("Asset warm start failed: %s", exc)
+    finally:
+        engine.dispose()
+    images = 0
+    for deck_id in list(ASSET_CACHE):
+        try:
+            deck = get_deck(deck_id)
+            deck_dir = Path(deck["path"])
+            for level in deck["pyramid"]:
+                if max(level["size"]) > max_edge:
+                    continue
+                for name in deck["index"].files:
+                    IMAGE_CACHE.get(deck_dir / level["dir"] / name)
+                    images += 1
+        except (AssetValidationError, OSError) as exc:
+            log.warning("Skipping preload of deck %s: %s", deck_id, exc)
+    log.info(
+        "Preloaded %d decks, %d images (%d bytes decoded)",
+        len(ASSET_CACHE),
+        images,
+        IMAGE_CACHE.nbytes,
+    )
+    return images
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _spawn(sock: socket.socket, config: uvicorn.Config) -> int:
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - runs in the forked worker
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            uvicorn.Server(config).run(sockets=[sock])
+        except BaseException:
+            log.exception("Worker %d crashed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def _exit_reason(status: int) -> str:
+    """Describe a raw ``os.wait`` status."""
+
+    code = os.waitstatus_to_exitcode(status)
+    if code < 0:
+        return f"was killed by {signal.Signals(-code).name}"
+    return f"exited with code {code}"
+
+
+def serve(host: str, port: int, workers: int) -> None:
+    """Preload, then run ``workers`` forked uvicorn workers until signalled."""
+
+    preload()
+    gc.collect()
+    gc.freeze()
+    sock = _bind(host, port)
+    config = uvicorn.Config(app, lifespan="on")
+    children: dict[int, float] = {}
+    stopping = False
+
+    def stop(signum: int, frame: FrameType | None) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    previous = {
+        signum: signal.signal(signum, stop)
+        for signum in (signal.SIGTERM, signal.SIGINT)
+    }
+    for _ in range(workers):
+        children[_spawn(sock, config)] = time.monotonic()
+    log.info("Serving on %s:%d with %d preloaded workers", host, port, workers)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if stopping or started is None:
+            continue
+        log.warning("Worker %d %s, respawning", pid, _exit_reason(status))
+        if time.monotonic() - started < _RESPAWN_BACKOFF:
+            time.sleep(_RESPAWN_BACKOFF)
+        children[_spawn(sock, config)] = time.monotonic()
+    sock.close()
+    for signum, handler in previous.items():
+        signal.signal(signum, handler)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("WEB_CONCURRENCY") or 0) or os.cpu_count() or 1,
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI utility
+    main()
@@ -1,5 +1,23 @@
 from __future__ import annotations
 
-from .loader import ASSET_CACHE, AssetValidationError, load_assets
+from .cache import AssetCache
+from .index import DeckIndex
+from .loader import (
+    ASSET_CACHE,
+    AssetValidationError,
+    IngestReport,
+    get_deck,
+    load_assets,
+    warm_start,
+)
 
-__all__ = ["load_assets", "ASSET_CACHE", "AssetValidationError"]
+__all__ = [
+    "AssetCache",
+    "DeckIndex",
+    "load_assets",
+    "ASSET_CACHE",
+    "AssetValidationError",
+    "IngestReport",
+    "get_deck",
+    "warm_start",
+]
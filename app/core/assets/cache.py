@@ -0,0 +1,84 @@
+"""Copy-on-write index of loaded decks.
+
+:data:`~app.core.assets.loader.ASSET_CACHE` is read by every ``prepare`` and
+``compose`` call while ingest, warm start and the hot-reload watcher publish
+new decks.  Writers never mutate the published mapping: they build a new
+snapshot and swap the reference, which is atomic, so readers always see
+either the previous or the next complete state.  Deck entries are shared
+between snapshots and must be treated as read-only.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import ItemsView, Iterable, Iterator, KeysView, Mapping, ValuesView
+from types import MappingProxyType
+from typing import Any
+
+
+class AssetCache(Mapping[str, dict[str, Any]]):
+    """Deck id to deck entry mapping replaced atomically on every change."""
+
+    def __init__(self) -> None:
+        self._snapshot: Mapping[str, dict[str, Any]] = MappingProxyType({})
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Mapping[str, dict[str, Any]]:
+        """Return the current immutable snapshot."""
+
+        return self._snapshot
+
+    def __getitem__(self, deck_id: str) -> dict[str, Any]:
+        return self._snapshot[deck_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._snapshot)
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def keys(self) -> KeysView[str]:
+        return self._snapshot.keys()
+
+    def items(self) -> ItemsView[str, dict[str, Any]]:
+        return self._snapshot.items()
+
+    def values(self) -> ValuesView[dict[str, Any]]:
+        return self._snapshot.values()
+
+    def update(
+        self,
+        entries: Mapping[str, dict[str, Any]] | None = None,
+        *,
+        remove: Iterable[str] = (),
+    ) -> None:
+        """Publish ``entries`` and drop ``remove`` in a single swap."""
+
+        with self._lock:
+            new = dict(self._snapshot)
+            new.update(entries or {})
+            for deck_id in remove:
+                new.pop(deck_id, None)
+            self._snapshot = MappingProxyType(new)
+
+    def replace(self, entries: Mapping[str, dict[str, Any]]) -> None:
+        """Publish ``entries`` as the whole index."""
+
+        with self._lock:
+            self._snapshot = MappingProxyType(dict(entries))
+
+    def __setitem__(self, deck_id: str, entry: dict[str, Any]) -> None:
+        self.update({deck_id: entry})
+
+    def __delitem__(self, deck_id: str) -> None:
+        with self._lock:
+            if deck_id not in self._snapshot:
+                raise KeyError(deck_id)
+            new = dict(self._snapshot)
+            del new[deck_id]
+            self._snapshot = MappingProxyType(new)
+
+    def clear(self) -> None:
+        """Drop all decks."""
+
+        self.replace({})
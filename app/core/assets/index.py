@@ -0,0 +1,65 @@
+"""Compiled per-deck lookup tables.
+
+``prepare`` of the card experts only needs the item keys in manifest order
+and, for each drawn key, its file, display names and whether it may be
+reversed.  :class:`DeckIndex` is built once at ingest and stored in
+``ASSET_CACHE[deck_id]["index"]`` so a request does O(spread) lookups
+instead of rebuilding lists and dicts over the whole deck.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+
+class DeckIndex:
+    """Read-only, tuple-backed view of a deck manifest."""
+
+    __slots__ = (
+        "deck_id",
+        "keys",
+        "positions",
+        "files",
+        "display",
+        "can_reverse",
+        "allow_reversed",
+    )
+
+    def __init__(
+        self,
+        deck_id: str,
+        keys: tuple[str, ...],
+        files: tuple[str, ...],
+        display: tuple[dict[str, str], ...],
+        can_reverse: tuple[bool, ...],
+        allow_reversed: bool,
+    ) -> None:
+        self.deck_id = deck_id
+        self.keys = keys
+        self.positions = {key: i for i, key in enumerate(keys)}
+        self.files = files
+        self.display = display
+        self.can_reverse = can_reverse
+        self.allow_reversed = allow_reversed
+
+    @classmethod
+    def from_manifest(
+        cls, deck_id: str, manifest: dict[str, Any], items_key: str
+    ) -> DeckIndex:
+        """Compile the ``items_key`` list of a validated deck manifest."""
+
+        items = manifest[items_key]
+        return cls(
+            deck_id,
+            tuple(item["key"] for item in items),
+            tuple(item["file"] for item in items),
+            tuple(item["display"] for item in items),
+            tuple(bool(item.get("can_reverse", True)) for item in items),
+            bool(manifest.get("image", {}).get("allow_reversed", False)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+__all__ = ["DeckIndex"]
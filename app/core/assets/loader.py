@@ -1,20 +1,32 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, Collection, Iterable
 
 from PIL import Image
 from sqlalchemy.orm import Session
 
+from app.core.compose.atlas import atlas_is_current, write_atlas
 from app.db.models import Deck
 
+from .cache import AssetCache
+from .index import DeckIndex
+
+log = logging.getLogger(__name__)
+
 
 class AssetValidationError(Exception):
     """Raised when asset validation fails."""
 
 
-def _check_image(path: Path, ratio: float) -> None:
+def _check_image(path: Path, ratio: float) -> tuple[int, int]:
     with Image.open(path) as img:
         width, height = img.size
     if width <= 0 or height <= 0:
@@ -23,16 +35,330 @@ def _check_image(path: Path, ratio: float) -> None:
         raise AssetValidationError(
             "Bad aspect ratio for " f"{path}: {width}x{height} expected {ratio:.2f}"
         )
+    return width, height
 
 
-def _make_thumb(src: Path, dest: Path, size: tuple[int, int]) -> None:
+def _make_thumb(src: Path, dest: Path, size: tuple[int, int]) -> tuple[int, int]:
     dest.parent.mkdir(parents=True, exist_ok=True)
     with Image.open(src) as img:
         img.thumbnail(size)
         img.save(dest)
+        return img.size
+
+
+# Downscaled pyramid levels generated at ingest: directory name -> max edge.
+# The original images form the implicit ``full`` level.
+PYRAMID_LEVELS: dict[str, int] = {"medium": 512}
+_LEVEL_NAMES = {"thumbs": "thumb"}
+# Levels with larger cards are not packed into atlases.
+ATLAS_MAX_EDGE = 1024
+# Deck files compose reads besides the items; they are hashed into the deck
+# content hash, and so into collage cache keys, but not processed.
+COMPOSE_EXTRAS = ("frame.png",)
+
+# Bump when the derived files written at ingest change so decks are rebuilt.
+INGEST_VERSION = 1
+_HASH_CHUNK = 1 << 20
+
+ASSET_CACHE = AssetCache()
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _process_image(
+    src: Path,
+    deck_dir: Path,
+    ratio: float,
+    thumb_size: tuple[int, int],
+    levels: dict[str, int],
+) -> dict[str, Any]:
+    """Validate ``src`` and write its thumbnail and pyramid levels."""
+
+    size = _check_image(src, ratio)
+    outputs = {
+        "thumbs": list(_make_thumb(src, deck_dir / "thumbs" / src.name, thumb_size))
+    }
+    for level, edge in levels.items():
+        if max(size) > edge:
+            outputs[level] = list(
+                _make_thumb(src, deck_dir / level / src.name, (edge, edge))
+            )
+    return {"dims": list(size), "levels": outputs}
+
+
+def _outputs_exist(deck_dir: Path, name: str, entry: dict[str, Any]) -> bool:
+    return all((deck_dir / level / name).exists() for level in entry["levels"])
+
+
+def _is_unchanged(deck_dir: Path, path: Path, entry: dict[str, Any]) -> bool:
+    """Return whether ``path`` matches ``entry`` by size and mtime."""
+
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return False
+    return (entry["size"], entry["mtime_ns"]) == (
+        stat.st_size,
+        stat.st_mtime_ns,
+    ) and _outputs_exist(deck_dir, path.name, entry)
+
+
+def _items_key(manifest: dict[str, Any]) -> str | None:
+    for key in ("cards", "runes", "signs"):
+        if key in manifest:
+            return key
+    return None
+
+
+def _ratio(manifest: dict[str, Any]) -> float:
+    ar_w, ar_h = [int(x) for x in str(manifest["image"]["aspect_ratio"]).split(":")]
+    return ar_w / ar_h
+
+
+def _read_manifest(
+    deck_dir: Path, deck_type: str
+) -> tuple[dict[str, Any], bytes, str, str, float, Path]:
+    """Load and validate the deck manifest without touching images.
+
+    Returns:
+        Parsed manifest, its raw bytes, deck id, items key, aspect ratio and
+        path of the back image.
+    """
+
+    manifest_path = deck_dir / "deck.json"
+    id_key = "deck_id"
+    if not manifest_path.exists():
+        manifest_path = deck_dir / "set.json"
+        id_key = "set_id"
+    if not manifest_path.exists():
+        raise AssetValidationError(f"Missing manifest in {deck_dir}")
+    raw = manifest_path.read_bytes()
+    manifest = json.loads(raw.decode("utf-8"))
+    if id_key not in manifest:
+        raise AssetValidationError(f"Missing {id_key} in {manifest_path}")
+    deck_id = manifest[id_key]
+    if manifest.get("type") != deck_type:
+        raise AssetValidationError(
+            "Type mismatch for " f"{deck_id}: {manifest.get('type')} != {deck_type}"
+        )
+    name = manifest.get("name")
+    if not isinstance(name, dict) or not name:
+        raise AssetValidationError(f"Missing name in {manifest_path}")
+    image_conf = manifest.get("image", {})
+    aspect = image_conf.get("aspect_ratio")
+    if aspect is None:
+        raise AssetValidationError(f"Missing image.aspect_ratio in {manifest_path}")
+    ratio = _ratio(manifest)
+    back_path = deck_dir / image_conf.get("default_back", "back.png")
+    if not back_path.exists():
+        raise AssetValidationError(f"Missing back image for {deck_id}")
+    items_key = _items_key(manifest)
+    if items_key is None:
+        raise AssetValidationError(f"No items list in {manifest_path}")
+    items = manifest.get(items_key)
+    if not isinstance(items, list) or not items:
+        raise AssetValidationError(f"No {items_key} in {manifest_path}")
+    for item in items:
+        for key in ("key", "display", "file"):
+            if key not in item:
+                raise AssetValidationError(
+                    f"Missing '{key}' for item in {manifest_path}"
+                )
+    return manifest, raw, deck_id, items_key, ratio, back_path
+
+
+@dataclass
+class IngestReport:
+    """Outcome of ingesting one deck."""
+
+    deck_id: str
+    images: int
+    processed: int
+    # Time spent on the deck, summed over ingest workers.
+    seconds: float
+
+
+@dataclass
+class _DeckPlan:
+    deck_type: str
+    deck_id: str
+    deck_dir: Path
+    manifest: dict[str, Any]
+    config_hash: str
+    row: Deck | None
+    previous: dict[str, Any]
+    seconds: float = 0.0
+    files: dict[str, dict[str, Any]] = field(default_factory=dict)
+    extras: dict[str, dict[str, Any]] = field(default_factory=dict)
+    processed: int = 0
+    content: dict[str, Any] = field(default_factory=dict)
+
+
+# (deck index, manifest path, deck dir, image, levels, ratio, thumb size, old)
+_ImageTask = tuple[
+    int,
+    str,
+    Path,
+    Path,
+    dict[str, int],
+    float,
+    tuple[int, int],
+    dict[str, Any] | None,
+]
+
+
+def _ingest_image(
+    deck_dir: Path,
+    path: Path,
+    levels: dict[str, int],
+    ratio: float,
+    thumb_size: tuple[int, int],
+    old: dict[str, Any] | None,
+) -> tuple[dict[str, Any], bool, float]:
+    """Process ``path`` unless its content is unchanged.
+
+    Runs in ingest worker processes for images whose size or mtime differ
+    from the previous manifest entry ``old``.  A touched file with the same
+    SHA-256 and derived files still on disk keeps its entry.
+
+    Returns:
+        Manifest entry, whether the image was processed and the time spent.
+    """
+
+    start = time.perf_counter()
+    if not path.exists():
+        raise AssetValidationError(f"Missing image {path}")
+    stat = path.stat()
+    state = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if old is not None and not _outputs_exist(deck_dir, path.name, old):
+        old = None
+    digest = _hash_file(path)
+    if old is not None and old["sha256"] == digest:
+        return {**old, **state}, False, time.perf_counter() - start
+    info = _process_image(path, deck_dir, ratio, thumb_size, levels)
+    entry = {**state, "sha256": digest, **info}
+    return entry, True, time.perf_counter() - start
+
+
+def _ingest_task(task: _ImageTask) -> tuple[dict[str, Any], bool, float]:
+    return _ingest_image(*task[2:])
+
+
+def _run_tasks(
+    tasks: list[_ImageTask], workers: int
+) -> list[tuple[dict[str, Any], bool, float]]:
+    """Run image tasks in a process pool, or in-process for ``workers=1``."""
+
+    if workers > 1 and len(tasks) > 1:
+        workers = min(workers, len(tasks))
+        try:
+            pool = ProcessPoolExecutor(workers)
+        except (OSError, NotImplementedError) as exc:
+            log.warning("Process pool unavailable, ingesting serially: %s", exc)
+        else:
+            chunksize = max(1, len(tasks) // (workers * 4))
+            with pool:
+                return list(pool.map(_ingest_task, tasks, chunksize=chunksize))
+    return [_ingest_task(task) for task in tasks]
+
+
+def _build_pyramid(
+    files: dict[str, dict[str, Any]], items_key: str, items: list[dict[str, Any]]
+) -> list[dict[str, Any]]:
+    level_sizes: dict[str, list[int]] = {}
+    full_size: list[int] | None = None
+    for item in items:
+        entry = files[f"{items_key}/{item['file']}"]
+        full_size = full_size or entry["dims"]
+        level_sizes.update(entry["levels"])
+    pyramid: list[dict[str, Any]] = [
+        {
+            "level": _LEVEL_NAMES.get(level, level),
+            "dir": level,
+            "size": list(level_size),
+        }
+        for level, level_size in sorted(level_sizes.items(), key=lambda kv: kv[1][0])
+        if full_size and level_size[0] < full_size[0]
+    ]
+    if full_size:
+        pyramid.append({"level": "full", "dir": items_key, "size": list(full_size)})
+    return pyramid
 
 
-ASSET_CACHE: dict[str, dict[str, Any]] = {}
+def _extra_files(
+    deck_dir: Path, previous: dict[str, dict[str, Any]]
+) -> dict[str, dict[str, Any]]:
+    """Hash the non-item files compose reads, reusing unchanged entries."""
+
+    extras: dict[str, dict[str, Any]] = {}
+    for name in COMPOSE_EXTRAS:
+        try:
+            stat = (deck_dir / name).stat()
+        except FileNotFoundError:
+            continue
+        state = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        old = previous.get(name)
+        if old is not None and (old["size"], old["mtime_ns"]) == tuple(state.values()):
+            extras[name] = old
+        else:
+            extras[name] = {**state, "sha256": _hash_file(deck_dir / name)}
+    return extras
+
+
+def _content_hash(
+    config_hash: str,
+    files: dict[str, dict[str, Any]],
+    extras: dict[str, dict[str, Any]] | None = None,
+) -> str:
+    payload: list[Any] = [
+        config_hash,
+        sorted((k, v["sha256"]) for k, v in files.items()),
+    ]
+    if extras:
+        payload.append(sorted((k, v["sha256"]) for k, v in extras.items()))
+    return hashlib.sha256(json.dumps(payload).encode("utf-8")).hexdigest()
+
+
+def _cache_entry(
+    deck_id: str,
+    db_id: int,
+    deck_type: str,
+    manifest: dict[str, Any],
+    content: dict[str, Any],
+    deck_dir: Path,
+    *,
+    validated: bool,
+) -> dict[str, Any]:
+    items_key = _items_key(manifest) or "cards"
+    return {
+        "db_id": db_id,
+        "type": deck_type,
+        "name": manifest["name"],
+        "config": manifest,
+        "pyramid": _build_pyramid(content["files"], items_key, manifest[items_key]),
+        "index": DeckIndex.from_manifest(deck_id, manifest, items_key),
+        "content_hash": content["hash"],
+        "path": str(deck_dir),
+        "manifest": content,
+        "validated": validated,
+    }
+
+
+def _pack_atlases(
+    deck_dir: Path, pyramid: list[dict[str, Any]], names: list[str]
+) -> None:
+    for level in pyramid:
+        if max(level["size"]) > ATLAS_MAX_EDGE:
+            continue
+        level_dir = deck_dir / level["dir"]
+        if not atlas_is_current(level_dir, names):
+            write_atlas(level_dir, names)
 
 
 def load_assets(
@@ -40,78 +366,286 @@ def load_assets(
     session: Session,
     *,
     thumb_size: tuple[int, int] = (256, 256),
-) -> None:
-    """Validate assets and populate deck index in DB and memory cache."""
+    levels: dict[str, int] | None = None,
+    workers: int = 1,
+    decks: Collection[Path] | None = None,
+    atlas: bool = False,
+) -> list[IngestReport]:
+    """Validate assets and populate deck index in DB and memory cache.
 
+    Besides the thumbnail, a downscaled copy of every card is written for each
+    pyramid level smaller than the original art.  The available levels are
+    recorded in ``ASSET_CACHE[deck_id]["pyramid"]`` ordered from smallest to
+    largest so that compose can pick the cheapest sufficient resolution.
+
+    Ingest is incremental: a content manifest with the size, mtime and
+    SHA-256 of every image is stored in ``Deck.manifest_json`` and images that
+    did not change since the previous run are neither validated nor
+    resampled again.  Deck rows are upserted by ``deck_id``.  The manifest
+    hash is exposed as ``ASSET_CACHE[deck_id]["content_hash"]``.
+
+    All manifests are read first, then image work of every deck is spread
+    over ``workers`` processes and finally all deck rows are written in a
+    single transaction, so a validation error leaves the database untouched.
+    The new entries are published to ``ASSET_CACHE`` in one atomic swap.
+    ``decks`` restricts ingest to the given deck directories.  With
+    ``atlas`` every pyramid level up to ``ATLAS_MAX_EDGE`` is also packed
+    into a memory-mappable atlas used by the image cache.
+
+    Returns:
+        Per-deck ingest reports.
+    """
+
+    levels = PYRAMID_LEVELS if levels is None else levels
+    params = json.dumps(
+        [INGEST_VERSION, list(thumb_size), sorted(levels.items())]
+    ).encode("utf-8")
+    rows = {
+        row.deck_id: row
+        for row in session.query(Deck).filter(Deck.deck_id.is_not(None))
+    }
+
+    plans: list[_DeckPlan] = []
+    tasks: list[_ImageTask] = []
     for deck_type_dir in root.iterdir():
         if not deck_type_dir.is_dir():
             continue
         deck_type = deck_type_dir.name
         for deck_dir in deck_type_dir.iterdir():
-            if not deck_dir.is_dir():
+            if not deck_dir.is_dir() or (decks is not None and deck_dir not in decks):
                 continue
-            manifest_path = deck_dir / "deck.json"
-            id_key = "deck_id"
-            if not manifest_path.exists():
-                manifest_path = deck_dir / "set.json"
-                id_key = "set_id"
-            if not manifest_path.exists():
-                raise AssetValidationError(f"Missing manifest in {deck_dir}")
-            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
-            if id_key not in manifest:
-                raise AssetValidationError(f"Missing {id_key} in {manifest_path}")
-            deck_id = manifest[id_key]
-            if manifest.get("type") != deck_type:
-                raise AssetValidationError(
-                    "Type mismatch for "
-                    f"{deck_id}: {manifest.get('type')} != {deck_type}"
+            start = time.perf_counter()
+            manifest, raw, deck_id, items_key, ratio, back_path = _read_manifest(
+                deck_dir, deck_type
+            )
+            config_hash = hashlib.sha256(params + raw).hexdigest()
+            row = rows.get(deck_id)
+            previous = (row.manifest_json if row is not None else None) or {}
+            previous_files = (
+                previous.get("files", {})
+                if previous.get("config_hash") == config_hash
+                else {}
+            )
+            sources = [
+                (
+                    f"{items_key}/{item['file']}",
+                    deck_dir / items_key / item["file"],
+                    levels,
                 )
-            name = manifest.get("name")
-            if not isinstance(name, dict) or not name:
-                raise AssetValidationError(f"Missing name in {manifest_path}")
-            image_conf = manifest.get("image", {})
-            aspect = image_conf.get("aspect_ratio")
-            if aspect is None:
-                raise AssetValidationError(
-                    f"Missing image.aspect_ratio in {manifest_path}"
+                for item in manifest[items_key]
+            ]
+            sources.append((back_path.relative_to(deck_dir).as_posix(), back_path, {}))
+            plan = _DeckPlan(
+                deck_type, deck_id, deck_dir, manifest, config_hash, row, previous
+            )
+            plan.extras = _extra_files(deck_dir, previous.get("extras", {}))
+            for rel, path, source_levels in sources:
+                old = previous_files.get(rel)
+                # Unchanged images are settled here to spare the worker pool.
+                if old is not None and _is_unchanged(deck_dir, path, old):
+                    plan.files[rel] = old
+                    continue
+                tasks.append(
+                    (
+                        len(plans),
+                        rel,
+                        deck_dir,
+                        path,
+                        source_levels,
+                        ratio,
+                        thumb_size,
+                        old,
+                    )
                 )
-            ar_w, ar_h = [int(x) for x in str(aspect).split(":")]
-            ratio = ar_w / ar_h
-            back_path = deck_dir / image_conf.get("default_back", "back.png")
-            if not back_path.exists():
-                raise AssetValidationError(f"Missing back image for {deck_id}")
-            _check_image(back_path, ratio)
-            if "cards" in manifest:
-                items_key = "cards"
-            elif "runes" in manifest:
-                items_key = "runes"
-            elif "signs" in manifest:
-                items_key = "signs"
-            else:
-                raise AssetValidationError(f"No items list in {manifest_path}")
-            items = manifest.get(items_key)
-            if not isinstance(items, list) or not items:
-                raise AssetValidationError(f"No {items_key} in {manifest_path}")
-            items_dir = deck_dir / items_key
-            for item in items:
-                for key in ("key", "display", "file"):
-                    if key not in item:
-                        raise AssetValidationError(
-                            f"Missing '{key}' for item in {manifest_path}"
-                        )
-                file_name = item["file"]
-                img_path = items_dir / file_name
-                if not img_path.exists():
-                    raise AssetValidationError(f"Missing image {img_path}")
-                _check_image(img_path, ratio)
-                _make_thumb(img_path, deck_dir / "thumbs" / file_name, thumb_size)
-            _make_thumb(back_path, deck_dir / "thumbs" / back_path.name, thumb_size)
-            deck_row = Deck(type=deck_type, name_json=name, config_json=manifest)
-            session.add(deck_row)
-            session.commit()
-            ASSET_CACHE[deck_id] = {
-                "db_id": deck_row.id,
-                "type": deck_type,
-                "name": name,
-                "config": manifest,
-            }
+            plan.seconds = time.perf_counter() - start
+            plans.append(plan)
+
+    for task, (entry, processed, seconds) in zip(
+        tasks, _run_tasks(tasks, workers), strict=True
+    ):
+        plan = plans[task[0]]
+        plan.files[task[1]] = entry
+        plan.processed += processed
+        plan.seconds += seconds
+
+    if atlas:
+        for plan in plans:
+            items_key = _items_key(plan.manifest) or "cards"
+            items = plan.manifest[items_key]
+            _pack_atlases(
+                plan.deck_dir,
+                _build_pyramid(plan.files, items_key, items),
+                [item["file"] for item in items],
+            )
+
+    reports: list[IngestReport] = []
+    deck_rows: list[Deck] = []
+    for plan in plans:
+        plan.content = {
+            "config_hash": plan.config_hash,
+            "hash": _content_hash(plan.config_hash, plan.files, plan.extras),
+            "dir": plan.deck_dir.relative_to(root).as_posix(),
+            "thumb_size": list(thumb_size),
+            "levels": levels,
+            "files": plan.files,
+            "extras": plan.extras,
+        }
+        content = plan.content
+        name = plan.manifest["name"]
+        row = plan.row
+        if row is None:
+            row = Deck(
+                deck_id=plan.deck_id,
+                type=plan.deck_type,
+                name_json=name,
+                config_json=plan.manifest,
+                manifest_json=content,
+            )
+            session.add(row)
+        elif plan.previous != content:
+            row.type = plan.deck_type
+            row.name_json = name
+            row.config_json = plan.manifest
+            row.manifest_json = content
+        deck_rows.append(row)
+        reports.append(
+            IngestReport(plan.deck_id, len(plan.files), plan.processed, plan.seconds)
+        )
+    if session.new or session.dirty:
+        session.commit()
+
+    ASSET_CACHE.update(
+        {
+            plan.deck_id: _cache_entry(
+                plan.deck_id,
+                row.id,
+                plan.deck_type,
+                plan.manifest,
+                plan.content,
+                plan.deck_dir,
+                validated=True,
+            )
+            for plan, row in zip(plans, deck_rows, strict=True)
+        }
+    )
+    for report in reports:
+        log.info(
+            "Ingested deck %s: %d/%d images processed in %.3fs",
+            report.deck_id,
+            report.processed,
+            report.images,
+            report.seconds,
+        )
+    return reports
+
+
+_VALIDATE_LOCK = threading.Lock()
+
+
+def warm_start(
+    session: Session,
+    root: Path = Path("assets"),
+    *,
+    deck_ids: Iterable[str] | None = None,
+) -> int:
+    """Rebuild ``ASSET_CACHE`` from the ``decks`` table of a previous ingest.
+
+    No image file is opened: entries are marked unvalidated and checked
+    against their content manifest by :func:`get_deck` on first use.
+
+    Args:
+        session: Database session.
+        root: Assets root the stored deck directories are relative to.
+        deck_ids: Only reload these decks; all by default.
+
+    Returns:
+        Number of decks loaded.
+    """
+
+    entries: dict[str, dict[str, Any]] = {}
+    query = session.query(Deck).filter(Deck.deck_id.is_not(None))
+    if deck_ids is not None:
+        query = query.filter(Deck.deck_id.in_(list(deck_ids)))
+    for row in query:
+        content = row.manifest_json
+        if not content or not row.deck_id:
+            continue
+        deck_dir = root / content.get("dir", f"{row.type}/{row.deck_id}")
+        entries[row.deck_id] = _cache_entry(
+            row.deck_id,
+            row.id,
+            row.type,
+            row.config_json,
+            content,
+            deck_dir,
+            validated=False,
+        )
+    ASSET_CACHE.update(entries)
+    log.info("Warm-started %d decks from the database", len(entries))
+    return len(entries)
+
+
+def _validate_entry(deck_id: str, entry: dict[str, Any]) -> dict[str, Any]:
+    """Re-check a warm-started entry against the files on disk.
+
+    Images that changed since the recorded ingest are validated and their
+    derived files regenerated.  Returns the validated entry; the database
+    manifest is refreshed by the next :func:`load_assets` run.
+    """
+
+    deck_dir = Path(entry["path"])
+    content = entry["manifest"]
+    manifest = entry["config"]
+    items_key = _items_key(manifest) or "cards"
+    ratio = _ratio(manifest)
+    thumb_size = tuple(content.get("thumb_size", (256, 256)))
+    levels = content.get("levels", PYRAMID_LEVELS)
+    files = dict(content["files"])
+    changed = False
+    for rel, old in content["files"].items():
+        path = deck_dir / rel
+        if _is_unchanged(deck_dir, path, old):
+            continue
+        source_levels = levels if rel.startswith(f"{items_key}/") else {}
+        files[rel], _, _ = _ingest_image(
+            deck_dir, path, source_levels, ratio, (thumb_size[0], thumb_size[1]), old
+        )
+        changed = True
+    extras = _extra_files(deck_dir, content.get("extras", {}))
+    if not changed and extras == content.get("extras", {}):
+        return {**entry, "validated": True}
+    content = {
+        **content,
+        "hash": _content_hash(content["config_hash"], files, extras),
+        "files": files,
+        "extras": extras,
+    }
+    log.info("Revalidated deck assets in %s", deck_dir)
+    return _cache_entry(
+        deck_id,
+        entry["db_id"],
+        entry["type"],
+        manifest,
+        content,
+        deck_dir,
+        validated=True,
+    )
+
+
+def get_deck(deck_id: str) -> dict[str, Any]:
+    """Return ``ASSET_CACHE`` entry of ``deck_id``, validating it on first use.
+
+    Raises:
+        KeyError: If the deck is unknown.
+        AssetValidationError: If a changed image fails validation.
+    """
+
+    entry = ASSET_CACHE[deck_id]
+    if entry.get("validated", True):
+        return entry
+    with _VALIDATE_LOCK:
+        entry = ASSET_CACHE[deck_id]
+        if not entry.get("validated", True):
+            entry = _validate_entry(deck_id, entry)
+            ASSET_CACHE[deck_id] = entry
+    return entry
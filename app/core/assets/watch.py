@@ -0,0 +1,298 @@
+"""Hot reload of the assets tree.
+
+:class:`AssetWatcher` watches the assets root, with inotify through the
+optional ``watchfiles`` package or by polling file stats, and re-ingests only
+the decks whose files changed.  :func:`~app.core.assets.loader.load_assets`
+publishes the reloaded entries with a single swap of ``ASSET_CACHE``, so
+concurrent ``prepare``/``compose`` calls see either the old or the new deck,
+never a half-loaded one.  A deck that fails validation keeps its previous
+entry.
+
+Every API worker runs an :class:`AssetSync`, but only one process per
+assets tree ingests: the one holding an exclusive lock on
+``<root>/.watch.lock`` runs the :class:`AssetWatcher`.  The others poll the
+``decks`` table and rebuild the entries whose content hash changed, so a new
+deck is ingested and upserted once and every worker still picks it up.  When
+the leader exits its lock is released and a follower takes over.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import IO, Any, Callable, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.compose.atlas import ATLAS_DIR
+
+from .loader import ASSET_CACHE, PYRAMID_LEVELS, IngestReport, load_assets, warm_start
+
+try:  # pragma: no cover - optional dependency
+    from watchfiles import watch as _watch
+except ImportError:  # pragma: no cover - optional dependency
+    _watch = None  # type: ignore[assignment]
+
+try:  # pragma: no cover - platform dependent
+    import fcntl
+except ImportError:  # pragma: no cover - platform dependent
+    fcntl = None  # type: ignore[assignment]
+
+log = logging.getLogger(__name__)
+
+# Directories written by ingest itself; changes there must not retrigger it.
+_DERIVED_DIRS = frozenset({"thumbs", ATLAS_DIR, *PYRAMID_LEVELS})
+_MANIFESTS = ("deck.json", "set.json")
+
+
+class AssetWatcher:
+    """Re-ingest decks under ``root`` whenever their files change."""
+
+    def __init__(
+        self,
+        root: Path | str,
+        session_factory: Callable[[], Session],
+        *,
+        interval: float = 1.0,
+        workers: int = 1,
+        atlas: bool = False,
+        use_inotify: bool = True,
+    ) -> None:
+        self.root = Path(root)
+        self.session_factory = session_factory
+        self.interval = interval
+        self.workers = workers
+        self.atlas = atlas
+        self.use_inotify = use_inotify and _watch is not None
+        self._state: dict[Path, tuple[int, int]] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def deck_dirs(self, paths: Iterable[Path | str]) -> set[Path]:
+        """Map changed file paths to the deck directories containing them."""
+
+        root = self.root.absolute()
+        dirs: set[Path] = set()
+        for path in paths:
+            try:
+                parts = Path(path).absolute().relative_to(root).parts
+            except ValueError:
+                continue
+            if len(parts) < 2 or any(p.startswith(".") for p in parts):
+                continue
+            if len(parts) > 2 and parts[2] in _DERIVED_DIRS:
+                continue
+            dirs.add(self.root / parts[0] / parts[1])
+        return dirs
+
+    def reload(self, paths: Iterable[Path | str]) -> list[IngestReport]:
+        """Re-ingest decks touched by ``paths`` and drop deleted ones."""
+
+        dirs = self.deck_dirs(paths)
+        if not dirs:
+            return []
+        present = {d for d in dirs if any((d / m).exists() for m in _MANIFESTS)}
+        gone = {str(d) for d in dirs - present}
+        try:
+            with self.session_factory() as session:
+                reports = (
+                    load_assets(
+                        self.root,
+                        session,
+                        workers=self.workers,
+                        decks=present,
+                        atlas=self.atlas,
+                    )
+                    if present
+                    else []
+                )
+        except Exception as exc:
+            log.error("Asset reload of %s failed: %s", sorted(map(str, dirs)), exc)
+            return []
+        removed = [
+            deck_id for deck_id, entry in ASSET_CACHE.items() if entry["path"] in gone
+        ]
+        if removed:
+            ASSET_CACHE.update(remove=removed)
+            log.info("Removed decks %s", removed)
+        return reports
+
+    def scan(self) -> dict[Path, tuple[int, int]]:
+        """Return size and mtime of every source file under ``root``."""
+
+        state: dict[Path, tuple[int, int]] = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            depth = len(Path(dirpath).relative_to(self.root).parts)
+            dirnames[:] = [
+                d
+                for d in dirnames
+                if not d.startswith(".") and not (depth == 2 and d in _DERIVED_DIRS)
+            ]
+            for name in filenames:
+                path = Path(dirpath) / name
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                state[path] = (stat.st_size, stat.st_mtime_ns)
+        return state
+
+    def poll(self) -> set[Path]:
+        """Return paths created, changed or deleted since the previous poll."""
+
+        state = self.scan()
+        changed = {
+            path
+            for path in state.keys() | self._state.keys()
+            if state.get(path) != self._state.get(path)
+        }
+        self._state = state
+        return changed
+
+    def run(self) -> None:
+        """Watch until :meth:`stop` is called."""
+
+        if self.use_inotify and _watch is not None:  # pragma: no cover - inotify
+            for changes in _watch(self.root, stop_event=self._stop):
+                self.reload(path for _, path in changes)
+            return
+        self._state = self.scan()
+        while not self._stop.wait(self.interval):
+            changed = self.poll()
+            if changed:
+                self.reload(changed)
+
+    def start(self) -> None:
+        """Run the watcher in a daemon thread."""
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run, name="asset-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop watching and wait for the thread to finish."""
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def try_lock(path: Path | str) -> IO[Any] | None:
+    """Take an exclusive, non-blocking lock on ``path``.
+
+    Returns:
+        The open lock file, which holds the lock until closed, or ``None``
+        if another process holds it.
+    """
+
+    fh = open(path, "a+")
+    if fcntl is None:  # pragma: no cover - platform dependent
+        return fh
+    try:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        return None
+    return fh
+
+
+class AssetSync:
+    """Lead an :class:`AssetWatcher` or follow the leader's ingests."""
+
+    def __init__(
+        self,
+        watcher: AssetWatcher,
+        *,
+        lock_path: Path | str | None = None,
+        interval: float = 5.0,
+    ) -> None:
+        self.watcher = watcher
+        self.lock_path = Path(lock_path or watcher.root / ".watch.lock")
+        self.interval = interval
+        self._lock: IO[Any] | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def leader(self) -> bool:
+        return self._lock is not None
+
+    def follow(self) -> list[str]:
+        """Reload decks the leader re-ingested and drop deleted ones.
+
+        Returns:
+            Ids of the reloaded decks.
+        """
+
+        from app.db.models import Deck
+
+        root = self.watcher.root
+        try:
+            with self.watcher.session_factory() as session:
+                stmt = select(Deck.deck_id, Deck.manifest_json).where(
+                    Deck.deck_id.is_not(None)
+                )
+                hashes = {
+                    deck_id: (content or {}).get("hash")
+                    for deck_id, content in session.execute(stmt)
+                }
+                changed = [
+                    deck_id
+                    for deck_id, digest in hashes.items()
+                    if digest
+                    and (ASSET_CACHE.get(deck_id) or {}).get("content_hash") != digest
+                ]
+                if changed:
+                    warm_start(session, root, deck_ids=changed)
+        except Exception as exc:
+            log.error("Asset sync from the database failed: %s", exc)
+            return []
+        removed = [
+            deck_id
+            for deck_id, entry in ASSET_CACHE.items()
+            if not any((Path(entry["path"]) / m).exists() for m in _MANIFESTS)
+        ]
+        if removed:
+            ASSET_CACHE.update(remove=removed)
+            log.info("Removed decks %s", removed)
+        return changed
+
+    def run(self) -> None:
+        """Follow until the lock is free, then watch until :meth:`stop`."""
+
+        while not self._stop.is_set():
+            self._lock = try_lock(self.lock_path)
+            if self._lock is not None:
+                log.info("Watching %s for asset changes", self.watcher.root)
+                self.watcher.run()
+                return
+            self.follow()
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        """Run in a daemon thread."""
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="asset-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop, release the lock and wait for the thread to finish."""
+
+        self._stop.set()
+        self.watcher.stop()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+
+__all__ = ["AssetSync", "AssetWatcher", "try_lock"]
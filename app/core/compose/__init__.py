@@ -1,18 +1,31 @@
 from __future__ import annotations
 
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
 from enum import Enum
+from functools import cache
 from io import BytesIO
-from typing import Sequence
+from pathlib import Path
+from typing import Any, Mapping, Sequence
 
 from PIL import Image, ImageDraw, ImageFont
 
+from app.core.observability import encode_span
+
+from .collages import COLLAGE_CACHE, CollageCache, collage_key
+from .images import IMAGE_CACHE, ImageCache, load_image
+
 
 @dataclass(frozen=True)
 class CardSpec:
-    """Card image with optional caption and orientation."""
+    """Card image with optional caption and orientation.
+
+    ``image`` may be a decoded image or a path resolved through
+    :data:`IMAGE_CACHE`.
+    """
 
-    image: Image.Image
+    image: Image.Image | Path
     caption: str | None = None
     reversed: bool = False
 
@@ -26,6 +39,61 @@ class Layout(str, Enum):
     CROSS = "cross"
 
 
+# Output width each layout is rendered for; drives pyramid level selection.
+LAYOUT_TARGET_WIDTH: dict[Layout, int] = {
+    Layout.ROW: 2048,
+    Layout.GRID_3X3: 1536,
+    Layout.GRAND_TABLEAU: 2560,
+    Layout.CROSS: 1536,
+}
+
+
+def _columns(layout: Layout, count: int) -> int:
+    if layout is Layout.ROW:
+        return max(count, 1)
+    if layout is Layout.GRAND_TABLEAU:
+        return 9
+    return 3
+
+
+def pick_level(
+    pyramid: Sequence[Mapping[str, Any]],
+    layout: Layout | str,
+    count: int,
+    *,
+    spacing: int = 10,
+) -> Mapping[str, Any] | None:
+    """Pick the smallest pyramid level wide enough for ``layout``.
+
+    Args:
+        pyramid: Levels as recorded by asset ingest, smallest first, each with
+            ``dir`` and ``size`` keys.
+        layout: Layout the cards are composed into.
+        count: Number of cards in the collage.
+        spacing: Pixel spacing between cards.
+
+    Returns:
+        Chosen level or ``None`` when no pyramid is available.
+    """
+
+    if not pyramid:
+        return None
+    layout = Layout(layout)
+    cols = _columns(layout, count)
+    target = (LAYOUT_TARGET_WIDTH[layout] - spacing * (cols - 1)) // cols
+    for level in pyramid:
+        if level["size"][0] >= target:
+            return level
+    return pyramid[-1]
+
+
+@cache
+def default_font() -> ImageFont.ImageFont | ImageFont.FreeTypeFont:
+    """Return Pillow's default font, loaded once per process."""
+
+    return ImageFont.load_default()
+
+
 def _calc_caption_height(cards: Sequence[CardSpec], font: ImageFont.ImageFont) -> int:
     height = 0
     for card in cards:
@@ -35,11 +103,17 @@ def _calc_caption_height(cards: Sequence[CardSpec], font: ImageFont.ImageFont) -
     return height
 
 
+def _as_image(image: Image.Image | Path, reversed: bool = False) -> Image.Image:
+    if isinstance(image, Image.Image):
+        return image.rotate(180, expand=True) if reversed else image
+    return load_image(image, reversed=reversed)
+
+
 def compose(
     cards: Sequence[CardSpec],
     layout: Layout | str,
     *,
-    frame: Image.Image | None = None,
+    frame: Image.Image | Path | None = None,
     watermark: Image.Image | None = None,
     spacing: int = 10,
     font: ImageFont.ImageFont | None = None,
@@ -50,7 +124,7 @@ def compose(
     Args:
         cards: Ordered sequence of card specifications.
         layout: Layout identifier.
-        frame: Optional frame overlay per card.
+        frame: Optional frame overlay per card, as an image or a path.
         watermark: Optional watermark for bottom-right corner.
         spacing: Pixel spacing between cards.
         font: Font to use for captions; defaults to PIL default font.
@@ -63,8 +137,9 @@ def compose(
     if not cards:
         raise ValueError("No cards provided")
     layout = Layout(layout)
-    font = font or ImageFont.load_default()
-    card_w, card_h = cards[0].image.size
+    font = font or default_font()
+    images = [_as_image(card.image, card.reversed) for card in cards]
+    card_w, card_h = images[0].size
     cap_h = _calc_caption_height(cards, font)
     cap_extra = cap_h + 5 if cap_h else 0
     cell_w = card_w
@@ -118,20 +193,20 @@ def compose(
     base = Image.new("RGBA", (width, height), (255, 255, 255, 255))
     draw = ImageDraw.Draw(base)
 
-    frame_img = None
-    if frame:
+    frame_img = frame_mask = None
+    if isinstance(frame, Path):
+        frame_img, frame_mask = IMAGE_CACHE.frame(frame, (card_w, card_h))
+    elif frame:
         if frame.size != (card_w, card_h):
             frame_img = frame.resize((card_w, card_h), Image.LANCZOS)
         else:
             frame_img = frame
+        frame_mask = frame_img
 
-    for card, (x, y) in zip(cards, positions, strict=True):
-        img = card.image
-        if card.reversed:
-            img = img.rotate(180, expand=True)
+    for card, img, (x, y) in zip(cards, images, positions, strict=True):
         base.paste(img, (x, y))
         if frame_img:
-            base.paste(frame_img, (x, y), frame_img)
+            base.paste(frame_img, (x, y), frame_mask)
         if card.caption:
             bbox = font.getbbox(card.caption)
             tw = bbox[2] - bbox[0]
@@ -148,6 +223,135 @@ def compose(
     return base
 
 
+class _BppStats:
+    """Observed encoded bytes per pixel by quality, keyed by caller hint.
+
+    The hint is typically deck and layout.  At most ``max_hints`` hints are
+    kept, least recently used first out, each with the ``max_samples`` most
+    recently observed qualities.  Render threads record and read
+    concurrently, so every access holds the lock.
+    """
+
+    def __init__(self, max_hints: int = 256, max_samples: int = 8) -> None:
+        self.max_hints = max_hints
+        self.max_samples = max_samples
+        self._hints: OrderedDict[str, OrderedDict[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._hints)
+
+    def samples(self, hint: str) -> list[tuple[int, float]]:
+        """Return the ``(quality, bpp)`` samples of ``hint`` by quality."""
+
+        with self._lock:
+            samples = self._hints.get(hint)
+            if samples is None:
+                return []
+            self._hints.move_to_end(hint)
+            return sorted(samples.items())
+
+    def record(self, hint: str, quality: int, bpp: float) -> None:
+        """Record that ``quality`` encoded to ``bpp`` bytes per pixel."""
+
+        with self._lock:
+            samples = self._hints.get(hint)
+            if samples is None:
+                samples = self._hints[hint] = OrderedDict()
+            self._hints.move_to_end(hint)
+            samples[quality] = bpp
+            samples.move_to_end(quality)
+            while len(samples) > self.max_samples:
+                samples.popitem(last=False)
+            while len(self._hints) > self.max_hints:
+                self._hints.popitem(last=False)
+
+
+# Seeds the quality search of :func:`save_image` with ``mode="search"``.
+_BPP_STATS = _BppStats()
+
+
+def _predict_quality(
+    hint: str | None, pixels: int, max_bytes: int, lo: int, hi: int
+) -> int | None:
+    """Predict the highest quality in ``[lo, hi]`` that fits ``max_bytes``.
+
+    Returns ``None`` without enough samples and ``lo - 1`` when no quality in
+    the range is expected to fit.
+    """
+
+    points = _BPP_STATS.samples(hint) if hint is not None else []
+    if len(points) < 2:
+        return None
+    budget = max_bytes / pixels
+
+    def estimate(q: int) -> float:
+        # Piecewise linear through the samples, extrapolated at both ends.
+        k = 0
+        while k < len(points) - 2 and points[k + 1][0] < q:
+            k += 1
+        (q1, b1), (q2, b2) = points[k], points[k + 1]
+        return b1 + (b2 - b1) * (q - q1) / (q2 - q1)
+
+    for q in range(hi, lo - 1, -1):
+        if estimate(q) <= budget:
+            return q
+    return lo - 1
+
+
+def _encode(image: Image.Image, buffer: BytesIO, fmt: str, q: int) -> int:
+    buffer.seek(0)
+    buffer.truncate(0)
+    if fmt == "JPEG":
+        image.save(buffer, format=fmt, quality=q, optimize=True)
+    else:
+        image.save(buffer, format=fmt, quality=q)
+    return buffer.tell()
+
+
+def _save_search(
+    image: Image.Image,
+    fmt: str,
+    quality: int,
+    max_bytes: int,
+    min_quality: int,
+    hint: str | None,
+    max_encodes: int,
+) -> tuple[bytes, int]:
+    pixels = max(image.width * image.height, 1)
+    buffer = BytesIO()
+    lo, hi = min_quality, quality
+    best: bytes | None = None
+    last = b""
+    best_q = last_q = quality
+    predicted = _predict_quality(hint, pixels, max_bytes, lo, hi)
+    q = predicted if predicted is not None else hi
+    for attempt in range(max_encodes):
+        size = _encode(image, buffer, fmt, q)
+        if hint is not None:
+            _BPP_STATS.record(hint, q, size / pixels)
+        last, last_q = buffer.getvalue(), q
+        if size <= max_bytes:
+            best, best_q = last, q
+            lo = q + 1
+        else:
+            hi = q - 1
+        if lo > hi:
+            break
+        predicted = _predict_quality(hint, pixels, max_bytes, lo, hi)
+        if best is not None and predicted is not None and predicted < lo:
+            break
+        if best is None and attempt == max_encodes - 2:
+            # Last chance to produce a fitting image: stay on the safe side.
+            q = lo if predicted is None else max(lo, predicted - 5)
+        elif predicted is not None:
+            q = max(lo, predicted)
+        else:
+            q = (lo + hi + 1) // 2
+    return (best, best_q) if best is not None else (last, last_q)
+
+
 def save_image(
     image: Image.Image,
     *,
@@ -155,25 +359,55 @@ def save_image(
     quality: int = 80,
     max_bytes: int = 3 * 1024 * 1024,
     min_quality: int = 20,
+    mode: str = "linear",
+    hint: str | None = None,
+    max_encodes: int = 3,
 ) -> bytes:
-    """Save image ensuring file size is under limit by adjusting quality."""
+    """Save image ensuring file size is under limit by adjusting quality.
+
+    The ``"linear"`` mode lowers quality in steps of 5 until the image fits.
+    The ``"search"`` mode binary searches the quality range with at most
+    ``max_encodes`` encodes, seeded by bytes-per-pixel observed for earlier
+    images with the same ``hint`` (e.g. deck and layout).
+    """
 
     fmt = fmt.upper()
     if fmt not in {"WEBP", "JPEG"}:
         raise ValueError("fmt must be WEBP or JPEG")
-    buffer = BytesIO()
-    q = quality
-    while q >= min_quality:
-        buffer.seek(0)
-        buffer.truncate(0)
-        if fmt == "JPEG":
-            image.convert("RGB").save(buffer, format=fmt, quality=q, optimize=True)
+    if mode not in {"linear", "search"}:
+        raise ValueError("mode must be linear or search")
+    if fmt == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    with encode_span(fmt, mode, hint) as encoded:
+        if mode == "search":
+            data, chosen = _save_search(
+                image, fmt, quality, max_bytes, min_quality, hint, max_encodes
+            )
         else:
-            image.save(buffer, format=fmt, quality=q)
-        if buffer.tell() <= max_bytes:
-            break
-        q -= 5
-    return buffer.getvalue()
+            buffer = BytesIO()
+            q = chosen = quality
+            while q >= min_quality:
+                chosen = q
+                if _encode(image, buffer, fmt, q) <= max_bytes:
+                    break
+                q -= 5
+            data = buffer.getvalue()
+        encoded["bytes"] = len(data)
+        encoded["quality"] = chosen
+    return data
 
 
-__all__ = ["CardSpec", "Layout", "compose", "save_image"]
+__all__ = [
+    "COLLAGE_CACHE",
+    "CardSpec",
+    "CollageCache",
+    "IMAGE_CACHE",
+    "ImageCache",
+    "Layout",
+    "collage_key",
+    "compose",
+    "default_font",
+    "load_image",
+    "pick_level",
+    "save_image",
+]
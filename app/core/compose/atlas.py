@@ -0,0 +1,168 @@
+"""Packed per-level deck atlases.
+
+An atlas stores every card image of one deck directory (``cards``,
+``thumbs``, a pyramid level) as raw RGBA pixels in a single file under
+``<deck>/atlas/`` next to a JSON index with the byte offset, size and source
+file stat of each card.  The data file is memory-mapped and tiles are built
+with :func:`PIL.Image.frombuffer`, so a card is neither decoded nor copied
+and all processes on a host share one copy in the page cache.
+
+A tile is only served while the stat of its source file matches the index;
+otherwise callers fall back to decoding the file.  Data files are written
+under a unique name and published by atomically replacing the index, so
+readers never combine an index with the wrong data.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import threading
+from pathlib import Path
+from typing import Any, Sequence
+from uuid import uuid4
+
+from PIL import Image
+
+log = logging.getLogger(__name__)
+
+ATLAS_DIR = "atlas"
+ATLAS_VERSION = 1
+
+
+def atlas_index_path(level_dir: Path) -> Path:
+    """Return path of the atlas index for images in ``level_dir``."""
+
+    return level_dir.parent / ATLAS_DIR / f"{level_dir.name}.json"
+
+
+def _read_index(index_path: Path) -> dict[str, Any] | None:
+    try:
+        meta: dict[str, Any] = json.loads(index_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+    return meta if meta.get("version") == ATLAS_VERSION else None
+
+
+def atlas_is_current(level_dir: Path, names: Sequence[str]) -> bool:
+    """Return whether the atlas of ``level_dir`` holds ``names`` unchanged."""
+
+    meta = _read_index(atlas_index_path(level_dir))
+    if meta is None or set(meta["files"]) != set(names):
+        return False
+    for name in names:
+        try:
+            stat = (level_dir / name).stat()
+        except FileNotFoundError:
+            return False
+        if meta["files"][name][3:] != [stat.st_size, stat.st_mtime_ns]:
+            return False
+    return True
+
+
+def write_atlas(level_dir: Path, names: Sequence[str]) -> Path:
+    """Pack images ``names`` of ``level_dir`` into an atlas.
+
+    Returns:
+        Path of the written index.
+    """
+
+    index_path = atlas_index_path(level_dir)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    previous = _read_index(index_path)
+    data_name = f"{level_dir.name}.{uuid4().hex}.rgba"
+    files: dict[str, list[int]] = {}
+    offset = 0
+    with (index_path.parent / data_name).open("wb") as fh:
+        for name in names:
+            src = level_dir / name
+            stat = src.stat()
+            with Image.open(src) as img:
+                rgba = img.convert("RGBA")
+            fh.write(rgba.tobytes())
+            files[name] = [offset, *rgba.size, stat.st_size, stat.st_mtime_ns]
+            offset += rgba.width * rgba.height * 4
+    tmp = index_path.with_name(f".{index_path.name}.{uuid4().hex}")
+    meta = {"version": ATLAS_VERSION, "data": data_name, "files": files}
+    tmp.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp, index_path)
+    if previous is not None:
+        # Processes that mapped the old data keep it until they drop the map.
+        (index_path.parent / previous["data"]).unlink(missing_ok=True)
+    return index_path
+
+
+class Atlas:
+    """Memory-mapped atlas of one deck directory."""
+
+    def __init__(self, index_path: Path) -> None:
+        meta = _read_index(index_path)
+        if meta is None:
+            raise ValueError(f"Invalid atlas index {index_path}")
+        self.files: dict[str, list[int]] = meta["files"]
+        with (index_path.parent / meta["data"]).open("rb") as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def tile(self, name: str, stat: os.stat_result) -> Image.Image | None:
+        """Return read-only tile ``name`` if its source is unchanged."""
+
+        entry = self.files.get(name)
+        if entry is None or entry[3:] != [stat.st_size, stat.st_mtime_ns]:
+            return None
+        offset, width, height = entry[:3]
+        view = memoryview(self._map)[offset : offset + width * height * 4]
+        # Pillow accepts any buffer here; the stubs only declare bytes.
+        return Image.frombuffer(
+            "RGBA", (width, height), view, "raw", "RGBA", 0, 1  # type: ignore[arg-type]
+        )
+
+
+class AtlasStore:
+    """Open atlases keyed by index path, reopened when the index changes."""
+
+    def __init__(self) -> None:
+        self._atlases: dict[Path, tuple[int, Atlas | None]] = {}
+        self._lock = threading.Lock()
+
+    def tile(self, path: Path, stat: os.stat_result) -> Image.Image | None:
+        """Return atlas tile for image ``path`` with ``stat``, if packed."""
+
+        index_path = atlas_index_path(path.parent)
+        try:
+            stamp = index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._atlases.get(index_path)
+            if cached is None or cached[0] != stamp:
+                try:
+                    atlas: Atlas | None = Atlas(index_path)
+                except (OSError, ValueError) as exc:
+                    log.warning("Ignoring atlas %s: %s", index_path, exc)
+                    atlas = None
+                cached = (stamp, atlas)
+                self._atlases[index_path] = cached
+        atlas = cached[1]
+        return atlas.tile(path.name, stat) if atlas is not None else None
+
+    def clear(self) -> None:
+        """Forget open atlases."""
+
+        with self._lock:
+            self._atlases.clear()
+
+
+ATLASES = AtlasStore()
+
+
+__all__ = [
+    "ATLASES",
+    "ATLAS_DIR",
+    "Atlas",
+    "AtlasStore",
+    "atlas_index_path",
+    "atlas_is_current",
+    "write_atlas",
+]
@@ -0,0 +1,258 @@
+"""Content-addressed cache of encoded collages.
+
+Draws are deterministic, so the collage for a given deck, spread, drawn cards,
+orientations and locale never changes.  :data:`COLLAGE_CACHE` keeps encoded
+image bytes in an in-memory LRU and, when configured, in a second tier on
+disk (``COLLAGE_CACHE_DIR``) or in S3 (``COLLAGE_CACHE_S3_PREFIX``).  Repeat
+views and retries are then served without rendering.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Protocol, Sequence
+from uuid import uuid4
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from app.storage import S3Storage
+
+log = logging.getLogger(__name__)
+
+# Bump when the rendering of collages changes so stale entries are ignored.
+RENDER_VERSION = 2
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def collage_key(
+    *,
+    deck_id: str,
+    spread_id: str,
+    cards: Sequence[tuple[str, bool]] | str,
+    locale: str,
+    fmt: str = "WEBP",
+    salt: str = "",
+) -> str:
+    """Return content hash identifying a rendered collage.
+
+    Args:
+        deck_id: Deck or rune set identifier.
+        spread_id: Spread identifier.
+        cards: Drawn card keys with their reversed flags, in draw order, or
+            the :meth:`~app.core.draw.compact.CompactDraw.token` of the draw.
+        locale: Locale used for captions.
+        fmt: Output image format.
+        salt: Extra data that changes the rendering, e.g. a deck content hash.
+    """
+
+    payload = json.dumps(
+        [
+            RENDER_VERSION,
+            deck_id,
+            spread_id,
+            cards if isinstance(cards, str) else [list(c) for c in cards],
+            locale,
+            fmt,
+            salt,
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CollageBackend(Protocol):
+    """Second-tier storage for encoded collages."""
+
+    def get(self, key: str) -> bytes | None: ...
+
+    def put(self, key: str, data: bytes) -> None: ...
+
+
+class DiskBackend:
+    """Store collages as files sharded by key prefix."""
+
+    def __init__(self, root: Path | str) -> None:
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{key}.{uuid4().hex}")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+
+# Leading bytes of the formats collages are encoded in.
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+)
+
+
+def _content_type(data: bytes) -> str:
+    """Return the MIME type of encoded image ``data``."""
+
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, content_type in _SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    return "application/octet-stream"
+
+
+class S3Backend:
+    """Store collages in S3 via :class:`app.storage.S3Storage`.
+
+    The storage client is created on first use when none is given, so
+    configuring the backend does not connect to S3 at import time.
+    """
+
+    def __init__(
+        self, storage: S3Storage | None = None, prefix: str = "collages/"
+    ) -> None:
+        self._storage = storage
+        self.prefix = prefix
+        self._lock = threading.Lock()
+
+    @property
+    def storage(self) -> S3Storage:
+        if self._storage is None:
+            with self._lock:
+                if self._storage is None:
+                    from app.storage import S3Storage
+
+                    self._storage = S3Storage()
+        return self._storage
+
+    def get(self, key: str) -> bytes | None:
+        return self.storage.download(f"{self.prefix}{key}")
+
+    def put(self, key: str, data: bytes) -> None:
+        self.storage.upload_image(
+            data, _content_type(data), object_name=f"{self.prefix}{key}"
+        )
+
+
+class CollageCache:
+    """Two-tier cache of encoded collages: memory LRU plus optional backend."""
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backend: CollageBackend | None = None,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> bytes | None:
+        """Return cached bytes for ``key`` from memory or the backend."""
+
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.backend is not None:
+            try:
+                data = self.backend.get(key)
+            except Exception as exc:  # pragma: no cover - defensive
+                log.warning("Collage backend read failed for %s: %s", key, exc)
+                data = None
+            if data is not None:
+                self._remember(key, data)
+                with self._lock:
+                    self.hits += 1
+                return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store encoded collage in memory and the backend."""
+
+        self._remember(key, data)
+        if self.backend is not None:
+            try:
+                self.backend.put(key, data)
+            except Exception as exc:  # pragma: no cover - defensive
+                log.warning("Collage backend write failed for %s: %s", key, exc)
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        """Return cached collage or render, store and return it."""
+
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
+
+    def clear(self) -> None:
+        """Drop in-memory entries and reset statistics."""
+
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = self.misses = 0
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            self._entries[key] = data
+            self.nbytes += len(data)
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+
+def _backend_from_env() -> CollageBackend | None:
+    directory = os.environ.get("COLLAGE_CACHE_DIR")
+    if directory:
+        return DiskBackend(directory)
+    prefix = os.environ.get("COLLAGE_CACHE_S3_PREFIX")
+    if prefix:
+        return S3Backend(prefix=prefix)
+    return None
+
+
+COLLAGE_CACHE = CollageCache(
+    int(os.environ.get("COLLAGE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+    _backend_from_env(),
+)
+
+
+__all__ = [
+    "COLLAGE_CACHE",
+    "CollageBackend",
+    "CollageCache",
+    "DiskBackend",
+    "S3Backend",
+    "collage_key",
+]
@@ -0,0 +1,179 @@
+"""Process-wide cache of decoded card images.
+
+Card experts render the same deck files over and over, so decoding PNGs on
+every request dominates the compose stage.  :data:`IMAGE_CACHE` keeps decoded
+images in memory under an approximate byte budget and evicts the least
+recently used entries once the budget is exceeded.  Entries are invalidated
+when the modification time of the source file changes.  Reversed card
+variants are rotated once and cached next to the upright image so that no
+bitmap is rotated while serving a request.  Frame overlays are cached per
+target size together with their alpha mask, so the LANCZOS resize runs once
+per deck and card size.
+
+When a deck was packed into an atlas at ingest (see :mod:`.atlas`), upright
+cards are served as memory-mapped tiles that bypass the byte budget, since
+their pixels live in the shared page cache.
+
+Cached images are shared between callers and must be treated as read-only.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Hashable
+
+from PIL import Image
+
+from .atlas import ATLASES
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _image_nbytes(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+def _decode(path: Path) -> Image.Image:
+    with Image.open(path) as src:
+        return src.convert("RGBA")
+
+
+@dataclass
+class _Entry:
+    stamp: int
+    value: Image.Image
+    nbytes: int
+
+
+class ImageCache:
+    """LRU cache of decoded images bounded by an approximate byte budget."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.atlas_hits = 0
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, path: Path | str, *, reversed: bool = False) -> Image.Image:
+        """Return decoded RGBA image for ``path``, optionally rotated 180°."""
+
+        path = Path(path)
+        stat = path.stat()
+        stamp = stat.st_mtime_ns
+        if reversed:
+            key = (str(path.parent), path.name, "reversed")
+            return self._lookup(
+                key, stamp, lambda: self.get(path).rotate(180, expand=True)
+            )
+        tile = ATLASES.tile(path, stat)
+        if tile is not None:
+            self.atlas_hits += 1
+            return tile
+        key = (str(path.parent), path.name, "upright")
+        return self._lookup(key, stamp, lambda: _decode(path))
+
+    def frame(
+        self, path: Path | str, size: tuple[int, int]
+    ) -> tuple[Image.Image, Image.Image]:
+        """Return frame overlay resized to ``size`` and its alpha mask."""
+
+        path = Path(path)
+        stamp = path.stat().st_mtime_ns
+        width, height = size
+
+        frame_key = (str(path.parent), path.name, f"frame@{width}x{height}")
+        mask_key = (str(path.parent), path.name, f"mask@{width}x{height}")
+        frame = self._peek(frame_key, stamp)
+        if frame is None:
+            upright = self.get(path)
+            # A frame of the right size is the upright entry; caching it again
+            # would count its bytes twice against the budget.
+            frame = (
+                upright
+                if upright.size == size
+                else self._lookup(
+                    frame_key,
+                    stamp,
+                    lambda: upright.resize(size, Image.Resampling.LANCZOS),
+                )
+            )
+        mask = self._lookup(mask_key, stamp, lambda: frame.getchannel("A"))
+        return frame, mask
+
+    def configure(self, max_bytes: int) -> None:
+        """Change the byte budget, evicting entries if needed."""
+
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self) -> None:
+        """Drop all cached images and reset statistics."""
+
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = self.misses = self.evictions = self.atlas_hits = 0
+
+    def _peek(self, key: Hashable, stamp: int) -> Image.Image | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.stamp != stamp:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def _lookup(
+        self, key: Hashable, stamp: int, factory: Callable[[], Image.Image]
+    ) -> Image.Image:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stamp == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+        value = factory()
+        nbytes = _image_nbytes(value)
+        if nbytes > self.max_bytes:
+            return value
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._entries[key] = _Entry(stamp, value, nbytes)
+            self.nbytes += nbytes
+            self._evict()
+        return value
+
+    def _evict(self) -> None:
+        while self.nbytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self.nbytes -= entry.nbytes
+            self.evictions += 1
+
+
+IMAGE_CACHE = ImageCache(
+    int(os.environ.get("IMAGE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+)
+
+
+def load_image(path: Path | str, *, reversed: bool = False) -> Image.Image:
+    """Return decoded image for ``path`` from the shared cache."""
+
+    return IMAGE_CACHE.get(path, reversed=reversed)
+
+
+__all__ = ["IMAGE_CACHE", "ImageCache", "load_image"]
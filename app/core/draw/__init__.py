@@ -57,11 +57,29 @@ def draw_unique(
         List of DrawItem preserving draw order.
     """
 
+    seed = generate_seed(user_id, expert, spread_id, draw_date, nonce)
+    return draw_from_seed(
+        items, count, seed, allow_reversed=allow_reversed, p_reversed=p_reversed
+    )
+
+
+def draw_from_seed(
+    items: Sequence[str],
+    count: int,
+    seed: int,
+    *,
+    allow_reversed: bool = False,
+    p_reversed: float = 0.5,
+) -> List[DrawItem]:
+    """Draw unique items from a seed computed by :func:`generate_seed`.
+
+    Replaying a stored seed returns the draw :func:`draw_unique` made.
+    """
+
     if count > len(items):
         raise ValueError("Not enough unique items to draw")
-    seed = generate_seed(user_id, expert, spread_id, draw_date, nonce)
     rng = random.Random(seed)
-    selection = rng.sample(list(items), count)
+    selection = rng.sample(items, count)
     result: List[DrawItem] = []
     for key in selection:
         is_reversed = allow_reversed and rng.random() < p_reversed
@@ -69,4 +87,4 @@ def draw_unique(
     return result
 
 
-__all__ = ["DrawItem", "draw_unique", "generate_seed"]
+__all__ = ["DrawItem", "draw_from_seed", "draw_unique", "generate_seed"]
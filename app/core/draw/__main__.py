@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from datetime import date
+from typing import Sequence
+
+from .daily import DAILY_DRAWS, precompute
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Precompute daily draw tables or audit stored draws."""
+
+    parser = argparse.ArgumentParser(prog="python -m app.core.draw")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pre = commands.add_parser(
+        "precompute", help="write daily draw tables of active users"
+    )
+    pre.add_argument("--date", type=date.fromisoformat, help="default: tomorrow")
+    pre.add_argument("--days", type=int, default=7, help="activity window in days")
+    pre.add_argument("--top", type=int, default=10, help="number of popular spreads")
+    pre.add_argument(
+        "--spread",
+        action="append",
+        metavar="EXPERT:SPREAD:DECK",
+        help="spread to precompute instead of the popular ones (repeatable)",
+    )
+    audit = commands.add_parser(
+        "audit", help="replay stored draws and report those that changed"
+    )
+    audit.add_argument("--workers", type=int, help="default: number of CPUs")
+    audit.add_argument("--chunk-size", type=int, default=10000)
+    audit.add_argument("--start-id", type=int, default=0, help="resume after this id")
+    audit.add_argument("--show", type=int, default=20, help="mismatches to print")
+    args = parser.parse_args(argv)
+
+    from app.db.session import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "audit":
+        from .audit import audit_draws
+
+        with SessionLocal() as session:
+            report = audit_draws(
+                session,
+                workers=args.workers,
+                chunk_size=args.chunk_size,
+                start_id=args.start_id,
+            )
+        print(
+            f"checked {report.checked}, skipped {report.skipped}, "
+            f"mismatched {report.mismatched} up to id {report.last_id} "
+            f"in {report.seconds:.1f}s ({report.rows_per_second:.0f} rows/s)"
+        )
+        for mismatch in report.mismatches[: args.show]:
+            print(f"draw {mismatch.draw_id}: {mismatch.reason}")
+        sys.exit(0 if report.ok else 1)
+
+    if DAILY_DRAWS.root is None:
+        parser.error("DRAW_TABLE_DIR is not set")
+    spreads = None
+    if args.spread:
+        parts = [tuple(spec.split(":")) for spec in args.spread]
+        if any(len(p) != 3 for p in parts):
+            parser.error("--spread must look like EXPERT:SPREAD:DECK")
+        spreads = [(e, s, d) for e, s, d in parts]
+    with SessionLocal() as session:
+        written = precompute(
+            session, args.date, spreads=spreads, days=args.days, top=args.top
+        )
+    for (expert, spread_id, deck_id), rows in written.items():
+        print(f"{expert}/{spread_id}/{deck_id}: {rows}")
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI utility
+    main()
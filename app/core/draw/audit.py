@@ -0,0 +1,298 @@
+"""Reproducibility audit of stored draws.
+
+Every :class:`~app.db.models.Draw` row keeps the decimal seed computed by
+:func:`~app.core.draw.generate_seed` in ``seed`` and the drawn items with
+their orientation, either compactly as ``facts_json["draw"]`` (a
+:meth:`~app.core.draw.compact.CompactDraw.token`) or as the card dicts of
+``facts_json["cards"]`` (``["runes"]`` for runes).
+:func:`audit_draws` replays each seed against the current deck and code
+with :func:`~app.core.draw.draw_from_seed` and reports rows that come out
+differently, e.g. after a Python upgrade changed ``random.sample``.
+
+Rows are read by keyset pagination on the primary key, ``chunk_size`` at a
+time, with ``facts_json`` as undecoded text; decoding and replay run on a
+process pool with at most ``max_pending`` chunks in flight, so the reader
+stays cheap and memory stays flat however large the table is.  Decks are read
+once up front.  Rows of decks or experts that no longer exist are counted
+as skipped, not as mismatches.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, field
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, Iterator, Sequence
+
+from . import draw_from_seed
+from .compact import CompactDraw, StaleDeckError
+from .daily import CARD_EXPERTS
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from sqlalchemy.orm import Session
+
+log = logging.getLogger(__name__)
+
+# Keys, reversibility by key, allow_reversed and p_reversed of one
+# (expert, deck) pair.
+DeckSpec = tuple[tuple[str, ...], dict[str, bool], bool, float]
+# id, expert, deck_id, seed, drawn (key, reversed) pairs or compact draw.
+Row = tuple[int, str, str, str, list[tuple[str, bool]] | CompactDraw]
+
+
+@dataclass
+class Mismatch:
+    """A stored draw the current code does not reproduce."""
+
+    draw_id: int
+    reason: str
+
+
+@dataclass
+class AuditReport:
+    """Outcome of :func:`audit_draws`."""
+
+    checked: int = 0
+    skipped: int = 0
+    mismatched: int = 0
+    last_id: int = 0
+    seconds: float = 0.0
+    mismatches: list[Mismatch] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.mismatched == 0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.checked / self.seconds if self.seconds else 0.0
+
+
+def _drawn(facts: Any) -> list[tuple[str, bool]] | CompactDraw | None:
+    if isinstance(facts, (str, bytes)):
+        try:
+            facts = json.loads(facts)
+        except ValueError:
+            return None
+    if not isinstance(facts, dict):
+        return None
+    if isinstance(facts.get("draw"), str):
+        try:
+            return CompactDraw.from_token(facts["draw"])
+        except ValueError:
+            return None
+    items = facts.get("cards", facts.get("runes"))
+    if not isinstance(items, list):
+        return None
+    try:
+        return [(str(item["key"]), bool(item.get("reversed"))) for item in items]
+    except (KeyError, TypeError, AttributeError):
+        return None
+
+
+def check_row(row: Row, decks: dict[tuple[str, str], DeckSpec]) -> str | None:
+    """Return why ``row`` is not reproduced, or ``None`` if it is."""
+
+    _, expert, deck_id, seed, drawn = row
+    keys, can_reverse, allow_reversed, p_reversed = decks[(expert, deck_id)]
+    if isinstance(drawn, CompactDraw):
+        try:
+            drawn = [(item.key, item.reversed) for item in drawn.items(keys)]
+        except (StaleDeckError, IndexError) as exc:
+            return str(exc) or "item out of range"
+    try:
+        replayed = draw_from_seed(
+            keys,
+            len(drawn),
+            int(seed),
+            allow_reversed=allow_reversed,
+            p_reversed=p_reversed,
+        )
+    except ValueError as exc:
+        return str(exc)
+    for n, (item, (key, rev)) in enumerate(zip(replayed, drawn, strict=True)):
+        if item.key != key:
+            return f"item {n}: stored {key}, replayed {item.key}"
+        # Experts may keep items that cannot be reversed upright.
+        if rev != item.reversed and (rev or can_reverse[key]):
+            return f"item {n}: stored reversed={rev}, replayed {item.reversed}"
+    return None
+
+
+def _check_chunk(
+    chunk: list[tuple[int, str, str, str, Any]],
+    decks: dict[tuple[str, str], DeckSpec],
+) -> tuple[int, list[Mismatch]]:
+    checked = 0
+    mismatches = []
+    for draw_id, expert, deck_id, seed, facts in chunk:
+        drawn = _drawn(facts)
+        if drawn is None or (expert, deck_id) not in decks:
+            continue
+        checked += 1
+        reason = check_row((draw_id, expert, deck_id, seed, drawn), decks)
+        if reason is not None:
+            mismatches.append(Mismatch(draw_id, reason))
+    return checked, mismatches
+
+
+def load_decks(session: Session) -> dict[tuple[str, str], DeckSpec]:
+    """Return draw parameters of every card expert and stored deck."""
+
+    from sqlalchemy import select
+
+    from app.core.assets import DeckIndex
+    from app.db.models import Deck
+
+    decks: dict[tuple[str, str], DeckSpec] = {}
+    experts = {
+        expert: import_module(f"app.experts.{expert}") for expert in CARD_EXPERTS
+    }
+    for deck_id, manifest in session.execute(select(Deck.deck_id, Deck.config_json)):
+        items_key = next((k for k in ("cards", "runes") if k in manifest), None)
+        if deck_id is None or items_key is None:
+            continue
+        index = DeckIndex.from_manifest(deck_id, manifest, items_key)
+        can_reverse = dict(zip(index.keys, index.can_reverse, strict=True))
+        for expert, module in experts.items():
+            options = module.draw_options(index)
+            decks[(expert, deck_id)] = (
+                index.keys,
+                can_reverse,
+                bool(options.get("allow_reversed", False)),
+                float(options.get("p_reversed", 0.5)),
+            )
+    return decks
+
+
+def iter_chunks(
+    session: Session, *, chunk_size: int = 10000, start_id: int = 0
+) -> Iterator[list[tuple[int, str, str, str, Any]]]:
+    """Yield ``Draw`` rows with ``id > start_id`` in id order, chunk by chunk.
+
+    ``facts_json`` is yielded as undecoded JSON text.
+    """
+
+    from sqlalchemy import Text, cast, select
+
+    from app.db.models import Draw
+
+    # Facts come as JSON text so decoding happens in the audit workers.
+    facts = cast(Draw.facts_json, Text)
+    last_id = start_id
+    while True:
+        stmt = (
+            select(Draw.id, Draw.expert, Draw.deck_id, Draw.seed, facts)
+            .where(Draw.id > last_id)
+            .order_by(Draw.id)
+            .limit(chunk_size)
+        )
+        chunk: list[tuple[int, str, str, str, Any]] = [
+            (draw_id, expert, deck_id, seed, text)
+            for draw_id, expert, deck_id, seed, text in session.execute(stmt)
+        ]
+        if not chunk:
+            return
+        last_id = chunk[-1][0]
+        # Keeps the identity map from growing across chunks.
+        session.expunge_all()
+        yield chunk
+
+
+def _executor(workers: int, mode: str) -> Executor:
+    if mode == "process":
+        try:
+            return ProcessPoolExecutor(workers)
+        except (OSError, NotImplementedError) as exc:
+            log.warning("Process pool unavailable, using threads: %s", exc)
+    return ThreadPoolExecutor(workers, thread_name_prefix="draw-audit")
+
+
+def audit_draws(
+    session: Session,
+    *,
+    workers: int | None = None,
+    mode: str = "process",
+    chunk_size: int = 10000,
+    start_id: int = 0,
+    max_pending: int | None = None,
+    max_mismatches: int = 1000,
+    decks: dict[tuple[str, str], DeckSpec] | None = None,
+) -> AuditReport:
+    """Replay every stored draw and report those that differ.
+
+    Args:
+        session: Database session to stream ``draws`` from.
+        workers: Pool size; defaults to the number of CPUs.
+        mode: ``process`` or ``thread`` pool.
+        chunk_size: Rows per query and per task.
+        start_id: Resume after this draw id.
+        max_pending: Chunks in flight; defaults to twice ``workers``.
+        max_mismatches: Mismatches kept in the report; all are counted.
+        decks: Draw parameters by ``(expert, deck_id)``; read from the
+            database by default.
+
+    Returns:
+        Counts, the last id read and up to ``max_mismatches`` mismatches.
+    """
+
+    if mode not in {"process", "thread"}:
+        raise ValueError("mode must be process or thread")
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    decks = load_decks(session) if decks is None else decks
+    report = AuditReport(last_id=start_id)
+    start = time.perf_counter()
+
+    def collect(done: Sequence[Future[tuple[int, list[Mismatch]]]]) -> None:
+        for future in done:
+            checked, found = future.result()
+            report.checked += checked
+            report.mismatched += len(found)
+            room = max_mismatches - len(report.mismatches)
+            report.mismatches.extend(found[: max(room, 0)])
+
+    read = 0
+    pending: set[Future[tuple[int, list[Mismatch]]]] = set()
+    executor = _executor(workers, mode)
+    try:
+        for chunk in iter_chunks(session, chunk_size=chunk_size, start_id=start_id):
+            # Facts are parsed in the workers; the reader only fetches.
+            used = {(row[1], row[2]) for row in chunk} & decks.keys()
+            while len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(list(done))
+            pending.add(
+                executor.submit(_check_chunk, chunk, {k: decks[k] for k in used})
+            )
+            read += len(chunk)
+            report.last_id = chunk[-1][0]
+        done, _ = wait(pending)
+        collect(list(done))
+        report.skipped = read - report.checked
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    report.mismatches.sort(key=lambda m: m.draw_id)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+__all__ = [
+    "AuditReport",
+    "Mismatch",
+    "audit_draws",
+    "check_row",
+    "iter_chunks",
+    "load_decks",
+]
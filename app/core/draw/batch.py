@@ -0,0 +1,255 @@
+"""Vectorized draws for many users of one spread.
+
+:func:`draw_many` draws ``count`` unique items for every ``(user_id, nonce)``
+pair of one ``(expert, spread_id, draw_date)`` and returns a
+:class:`DrawBatch` of NumPy index arrays instead of :class:`DrawItem` lists.
+Two generators are available:
+
+* ``compat=False`` (default) keys a Philox4x32-10 counter-based generator
+  with ``SHA256("expert|spread_id|YYYYMMDD")`` and uses
+  ``(user_id, nonce, block)`` as the counter, so every row is generated with
+  array arithmetic and rows are independent of each other and of the batch
+  they are drawn in.  Draws differ from :func:`~app.core.draw.draw_unique`.
+* ``compat=True`` seeds ``random.Random`` per row exactly like
+  :func:`~app.core.draw.draw_unique` and returns the very same draws.  It
+  skips the item list copies and :class:`DrawItem` objects but still runs
+  one SHA-256 and one Mersenne Twister per row; use it wherever results
+  must match draws users have already seen.
+
+Indices point into the ``items`` sequence the caller would pass to
+:func:`~app.core.draw.draw_unique`; :meth:`DrawBatch.items` maps a row back.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import random
+from dataclasses import dataclass
+from datetime import date
+from typing import Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from . import DrawItem
+
+# Rows generated at once by the Philox sampler.
+CHUNK = 65536
+
+_M0 = np.uint64(0xD2511F53)
+_M1 = np.uint64(0xCD9E8D57)
+_W0 = 0x9E3779B9
+_W1 = 0xBB67AE85
+_MASK = np.uint64(0xFFFFFFFF)
+_SHIFT = np.uint64(32)
+
+
+@dataclass
+class DrawBatch:
+    """Draws of many users: ``indices[row]`` in draw order and orientations."""
+
+    indices: npt.NDArray[np.unsignedinteger]
+    reversed: npt.NDArray[np.bool_]
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def items(self, row: int, keys: Sequence[str]) -> list[DrawItem]:
+        """Return row ``row`` as :class:`DrawItem` objects of ``keys``."""
+
+        return [
+            DrawItem(key=keys[index], reversed=bool(rev))
+            for index, rev in zip(self.indices[row], self.reversed[row], strict=True)
+        ]
+
+
+def index_dtype(population: int) -> np.dtype[np.unsignedinteger]:
+    """Return the smallest unsigned dtype holding indices below ``population``."""
+
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if population <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+def philox4x32(
+    counter: npt.NDArray[np.uint64], key: tuple[int, int], rounds: int = 10
+) -> npt.NDArray[np.uint64]:
+    """Apply Philox4x32 to the ``(n, 4)`` 32-bit words of ``counter``.
+
+    Words are held in ``uint64`` so the 32x32 bit products fit.
+    """
+
+    c0, c1, c2, c3 = (counter[:, i].astype(np.uint64) for i in range(4))
+    k0, k1 = key
+    for _ in range(rounds):
+        p0 = c0 * _M0
+        p1 = c2 * _M1
+        c0, c1, c2, c3 = (
+            (p1 >> _SHIFT) ^ c1 ^ np.uint64(k0),
+            p1 & _MASK,
+            (p0 >> _SHIFT) ^ c3 ^ np.uint64(k1),
+            p0 & _MASK,
+        )
+        k0 = (k0 + _W0) & 0xFFFFFFFF
+        k1 = (k1 + _W1) & 0xFFFFFFFF
+    return np.stack([c0, c1, c2, c3], axis=1)
+
+
+def _spread_key(expert: str, spread_id: str, draw_date: date) -> tuple[int, int]:
+    digest = hashlib.sha256(
+        f"{expert}|{spread_id}|{draw_date:%Y%m%d}".encode()
+    ).digest()
+    return int.from_bytes(digest[:4], "little"), int.from_bytes(digest[4:8], "little")
+
+
+def _philox_rows(
+    population: int,
+    count: int,
+    users: npt.NDArray[np.uint64],
+    nonces: npt.NDArray[np.uint64],
+    key: tuple[int, int],
+    allow_reversed: bool,
+    p_reversed: float,
+) -> tuple[npt.NDArray[np.unsignedinteger], npt.NDArray[np.bool_]]:
+    n = len(users)
+    # One word per pick and one per orientation, four words per block.
+    blocks = -(-2 * count // 4)
+    counter = np.empty((n * blocks, 4), dtype=np.uint64)
+    counter[:, 0] = np.repeat(users & _MASK, blocks)
+    counter[:, 1] = np.repeat(users >> _SHIFT, blocks)
+    counter[:, 2] = np.repeat(nonces & _MASK, blocks)
+    counter[:, 3] = np.tile(np.arange(blocks, dtype=np.uint64), n)
+    words = philox4x32(counter, key).reshape(n, blocks * 4)
+
+    dtype = index_dtype(population)
+    perm = np.tile(np.arange(population, dtype=dtype), (n, 1))
+    rows = np.arange(n)
+    # Partial Fisher-Yates: position j swaps with j + floor(u * (population - j)).
+    for j in range(count):
+        pick = j + ((words[:, j] * np.uint64(population - j)) >> _SHIFT).astype(np.intp)
+        chosen = perm[rows, pick]
+        perm[rows, pick] = perm[rows, j]
+        perm[rows, j] = chosen
+    if allow_reversed:
+        threshold = np.uint64(int(p_reversed * 2**32))
+        reversed_ = words[:, count : 2 * count] < threshold
+    else:
+        reversed_ = np.zeros((n, count), dtype=np.bool_)
+    return perm[:, :count].copy(), reversed_
+
+
+def _compat_rows(
+    population: int,
+    count: int,
+    users: Sequence[int | str],
+    nonces: Sequence[int],
+    expert: str,
+    spread_id: str,
+    draw_date: date,
+    allow_reversed: bool,
+    p_reversed: float,
+) -> tuple[npt.NDArray[np.unsignedinteger], npt.NDArray[np.bool_]]:
+    flat: list[int] = []
+    flags: list[bool] = []
+    pool = range(population)
+    # Same seed as ``generate_seed``; only the user and nonce change per row.
+    middle = f"|{expert}|{spread_id}|{draw_date:%Y%m%d}|"
+    for user_id, nonce in zip(users, nonces, strict=True):
+        digest = hashlib.sha256(f"{user_id}{middle}{nonce}".encode()).digest()
+        rng = random.Random(int.from_bytes(digest, "big"))
+        # ``sample`` picks positions only, so sampling ``range`` yields the
+        # positions ``draw_unique`` picks from ``items``.
+        flat += rng.sample(pool, count)
+        if allow_reversed:
+            flags += [rng.random() < p_reversed for _ in range(count)]
+    indices = np.array(flat, dtype=index_dtype(population)).reshape(len(users), count)
+    if allow_reversed:
+        return indices, np.array(flags, dtype=np.bool_).reshape(len(users), count)
+    return indices, np.zeros(indices.shape, dtype=np.bool_)
+
+
+def draw_many(
+    population: int,
+    count: int,
+    *,
+    user_ids: npt.ArrayLike | Sequence[int | str],
+    expert: str,
+    spread_id: str,
+    draw_date: date,
+    nonces: npt.ArrayLike = 0,
+    allow_reversed: bool = False,
+    p_reversed: float = 0.5,
+    compat: bool = False,
+) -> DrawBatch:
+    """Draw ``count`` unique indices below ``population`` for many users.
+
+    Args:
+        population: Size of the item pool (``len(items)``).
+        count: Number of items per draw; must not exceed ``population``.
+        user_ids: One user per row; non-negative integers below ``2**64``,
+            or any ``draw_unique`` user id in compat mode.
+        expert, spread_id, draw_date: Shared seed parameters.
+        nonces: Scalar or one nonce per row, below ``2**32``.
+        allow_reversed: Whether orientation may be reversed.
+        p_reversed: Probability of an item being reversed when allowed.
+        compat: Reproduce :func:`~app.core.draw.draw_unique` exactly.
+
+    Returns:
+        Batch with ``(len(user_ids), count)`` index and orientation arrays.
+
+    Raises:
+        ValueError: If ``count`` exceeds ``population`` or ids do not fit.
+    """
+
+    if count > population:
+        raise ValueError("Not enough unique items to draw")
+    if compat:
+        users = list(np.asarray(user_ids, dtype=object).ravel())
+        nonce_list = [int(n) for n in np.broadcast_to(nonces, (len(users),))]
+        indices, reversed_ = _compat_rows(
+            population,
+            count,
+            users,
+            nonce_list,
+            expert,
+            spread_id,
+            draw_date,
+            allow_reversed,
+            p_reversed,
+        )
+        return DrawBatch(indices, reversed_)
+
+    users_arr = np.asarray(user_ids)
+    nonces_arr = np.broadcast_to(np.asarray(nonces), users_arr.shape)
+    if users_arr.ndim != 1 or (len(users_arr) and users_arr.min() < 0):
+        raise ValueError("user_ids must be a flat array of non-negative integers")
+    if len(nonces_arr) and not 0 <= nonces_arr.min() <= nonces_arr.max() < 2**32:
+        raise ValueError("nonces must be below 2**32")
+    users_u = users_arr.astype(np.uint64)
+    nonces_u = nonces_arr.astype(np.uint64)
+    key = _spread_key(expert, spread_id, draw_date)
+    parts = [
+        _philox_rows(
+            population,
+            count,
+            users_u[start : start + CHUNK],
+            nonces_u[start : start + CHUNK],
+            key,
+            allow_reversed,
+            p_reversed,
+        )
+        for start in range(0, len(users_u), CHUNK)
+    ]
+    if not parts:
+        return DrawBatch(
+            np.empty((0, count), dtype=index_dtype(population)),
+            np.empty((0, count), dtype=np.bool_),
+        )
+    return DrawBatch(
+        np.concatenate([indices for indices, _ in parts]),
+        np.concatenate([reversed_ for _, reversed_ in parts]),
+    )
+
+
+__all__ = ["CHUNK", "DrawBatch", "draw_many", "index_dtype", "philox4x32"]
@@ -0,0 +1,341 @@
+"""Compact representation of drawn cards.
+
+A :class:`CompactDraw` is what a draw really is: a deck, a spread, the
+positions of the drawn items in the deck's key order and their
+orientations.  Positions are packed as LEB128 varints (one byte for decks
+of up to 128 items) and orientations as a bitmask, so a ten card spread
+fits in a few dozen bytes instead of a list of manifest dicts.  A short
+digest of the deck key order is kept so a draw is never expanded against
+a deck whose items moved.
+
+:class:`LazyCards` is the ``cards`` list the card experts hand from
+``prepare`` to ``compose``.  It expands to the usual card dicts through the
+:class:`~app.core.assets.DeckIndex` on first use and pickles as the compact
+draw alone, so render workers receive the compact form and expand it from
+their own deck index.  :meth:`CompactDraw.token` is the text form for
+cache keys, and :func:`draw_facts` builds the ``Draw.facts_json`` that
+stores a draw by its token.
+"""
+
+from __future__ import annotations
+
+import base64
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Iterator, Mapping, Sequence, overload
+
+from . import DrawItem
+from .daily import items_digest
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from app.core.assets import DeckIndex
+
+DIGEST_SIZE = 4
+
+
+class StaleDeckError(LookupError):
+    """The deck index does not match the one a draw was made from."""
+
+
+def pack_varints(values: Sequence[int]) -> bytes:
+    """Encode non-negative ``values`` as LEB128 varints."""
+
+    out = bytearray()
+    for value in values:
+        if value < 0:
+            raise ValueError("varints must be non-negative")
+        while value >= 0x80:
+            out.append(value & 0x7F | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def unpack_varints(
+    data: bytes, count: int = -1, offset: int = 0
+) -> tuple[list[int], int]:
+    """Decode ``count`` varints (all by default) from ``data`` at ``offset``.
+
+    Returns:
+        The values and the offset after the last one.
+    """
+
+    values: list[int] = []
+    value = shift = 0
+    while len(values) != count and offset < len(data):
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        value = shift = 0
+    if shift or (count >= 0 and len(values) != count):
+        raise ValueError("truncated varints")
+    return values, offset
+
+
+def _pack_str(value: str) -> bytes:
+    raw = value.encode("utf-8")
+    return pack_varints([len(raw)]) + raw
+
+
+def _unpack_str(data: bytes, offset: int) -> tuple[str, int]:
+    (size,), offset = unpack_varints(data, 1, offset)
+    end = offset + size
+    if end > len(data):
+        raise ValueError("truncated string")
+    return data[offset:end].decode("utf-8"), end
+
+
+@dataclass(frozen=True, slots=True)
+class CompactDraw:
+    """Deck, spread, varint-packed item positions and orientation bits."""
+
+    deck_id: str
+    spread_id: str
+    digest: bytes
+    indices: bytes
+    flags: bytes
+
+    @classmethod
+    def from_positions(
+        cls,
+        deck_id: str,
+        spread_id: str,
+        keys: Sequence[str],
+        positions: Sequence[int],
+        reversed_: Sequence[bool],
+    ) -> CompactDraw:
+        """Build a draw of ``positions`` into ``keys`` with orientations."""
+
+        flags = bytearray(-(-len(positions) // 8))
+        for i, rev in enumerate(reversed_):
+            if rev:
+                flags[i >> 3] |= 1 << (i & 7)
+        return cls(
+            deck_id,
+            spread_id,
+            items_digest(keys)[:DIGEST_SIZE],
+            pack_varints(positions),
+            bytes(flags),
+        )
+
+    @classmethod
+    def from_items(
+        cls,
+        deck_id: str,
+        spread_id: str,
+        items: Sequence[DrawItem],
+        index: DeckIndex,
+    ) -> CompactDraw:
+        """Build a draw of ``items`` drawn from ``index``."""
+
+        return cls.from_positions(
+            deck_id,
+            spread_id,
+            index.keys,
+            [index.positions[item.key] for item in items],
+            [item.reversed for item in items],
+        )
+
+    @property
+    def count(self) -> int:
+        # Every varint ends with the one byte that has the high bit clear.
+        return sum(byte < 0x80 for byte in self.indices)
+
+    def positions(self) -> list[int]:
+        """Return the positions of the drawn items in the deck key order."""
+
+        return unpack_varints(self.indices)[0]
+
+    def reversed(self) -> list[bool]:
+        """Return the orientation of every drawn item."""
+
+        return [bool(self.flags[i >> 3] >> (i & 7) & 1) for i in range(self.count)]
+
+    def items(self, keys: Sequence[str]) -> list[DrawItem]:
+        """Return the draw as :class:`DrawItem` objects of ``keys``.
+
+        Raises:
+            StaleDeckError: If ``keys`` are not those the draw was made from.
+        """
+
+        if items_digest(keys)[:DIGEST_SIZE] != self.digest:
+            raise StaleDeckError(f"Deck {self.deck_id} changed since the draw")
+        return [
+            DrawItem(keys[pos], rev)
+            for pos, rev in zip(self.positions(), self.reversed(), strict=True)
+        ]
+
+    def to_bytes(self) -> bytes:
+        """Serialise the draw; the inverse of :meth:`from_bytes`."""
+
+        return b"".join(
+            (
+                _pack_str(self.deck_id),
+                _pack_str(self.spread_id),
+                self.digest,
+                pack_varints([self.count]),
+                self.indices,
+                self.flags,
+            )
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> CompactDraw:
+        """Parse bytes written by :meth:`to_bytes`.
+
+        Raises:
+            ValueError: If ``data`` is malformed.
+        """
+
+        deck_id, offset = _unpack_str(data, 0)
+        spread_id, offset = _unpack_str(data, offset)
+        digest = data[offset : offset + DIGEST_SIZE]
+        (count,), start = unpack_varints(data, 1, offset + DIGEST_SIZE)
+        _, end = unpack_varints(data, count, start)
+        flags = data[end:]
+        if len(digest) != DIGEST_SIZE or len(flags) != -(-count // 8):
+            raise ValueError("malformed compact draw")
+        return cls(deck_id, spread_id, digest, data[start:end], flags)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Positional fields pickle smaller and faster than slot state.
+        return (
+            CompactDraw,
+            (self.deck_id, self.spread_id, self.digest, self.indices, self.flags),
+        )
+
+    def token(self) -> str:
+        """Return the draw as URL-safe text, e.g. for JSON columns."""
+
+        return base64.urlsafe_b64encode(self.to_bytes()).rstrip(b"=").decode("ascii")
+
+    @classmethod
+    def from_token(cls, token: str) -> CompactDraw:
+        """Parse a :meth:`token`."""
+
+        padded = token + "=" * (-len(token) % 4)
+        try:
+            raw = base64.urlsafe_b64decode(padded)
+        except ValueError as exc:
+            raise ValueError("malformed compact draw") from exc
+        return cls.from_bytes(raw)
+
+
+class LazyCards(Sequence[dict[str, Any]]):
+    """Card dicts of a :class:`CompactDraw`, expanded on first access.
+
+    Each card has ``key``, ``file``, ``display``, ``caption`` and
+    ``reversed``.  The deck index is looked up with
+    :func:`~app.core.assets.get_deck` when none is given, e.g. after
+    unpickling in a render worker.
+    """
+
+    __slots__ = ("draw", "captions", "_index", "_cards")
+
+    def __init__(
+        self,
+        draw: CompactDraw,
+        captions: Sequence[str],
+        index: DeckIndex | None = None,
+    ) -> None:
+        self.draw = draw
+        self.captions = captions
+        self._index = index
+        self._cards: list[dict[str, Any]] | None = None
+
+    def _expand(self) -> list[dict[str, Any]]:
+        if self._cards is None:
+            index = self._index
+            if index is None:
+                from app.core.assets import get_deck
+
+                try:
+                    index = get_deck(self.draw.deck_id)["index"]
+                except KeyError as exc:
+                    raise StaleDeckError(f"Unknown deck {self.draw.deck_id}") from exc
+            cards = []
+            items = self.draw.items(index.keys)
+            for item, caption in zip(items, self.captions, strict=True):
+                pos = index.positions[item.key]
+                cards.append(
+                    {
+                        "key": item.key,
+                        "file": index.files[pos],
+                        "display": index.display[pos],
+                        "caption": caption,
+                        "reversed": item.reversed,
+                    }
+                )
+            self._cards = cards
+        return self._cards
+
+    @overload
+    def __getitem__(self, i: int) -> dict[str, Any]: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[dict[str, Any]]: ...
+
+    def __getitem__(self, i: int | slice) -> dict[str, Any] | list[dict[str, Any]]:
+        return self._expand()[i]
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        return iter(self._expand())
+
+    def __len__(self) -> int:
+        return len(self.captions)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, LazyCards):
+            return self.draw == other.draw and list(self.captions) == list(
+                other.captions
+            )
+        if isinstance(other, list):
+            return self._expand() == other
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"LazyCards({self.draw.deck_id}/{self.draw.spread_id}, {len(self)})"
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Only the compact draw crosses process boundaries; captions are the
+        # spread's own list, which pickle's memo shares with the spread.
+        return (LazyCards, (self.draw, self.captions))
+
+
+def draw_facts(
+    draw: CompactDraw, facts: Mapping[str, Any] | None = None
+) -> dict[str, Any]:
+    """Return ``Draw.facts_json`` storing ``draw`` as its token.
+
+    Other ``facts``, e.g. card names for the writer, are kept; ``cards`` and
+    ``runes`` lists are dropped since the token already holds the drawn
+    items.  :mod:`app.core.draw.audit` replays rows in this form.
+    """
+
+    kept = {k: v for k, v in (facts or {}).items() if k not in ("cards", "runes")}
+    return {**kept, "draw": draw.token()}
+
+
+def expand(data: dict[str, Any]) -> dict[str, Any]:
+    """Return ``data`` with every :class:`LazyCards` turned into a list."""
+
+    return {
+        key: list(value) if isinstance(value, LazyCards) else value
+        for key, value in data.items()
+    }
+
+
+__all__ = [
+    "CompactDraw",
+    "LazyCards",
+    "StaleDeckError",
+    "draw_facts",
+    "expand",
+    "pack_varints",
+    "unpack_varints",
+]
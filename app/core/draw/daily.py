@@ -0,0 +1,387 @@
+"""Precomputed daily draws.
+
+Draws are a pure function of ``(user_id, expert, spread_id, draw_date,
+nonce)``, so the nightly :func:`precompute` job materialises the next day's
+nonce 0 draws of active users for popular spreads ahead of the morning
+peak.  Every ``(date, expert, spread, deck)`` gets one packed, immutable
+file under ``DRAW_TABLE_DIR``::
+
+    <YYYYMMDD>/<expert>/<spread_id>/<deck_id>.drw
+
+holding a fixed header, the sorted user ids, the item indices of every row
+and one orientation bit per drawn item.  ``prepare`` calls
+:meth:`DailyDraws.draw`, which memory-maps the file once and binary-searches
+the user id; on a miss (no table, unknown user, other nonce, changed deck)
+it falls back to :func:`~app.core.draw.draw_unique`.  Tables are built with
+``draw_many(compat=True)``, so a hit returns exactly what ``draw_unique``
+would have drawn.
+
+User ids are database ids (``users.id``), the ids ``Draw.user_id`` and the
+pipeline's ``user_id`` parameter carry, so the seed of a table row is the
+seed of the request it serves.
+
+Reading needs neither NumPy nor the database; both are only imported by the
+job.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from importlib import import_module
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Literal, Sequence
+from uuid import uuid4
+
+from . import DrawItem, draw_unique
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from sqlalchemy.orm import Session
+
+    from app.core.assets import DeckIndex
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"DRW1"
+# magic, population, count, index itemsize, allow_reversed, rows, p_reversed,
+# digest of the item keys; padded to HEADER_SIZE so sections stay aligned.
+_HEADER = struct.Struct("<4sIHBBQd16s")
+HEADER_SIZE = 64
+_TYPECODES: dict[int, Literal["B", "H", "I"]] = {1: "B", 2: "H", 4: "I"}
+
+# Experts whose ``prepare`` reads daily tables.
+CARD_EXPERTS = ("tarot", "lenormand", "runes")
+
+
+def items_digest(items: Sequence[str]) -> bytes:
+    """Return the digest identifying the item order of a deck."""
+
+    return hashlib.sha256("\n".join(items).encode("utf-8")).digest()[:16]
+
+
+class DrawTable:
+    """Read-only view of one packed daily draw file."""
+
+    def __init__(self, path: Path | str) -> None:
+        with open(path, "rb") as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, population, count, itemsize, allow_reversed, rows, p_reversed, digest = (
+            _HEADER.unpack_from(self._map)
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a draw table")
+        self.population: int = population
+        self.count: int = count
+        self.rows: int = rows
+        self.allow_reversed = bool(allow_reversed)
+        self.p_reversed: float = p_reversed
+        self.digest: bytes = digest
+        self._flag_bytes = -(-self.count // 8)
+        view = memoryview(self._map)
+        start = HEADER_SIZE
+        end = start + self.rows * 8
+        self._users = view[start:end].cast("Q")
+        start, end = end, end + self.rows * self.count * itemsize
+        self._indices = view[start:end].cast(_TYPECODES[itemsize])
+        self._flags = view[end : end + self.rows * self._flag_bytes]
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def matches(
+        self,
+        items: Sequence[str],
+        count: int,
+        allow_reversed: bool,
+        p_reversed: float,
+    ) -> bool:
+        """Whether the table was built for these draw parameters."""
+
+        return (
+            self.population == len(items)
+            and self.count == count
+            and self.allow_reversed == allow_reversed
+            and (not allow_reversed or self.p_reversed == p_reversed)
+            and self.digest == items_digest(items)
+        )
+
+    def get(self, user_id: int) -> list[tuple[int, bool]] | None:
+        """Return ``(index, reversed)`` pairs drawn for ``user_id``."""
+
+        row = bisect_left(self._users, user_id)
+        if row == self.rows or self._users[row] != user_id:
+            return None
+        start = row * self.count
+        indices = self._indices[start : start + self.count].tolist()
+        bits = self._flags[row * self._flag_bytes : (row + 1) * self._flag_bytes]
+        return [
+            (index, bool(bits[i >> 3] & (0x80 >> (i & 7))))
+            for i, index in enumerate(indices)
+        ]
+
+
+def write_table(
+    path: Path | str,
+    user_ids: Iterable[int],
+    items: Sequence[str],
+    count: int,
+    *,
+    expert: str,
+    spread_id: str,
+    draw_date: date,
+    allow_reversed: bool = False,
+    p_reversed: float = 0.5,
+) -> int:
+    """Draw nonce 0 of ``user_ids`` and write them as a table to ``path``.
+
+    The file is replaced atomically.
+
+    Returns:
+        Number of rows written.
+    """
+
+    import numpy as np
+
+    from .batch import draw_many, index_dtype
+
+    users = np.unique(np.fromiter(user_ids, dtype=np.uint64))
+    batch = draw_many(
+        len(items),
+        count,
+        user_ids=users.tolist(),
+        expert=expert,
+        spread_id=spread_id,
+        draw_date=draw_date,
+        allow_reversed=allow_reversed,
+        p_reversed=p_reversed,
+        compat=True,
+    )
+    dtype = index_dtype(len(items))
+    header = _HEADER.pack(
+        MAGIC,
+        len(items),
+        count,
+        dtype.itemsize,
+        allow_reversed,
+        len(users),
+        p_reversed,
+        items_digest(items),
+    )
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid4().hex}")
+    with open(tmp, "wb") as fh:
+        fh.write(header.ljust(HEADER_SIZE, b"\0"))
+        fh.write(users.tobytes())
+        fh.write(batch.indices.astype(dtype, copy=False).tobytes())
+        fh.write(np.packbits(batch.reversed, axis=1).tobytes())
+    os.replace(tmp, path)
+    return len(users)
+
+
+class DailyDraws:
+    """Look draws up in precomputed tables under ``root``."""
+
+    def __init__(self, root: Path | str | None = None, max_open: int = 256) -> None:
+        self.root = Path(root) if root else None
+        self.max_open = max_open
+        self.hits = 0
+        self.misses = 0
+        self._tables: OrderedDict[tuple[Path, int], DrawTable] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, expert: str, spread_id: str, deck_id: str, draw_date: date) -> Path:
+        """Return the table path of one spread and deck on ``draw_date``."""
+
+        if self.root is None:
+            raise ValueError("DRAW_TABLE_DIR is not configured")
+        return self.root / f"{draw_date:%Y%m%d}" / expert / spread_id / f"{deck_id}.drw"
+
+    def table(
+        self, expert: str, spread_id: str, deck_id: str, draw_date: date
+    ) -> DrawTable | None:
+        """Return the open table for the arguments, if one was written."""
+
+        path = self.path(expert, spread_id, deck_id, draw_date)
+        try:
+            key = (path, path.stat().st_mtime_ns)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                self._tables.move_to_end(key)
+                return table
+            try:
+                table = DrawTable(path)
+            except (OSError, ValueError) as exc:
+                log.warning("Ignoring draw table %s: %s", path, exc)
+                return None
+            self._tables[key] = table
+            while len(self._tables) > self.max_open:
+                self._tables.popitem(last=False)
+            return table
+
+    def draw(
+        self,
+        items: Sequence[str],
+        count: int,
+        *,
+        user_id: int | str,
+        expert: str,
+        spread_id: str,
+        deck_id: str,
+        draw_date: date,
+        nonce: int = 0,
+        allow_reversed: bool = False,
+        p_reversed: float = 0.5,
+    ) -> list[DrawItem]:
+        """Return the precomputed draw or fall back to ``draw_unique``.
+
+        Arguments are those of :func:`~app.core.draw.draw_unique` plus
+        ``deck_id``.
+        """
+
+        if self.root is not None and nonce == 0 and isinstance(user_id, int):
+            table = self.table(expert, spread_id, deck_id, draw_date)
+            if table is not None and table.matches(
+                items, count, allow_reversed, p_reversed
+            ):
+                row = table.get(user_id)
+                if row is not None:
+                    self.hits += 1
+                    return [DrawItem(items[i], rev) for i, rev in row]
+        self.misses += 1
+        return draw_unique(
+            items,
+            count,
+            user_id=user_id,
+            expert=expert,
+            spread_id=spread_id,
+            draw_date=draw_date,
+            nonce=nonce,
+            allow_reversed=allow_reversed,
+            p_reversed=p_reversed,
+        )
+
+
+DAILY_DRAWS = DailyDraws(os.environ.get("DRAW_TABLE_DIR") or None)
+
+
+def popular_spreads(
+    session: Session, *, days: int = 7, limit: int = 10
+) -> list[tuple[str, str, str]]:
+    """Return the ``limit`` most drawn ``(expert, spread_id, deck_id)``."""
+
+    from sqlalchemy import func, select
+
+    from app.db.models import Draw
+
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    stmt = (
+        select(Draw.expert, Draw.spread_id, Draw.deck_id)
+        .where(Draw.created_at >= since, Draw.expert.in_(CARD_EXPERTS))
+        .group_by(Draw.expert, Draw.spread_id, Draw.deck_id)
+        .order_by(func.count().desc())
+        .limit(limit)
+    )
+    return [(e, s, d) for e, s, d in session.execute(stmt)]
+
+
+def active_users(session: Session, *, days: int = 7) -> list[int]:
+    """Return ids (``users.id``) of users seen in the last ``days`` days."""
+
+    from sqlalchemy import select
+
+    from app.db.models import User
+
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    stmt = select(User.id).where(User.last_seen >= since)
+    return list(session.scalars(stmt.execution_options(yield_per=10000)))
+
+
+def _deck(session: Session, deck_id: str) -> DeckIndex:
+    from sqlalchemy import select
+
+    from app.core.assets import DeckIndex as Index
+    from app.db.models import Deck
+
+    manifest = session.scalar(select(Deck.config_json).where(Deck.deck_id == deck_id))
+    if manifest is None:
+        raise KeyError(deck_id)
+    items_key = next(k for k in ("cards", "runes", "signs") if k in manifest)
+    return Index.from_manifest(deck_id, manifest, items_key)
+
+
+def precompute(
+    session: Session,
+    draw_date: date | None = None,
+    *,
+    spreads: Sequence[tuple[str, str, str]] | None = None,
+    days: int = 7,
+    top: int = 10,
+    draws: DailyDraws | None = None,
+) -> dict[tuple[str, str, str], int]:
+    """Write tables of active users for popular or given ``spreads``.
+
+    Args:
+        session: Database session to read users, draws and decks from.
+        draw_date: Day to draw for; tomorrow by default.
+        spreads: ``(expert, spread_id, deck_id)`` triples; the ``top`` most
+            drawn of the last ``days`` days by default.
+        days: Window for active users and popular spreads.
+        top: Number of popular spreads.
+        draws: Lookup whose ``root`` receives the tables.
+
+    Returns:
+        Rows written per spread.
+    """
+
+    draws = draws or DAILY_DRAWS
+    draw_date = draw_date or date.today() + timedelta(days=1)
+    if spreads is None:
+        spreads = popular_spreads(session, days=days, limit=top)
+    users = active_users(session, days=days)
+    written: dict[tuple[str, str, str], int] = {}
+    for expert, spread_id, deck_id in spreads:
+        module = import_module(f"app.experts.{expert}")
+        index = _deck(session, deck_id)
+        written[(expert, spread_id, deck_id)] = write_table(
+            draws.path(expert, spread_id, deck_id, draw_date),
+            users,
+            index.keys,
+            len(module.SPREADS[spread_id].captions),
+            expert=expert,
+            spread_id=spread_id,
+            draw_date=draw_date,
+            **module.draw_options(index),
+        )
+        log.info(
+            "Precomputed %d %s/%s/%s draws for %s",
+            written[(expert, spread_id, deck_id)],
+            expert,
+            spread_id,
+            deck_id,
+            draw_date,
+        )
+    return written
+
+
+__all__ = [
+    "CARD_EXPERTS",
+    "DAILY_DRAWS",
+    "DailyDraws",
+    "DrawTable",
+    "active_users",
+    "items_digest",
+    "popular_spreads",
+    "precompute",
+    "write_table",
+]
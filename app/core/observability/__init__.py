@@ -0,0 +1,199 @@
+"""Spans and histograms for plugin stages and image encoding.
+
+:func:`stage_span` wraps one ``Plugin`` stage and :func:`encode_span` one
+:func:`~app.core.compose.save_image` call.  Both open an OpenTelemetry span
+carrying ``plugin_id``, ``spread_id``, card count, image bytes and chosen
+quality where known, and observe Prometheus histograms registered in the
+default registry, so they are served by the ``Instrumentator`` endpoint of
+the API next to the HTTP metrics.
+
+The module reads no settings: spans are no-ops until the application
+installs a tracer provider.  Compose may run in a render worker process
+whose metrics nobody scrapes, so :func:`capture` buffers observations in
+the worker and :func:`replay` records them in the API process; trace
+context crosses the process boundary with :func:`inject_context` and
+:func:`attach_context`.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Mapping, Sequence
+
+from opentelemetry import context as otel_context
+from opentelemetry import propagate, trace
+from opentelemetry.trace import Span, Status, StatusCode
+from prometheus_client import Histogram
+
+tracer = trace.get_tracer(__name__)
+
+STAGE_SECONDS = Histogram(
+    "plugin_stage_seconds",
+    "Duration of plugin stages",
+    ["plugin_id", "stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+ENCODE_SECONDS = Histogram(
+    "image_encode_seconds",
+    "Duration of save_image",
+    ["format", "mode"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+ENCODE_BYTES = Histogram(
+    "image_encode_bytes",
+    "Size of images produced by save_image",
+    ["format"],
+    buckets=(16e3, 64e3, 128e3, 256e3, 512e3, 1e6, 2e6, 3e6, 5e6),
+)
+ENCODE_QUALITY = Histogram(
+    "image_encode_quality",
+    "Quality chosen by save_image",
+    ["format"],
+    buckets=(20, 30, 40, 50, 60, 70, 80, 90, 100),
+)
+
+Observation = tuple[str, tuple[str, ...], float]
+
+_local = threading.local()
+
+
+def _observe(name: str, labels: tuple[str, ...], value: float) -> None:
+    buffer: list[Observation] | None = getattr(_local, "buffer", None)
+    if buffer is not None:
+        buffer.append((name, labels, value))
+    else:
+        _HISTOGRAMS[name].labels(*labels).observe(value)
+
+
+_HISTOGRAMS: dict[str, Histogram] = {
+    "stage_seconds": STAGE_SECONDS,
+    "encode_seconds": ENCODE_SECONDS,
+    "encode_bytes": ENCODE_BYTES,
+    "encode_quality": ENCODE_QUALITY,
+}
+
+
+def stage_attributes(data: Mapping[str, Any]) -> dict[str, Any]:
+    """Return span attributes describing stage input or output ``data``."""
+
+    attributes: dict[str, Any] = {}
+    spread = data.get("spread")
+    spread_id = data.get("spread_id") or getattr(spread, "spread_id", None)
+    if spread_id:
+        attributes["spread_id"] = str(spread_id)
+    # The runes expert carries its draw under ``runes``.
+    cards = data.get("cards", data.get("runes"))
+    if isinstance(cards, Sequence) and not isinstance(cards, str):
+        attributes["card_count"] = len(cards)
+    image = data.get("image")
+    if isinstance(image, (bytes, bytearray)):
+        attributes["image_bytes"] = len(image)
+    return attributes
+
+
+@contextmanager
+def stage_span(
+    plugin_id: str, stage: str, data: Mapping[str, Any] | None = None
+) -> Iterator[Span]:
+    """Trace and time stage ``stage`` of ``plugin_id`` run on ``data``.
+
+    Callers may add attributes of the stage output with
+    :func:`stage_attributes` on the yielded span.
+    """
+
+    attributes = {"plugin_id": plugin_id, "stage": stage}
+    if data is not None:
+        attributes.update(stage_attributes(data))
+    start = time.perf_counter()
+    with tracer.start_as_current_span(
+        f"plugin.{stage}", attributes=attributes, record_exception=True
+    ) as span:
+        try:
+            yield span
+        except BaseException as exc:
+            span.set_status(Status(StatusCode.ERROR, str(exc)))
+            raise
+        finally:
+            _observe("stage_seconds", (plugin_id, stage), time.perf_counter() - start)
+
+
+@contextmanager
+def encode_span(
+    fmt: str, mode: str, hint: str | None = None
+) -> Iterator[dict[str, int]]:
+    """Trace and time one image encode.
+
+    The caller stores ``bytes`` and ``quality`` of the result in the yielded
+    dict.
+    """
+
+    result: dict[str, int] = {}
+    attributes = {"format": fmt, "mode": mode}
+    if hint:
+        attributes["hint"] = hint
+    start = time.perf_counter()
+    with tracer.start_as_current_span("image.encode", attributes=attributes) as span:
+        yield result
+        span.set_attribute("image_bytes", result.get("bytes", 0))
+        span.set_attribute("quality", result.get("quality", 0))
+    _observe("encode_seconds", (fmt, mode), time.perf_counter() - start)
+    if "bytes" in result:
+        _observe("encode_bytes", (fmt,), result["bytes"])
+    if "quality" in result:
+        _observe("encode_quality", (fmt,), result["quality"])
+
+
+@contextmanager
+def capture() -> Iterator[list[Observation]]:
+    """Buffer histogram observations of this thread instead of recording."""
+
+    previous = getattr(_local, "buffer", None)
+    buffer: list[Observation] = []
+    _local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        _local.buffer = previous
+
+
+def replay(observations: list[Observation]) -> None:
+    """Record observations buffered by :func:`capture`, e.g. in a worker."""
+
+    for name, labels, value in observations:
+        _observe(name, labels, value)
+
+
+def inject_context() -> dict[str, str]:
+    """Return the current trace context as a picklable carrier."""
+
+    carrier: dict[str, str] = {}
+    propagate.inject(carrier)
+    return carrier
+
+
+@contextmanager
+def attach_context(carrier: Mapping[str, str]) -> Iterator[None]:
+    """Run the block in the trace context of ``carrier``."""
+
+    token = otel_context.attach(propagate.extract(carrier))
+    try:
+        yield
+    finally:
+        otel_context.detach(token)
+
+
+__all__ = [
+    "ENCODE_BYTES",
+    "ENCODE_QUALITY",
+    "ENCODE_SECONDS",
+    "STAGE_SECONDS",
+    "attach_context",
+    "capture",
+    "encode_span",
+    "inject_context",
+    "replay",
+    "stage_attributes",
+    "stage_span",
+]
@@ -2,10 +2,13 @@ from __future__ import annotations
 
 import logging
 import pkgutil
+import threading
 from dataclasses import dataclass
 from importlib import import_module
 from typing import Any, Callable, Dict, Sequence
 
+from .manifest import MANIFEST, PluginSpec
+
 log = logging.getLogger(__name__)
 
 
@@ -26,6 +29,39 @@ class Plugin:
 
 Registry = Dict[str, Plugin]
 _registry: Registry = {}
+_load_lock = threading.Lock()
+
+_STAGES = ("form_steps", "prepare", "compose", "write", "verify", "cta")
+
+
+class _LazyStage:
+    """Stage callable that imports its plugin module on the first call."""
+
+    __slots__ = ("plugin_id", "stage")
+
+    def __init__(self, plugin_id: str, stage: str) -> None:
+        self.plugin_id = plugin_id
+        self.stage = stage
+
+    def __call__(self, arg: Any) -> Any:
+        return getattr(load(self.plugin_id), self.stage)(arg)
+
+    def __repr__(self) -> str:
+        return f"<lazy {self.plugin_id}.{self.stage}>"
+
+
+def _lazy_plugin(spec: PluginSpec) -> Plugin:
+    stages = {stage: _LazyStage(spec.plugin_id, stage) for stage in _STAGES}
+    return Plugin(
+        plugin_id=spec.plugin_id,
+        cost=spec.cost,
+        products_supported=tuple(spec.products_supported),
+        **stages,
+    )
+
+
+def _is_lazy(plugin: Plugin) -> bool:
+    return isinstance(plugin.prepare, _LazyStage)
 
 
 def register(plugin: Plugin) -> None:
@@ -37,14 +73,24 @@ def register(plugin: Plugin) -> None:
 
 
 def discover() -> Registry:
-    """Discover and load plugins from :mod:`app.experts`."""
+    """Discover plugins from the manifest and :mod:`app.experts`.
+
+    Plugins listed in :data:`~app.core.plugins.manifest.MANIFEST` are
+    registered as lazy plugins whose stages import the module on first call.
+    Other modules of :mod:`app.experts` are imported eagerly.
+    """
 
     if _registry:
         return _registry
 
+    for spec in MANIFEST:
+        register(_lazy_plugin(spec))
+    listed = {spec.module for spec in MANIFEST}
     package = import_module("app.experts")
     for _, name, _ in pkgutil.iter_modules(package.__path__):
         module_name = f"{package.__name__}.{name}"
+        if module_name in listed:
+            continue
         try:
             module = import_module(module_name)
         except Exception as exc:  # pragma: no cover - defensive
@@ -61,10 +107,41 @@ def discover() -> Registry:
     return _registry
 
 
+def load(plugin_id: str) -> Plugin:
+    """Import plugin ``plugin_id`` and return its real :class:`Plugin`.
+
+    The lazy registry entry is replaced, so later lookups skip the proxy.
+
+    Raises:
+        KeyError: If ``plugin_id`` is not registered.
+        ValueError: If the module does not expose the manifest's plugin.
+    """
+
+    plugin = discover()[plugin_id]
+    if not _is_lazy(plugin):
+        return plugin
+    spec = next(spec for spec in MANIFEST if spec.plugin_id == plugin_id)
+    with _load_lock:
+        plugin = _registry[plugin_id]
+        if not _is_lazy(plugin):
+            return plugin
+        module = import_module(spec.module)
+        real = getattr(module, "plugin", None)
+        if not isinstance(real, Plugin) or real.plugin_id != plugin_id:
+            raise ValueError(f"Module '{spec.module}' does not expose '{plugin_id}'")
+        if real.cost != spec.cost or tuple(real.products_supported) != tuple(
+            spec.products_supported
+        ):
+            log.warning("Manifest entry of '%s' is out of date", plugin_id)
+        _registry[plugin_id] = real
+        log.debug("Loaded plugin '%s'", plugin_id)
+        return real
+
+
 def available() -> list[str]:
     """Return identifiers of all registered plugins."""
 
     return sorted(discover().keys())
 
 
-__all__ = ["Plugin", "register", "discover", "available"]
+__all__ = ["Plugin", "PluginSpec", "register", "discover", "load", "available"]
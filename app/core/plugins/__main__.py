@@ -1,14 +1,55 @@
 from __future__ import annotations
 
+import argparse
+import json
+import logging
+from pathlib import Path
+from typing import Sequence
+
 from . import available, discover
 
 
-def main() -> None:
-    """Print identifiers of all discovered plugins."""
+def main(argv: Sequence[str] | None = None) -> None:
+    """Print identifiers of all discovered plugins or benchmark them."""
+
+    parser = argparse.ArgumentParser(prog="python -m app.core.plugins")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("list", help="print plugin identifiers (default)")
+    bench = commands.add_parser("bench", help="time plugin stages on synthetic inputs")
+    bench.add_argument("plugins", nargs="*", help="plugins to run (default: all)")
+    bench.add_argument("-n", "--iterations", type=int, default=20)
+    bench.add_argument("--warmup", type=int, default=1)
+    bench.add_argument("--card-width", type=int, default=300)
+    bench.add_argument("--assets", type=Path, default=Path("assets"))
+    bench.add_argument("--json", metavar="PATH", help="write JSON report, - for stdout")
+    args = parser.parse_args(argv)
 
     discover()
-    for plugin_id in available():
-        print(plugin_id)
+    if args.command != "bench":
+        for plugin_id in available():
+            print(plugin_id)
+        return
+
+    from .bench import format_report, run_bench
+
+    logging.basicConfig(level=logging.WARNING)
+    unknown = set(args.plugins) - set(available())
+    if unknown:
+        parser.error(f"unknown plugins: {', '.join(sorted(unknown))}")
+    report = run_bench(
+        args.plugins,
+        iterations=args.iterations,
+        warmup=args.warmup,
+        card_width=args.card_width,
+        assets=args.assets,
+    )
+    if args.json == "-":
+        print(json.dumps(report, indent=2))
+        return
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    for line in format_report(report):
+        print(line)
 
 
 if __name__ == "__main__":  # pragma: no cover - CLI utility
@@ -0,0 +1,366 @@
+"""Per-stage benchmark of the registered plugins.
+
+``python -m app.core.plugins bench`` runs ``prepare → compose → write →
+verify`` of every plugin over synthetic inputs: every spread of the card
+experts on generated decks, several birth datetimes for astrology, long
+dream texts and so on.  Each stage is timed separately and reported as
+p50/p95/p99 together with throughput, as a table or as JSON meant to be
+diffed between releases.
+
+Cases share one process, and ``ru_maxrss`` is a process-wide peak that
+never goes down, so memory is reported per case as the high-water mark
+after the case (``rss_high_water_kb``) and how much the case raised it
+(``rss_growth_kb``).  A case that stays under an earlier peak shows no
+growth even if it allocated a lot.
+
+Decks are generated in a temporary assets root and ingested into an
+in-memory SQLite database, so runs are repeatable and touch no real data.
+The in-memory collage cache is cleared before every iteration so compose
+measures rendering rather than cache hits; decoded card images stay cached
+as they do in a long-running worker.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from importlib import import_module
+from pathlib import Path
+from typing import Any, Callable, Iterator, Sequence
+
+from . import available, load
+from .pipeline import STAGES
+
+# Manifest list key, items directory and item count of the card experts.
+CARD_DECKS: dict[str, tuple[str, str, int]] = {
+    "tarot": ("cards", "cards", 78),
+    "lenormand": ("cards", "cards", 36),
+    "runes": ("runes", "runes", 24),
+}
+
+BIRTHS = (
+    ("1985-03-21", "06:30", 55.75, 37.62),
+    ("1990-07-04", "23:15", 40.71, -74.01),
+    ("2001-12-31", None, -33.87, 151.21),
+    ("1972-09-09", "12:00", 0.0, 0.0),
+)
+
+NAMES = (
+    ("John Smith", "en"),
+    ("Анна Каренина", "ru"),
+    ("Mary-Jane Watson", "en"),
+    ("Пётр Ильич Чайковский", "ru"),
+)
+
+DREAM_WORDS = 1500
+
+log = logging.getLogger(__name__)
+
+Inputs = Callable[[int], dict[str, Any]]
+
+
+@dataclass
+class CaseReport:
+    """Timings of one plugin input case."""
+
+    plugin_id: str
+    case: str
+    samples: dict[str, list[float]] = field(
+        default_factory=lambda: {stage: [] for stage in (*STAGES, "total")}
+    )
+    errors: int = 0
+    rss_high_water_kb: int = 0
+    rss_growth_kb: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        total = sum(self.samples["total"])
+        return {
+            "plugin": self.plugin_id,
+            "case": self.case,
+            "iterations": len(self.samples["total"]),
+            "errors": self.errors,
+            "stages": {
+                stage: summarize(values) for stage, values in self.samples.items()
+            },
+            "throughput_rps": len(self.samples["total"]) / total if total else 0.0,
+            "rss_high_water_kb": self.rss_high_water_kb,
+            "rss_growth_kb": self.rss_growth_kb,
+        }
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Return the nearest-rank ``q`` percentile of ``values``."""
+
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(values: Sequence[float]) -> dict[str, float]:
+    """Return mean and p50/p95/p99 of ``values`` in milliseconds."""
+
+    ms = [v * 1000 for v in values]
+    return {
+        "mean_ms": sum(ms) / len(ms) if ms else 0.0,
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+    }
+
+
+def peak_rss_kb() -> int:
+    """Return peak resident set size of this process in KiB."""
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _make_deck(root: Path, plugin_id: str, card_width: int) -> str:
+    from PIL import Image
+
+    items_key, items_dir, count = CARD_DECKS[plugin_id]
+    deck_id = f"bench_{plugin_id}"
+    deck_dir = root / plugin_id / deck_id
+    (deck_dir / items_dir).mkdir(parents=True)
+    size = (card_width, card_width if plugin_id == "runes" else card_width * 5 // 3)
+    Image.new("RGB", size, "black").save(deck_dir / "back.png")
+    for i in range(count):
+        color = (i * 37 % 256, i * 91 % 256, i * 53 % 256)
+        Image.new("RGB", size, color).save(deck_dir / items_dir / f"{i}.png")
+    manifest = {
+        "deck_id" if plugin_id != "runes" else "set_id": deck_id,
+        "name": {"en": deck_id},
+        "type": plugin_id,
+        "image": {
+            "aspect_ratio": "1:1" if plugin_id == "runes" else "3:5",
+            "allow_reversed": plugin_id != "lenormand",
+            "default_back": "back.png",
+        },
+        items_key: [
+            {
+                "key": f"{plugin_id}_{i}",
+                "display": {"en": f"Item {i}", "ru": f"Элемент {i}"},
+                "file": f"{i}.png",
+            }
+            for i in range(count)
+        ],
+    }
+    name = "set.json" if plugin_id == "runes" else "deck.json"
+    (deck_dir / name).write_text(json.dumps(manifest), encoding="utf-8")
+    return deck_id
+
+
+def _ingest(root: Path) -> None:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.core.assets import load_assets
+    from app.db.base import Base
+
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine, future=True)() as session:
+        load_assets(root, session)
+    engine.dispose()
+
+
+def _dream(i: int, lexicon: dict[str, Any]) -> str:
+    symbols = list(lexicon) or ["cat"]
+    words = []
+    for n in range(DREAM_WORDS):
+        words.append(symbols[(n + i) % len(symbols)] if n % 40 == 0 else "then")
+    return "I dreamt that " + " ".join(words) + "."
+
+
+def synthetic_cases(
+    plugin_id: str, root: Path, assets: Path, card_width: int
+) -> dict[str, Inputs]:
+    """Return input factories by case name for ``plugin_id``.
+
+    Card decks are generated under ``root/decks`` and the dream lexicon is
+    copied from ``assets`` to ``root/data``.
+    """
+
+    day = date(2024, 1, 1)
+    if plugin_id in CARD_DECKS:
+        decks_root = root / "decks"
+        deck_id = _make_deck(decks_root, plugin_id, card_width)
+        deck_key = "set_id" if plugin_id == "runes" else "deck_id"
+        spreads = import_module(f"app.experts.{plugin_id}").SPREADS
+        count = CARD_DECKS[plugin_id][2]
+
+        def card_case(spread_id: str) -> Inputs:
+            return lambda i: {
+                deck_key: deck_id,
+                "spread_id": spread_id,
+                "user_id": i,
+                "draw_date": day + timedelta(days=i),
+                "question": "What should I focus on?",
+                "locale": ("en", "ru")[i % 2],
+                "assets_root": str(decks_root),
+            }
+
+        return {
+            spread_id: card_case(spread_id)
+            for spread_id, spread in spreads.items()
+            if len(spread.captions) <= count
+        }
+    if plugin_id == "astrology":
+        return {
+            "births": lambda i: {
+                "birth_date": BIRTHS[i % len(BIRTHS)][0],
+                "birth_time": BIRTHS[i % len(BIRTHS)][1],
+                "lat": BIRTHS[i % len(BIRTHS)][2],
+                "lon": BIRTHS[i % len(BIRTHS)][3],
+                "locale": ("en", "ru")[i % 2],
+            }
+        }
+    if plugin_id == "numerology":
+        return {
+            "names": lambda i: {
+                "full_name": NAMES[i % len(NAMES)][0],
+                "birth_date": date(1970 + i % 40, 1 + i % 12, 1 + i % 28),
+                "target_date": day + timedelta(days=i),
+                "locale": NAMES[i % len(NAMES)][1],
+            }
+        }
+    if plugin_id == "dreams":
+        data_root = root / "data"
+        (data_root / "dreams").mkdir(parents=True, exist_ok=True)
+        shutil.copy(assets / "dreams" / "lexicon.json", data_root / "dreams")
+        lexicon = json.loads((assets / "dreams" / "lexicon.json").read_text("utf-8"))
+        return {
+            "long_text": lambda i: {
+                "dream": _dream(i, lexicon),
+                "locale": ("en", "ru")[i % 2],
+                "assets_root": str(data_root),
+            }
+        }
+    return {
+        "brief": lambda i: {
+            "theme": f"Theme {i % 7}",
+            "brief": "Short brief " * (1 + i % 5),
+            "user_id": i,
+            "locale": ("en", "ru")[i % 2],
+            "assets_root": str(root),
+        }
+    }
+
+
+def _run_case(
+    plugin_id: str, case: str, inputs: Inputs, iterations: int, warmup: int
+) -> CaseReport:
+    from app.core.compose import COLLAGE_CACHE
+
+    plugin = load(plugin_id)
+    report = CaseReport(plugin_id, case)
+    before = peak_rss_kb()
+    backend, COLLAGE_CACHE.backend = COLLAGE_CACHE.backend, None
+    try:
+        for i in range(warmup + iterations):
+            COLLAGE_CACHE.clear()
+            data: Any = inputs(i)
+            timings: list[float] = []
+            try:
+                for stage in STAGES:
+                    start = time.perf_counter()
+                    data = getattr(plugin, stage)(data)
+                    timings.append(time.perf_counter() - start)
+            except Exception as exc:
+                if not report.errors:
+                    log.warning("%s:%s failed: %s", plugin_id, case, exc)
+                report.errors += 1
+                continue
+            if i < warmup:
+                continue
+            for stage, seconds in zip(STAGES, timings, strict=True):
+                report.samples[stage].append(seconds)
+            report.samples["total"].append(sum(timings))
+    finally:
+        COLLAGE_CACHE.backend = backend
+    report.rss_high_water_kb = peak_rss_kb()
+    report.rss_growth_kb = report.rss_high_water_kb - before
+    return report
+
+
+def run_bench(
+    plugin_ids: Sequence[str] | None = None,
+    *,
+    iterations: int = 20,
+    warmup: int = 1,
+    card_width: int = 300,
+    assets: Path = Path("assets"),
+) -> dict[str, Any]:
+    """Benchmark ``plugin_ids`` (all registered by default).
+
+    Returns:
+        JSON-serialisable report with per-case stage percentiles.
+    """
+
+    plugin_ids = list(plugin_ids or available())
+    reports: list[CaseReport] = []
+    with tempfile.TemporaryDirectory(prefix="plugin-bench-") as tmp:
+        root = Path(tmp)
+        cases = {
+            plugin_id: synthetic_cases(plugin_id, root, assets, card_width)
+            for plugin_id in plugin_ids
+        }
+        if any(plugin_id in CARD_DECKS for plugin_id in plugin_ids):
+            _ingest(root / "decks")
+        for plugin_id, factories in cases.items():
+            for case, inputs in factories.items():
+                reports.append(_run_case(plugin_id, case, inputs, iterations, warmup))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "warmup": warmup,
+            "card_width": card_width,
+            "plugins": plugin_ids,
+        },
+        "cases": [report.as_dict() for report in reports],
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def format_report(report: dict[str, Any]) -> Iterator[str]:
+    """Yield table lines of a :func:`run_bench` report."""
+
+    header = f"{'case':<40}" + "".join(f"{stage:>24}" for stage in (*STAGES, "total"))
+    yield header + f"{'req/s':>10}{'hwm MiB':>10}{'+MiB':>8}"
+    yield f"{'':<40}" + f"{'p50/p95/p99 ms':>24}" * (len(STAGES) + 1)
+    for case in report["cases"]:
+        cells = "".join(
+            "{p50_ms:>8.2f}{p95_ms:>8.2f}{p99_ms:>8.2f}".format(**stats)
+            for stats in case["stages"].values()
+        )
+        name = f"{case['plugin']}:{case['case']}"
+        if case["errors"]:
+            name += f" ({case['errors']} err)"
+        yield (
+            f"{name:<40}{cells}{case['throughput_rps']:>10.1f}"
+            f"{case['rss_high_water_kb'] / 1024:>10.1f}"
+            f"{case['rss_growth_kb'] / 1024:>8.1f}"
+        )
+
+
+__all__ = [
+    "CaseReport",
+    "format_report",
+    "peak_rss_kb",
+    "percentile",
+    "run_bench",
+    "summarize",
+    "synthetic_cases",
+]
@@ -0,0 +1,43 @@
+"""Static manifest of the bundled expert plugins.
+
+Listing plugins, pricing them and checking products only needs these
+fields, so :func:`app.core.plugins.discover` registers lazy plugins from the
+manifest without importing the expert modules and their heavy dependencies
+(matplotlib and swisseph for astrology, Pillow for the card experts).  An
+entry must match the ``plugin`` object its module exposes.
+
+``speculative_skip`` lists form steps that ``prepare`` and ``compose`` do
+not read: once every other step is answered the pipeline may render ahead
+(see :meth:`~app.core.plugins.pipeline.PipelineRunner.speculate`).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+
+
+@dataclass(frozen=True)
+class PluginSpec:
+    """Manifest entry of a plugin that is importable on demand."""
+
+    plugin_id: str
+    module: str
+    cost: int = 0
+    products_supported: Sequence[str] = ("basic",)
+    speculative_skip: tuple[str, ...] = ()
+
+
+MANIFEST: tuple[PluginSpec, ...] = (
+    PluginSpec("assistant", "app.experts.assistant"),
+    PluginSpec("astrology", "app.experts.astrology"),
+    PluginSpec("copywriter", "app.experts.copywriter"),
+    PluginSpec("dreams", "app.experts.dreams"),
+    PluginSpec("lenormand", "app.experts.lenormand", speculative_skip=("question",)),
+    PluginSpec("numerology", "app.experts.numerology"),
+    PluginSpec("runes", "app.experts.runes", speculative_skip=("question",)),
+    PluginSpec("tarot", "app.experts.tarot", speculative_skip=("question",)),
+)
+
+
+__all__ = ["MANIFEST", "PluginSpec"]
@@ -0,0 +1,378 @@
+"""Staged async runner for the :class:`~app.core.plugins.Plugin` contract.
+
+:class:`PipelineRunner` chains ``prepare → compose → write → verify`` and
+runs every stage where it belongs:
+
+* ``prepare`` and ``verify`` are usually cheap lookups and checks, but
+  ``prepare`` may validate a warm-started deck on first use, so both run on
+  a thread pool to keep the event loop free;
+* ``compose`` renders images and runs on the render executor (a process pool
+  by default, see :mod:`app.core.render`);
+* ``write`` is I/O bound; coroutine functions are awaited directly and
+  synchronous ones run on the same thread pool.
+
+Because every request only holds the event loop between stages, compose of
+one request overlaps with write of another.  Each stage has a timeout and
+its latency is recorded per result and in a rolling window on the runner;
+every stage is also traced and timed by :mod:`app.core.observability`.
+A timed-out stage is abandoned, not interrupted.  The draw date is pinned
+into the parameters once per request, so the request key and the draw agree
+even across midnight.
+
+Card draws never depend on the question, so :meth:`PipelineRunner.speculate`
+starts ``prepare`` and ``compose`` in the background as soon as every form
+step but those listed in the plugin's ``speculative_skip`` is answered.  A
+later :meth:`PipelineRunner.run` with the same answers picks up the
+collage and only waits for ``write`` and ``verify``.  Speculations nobody
+claims are discarded after ``speculation_ttl`` seconds.
+
+Identical concurrent requests (double taps, redelivered updates) are
+coalesced by :class:`~app.core.plugins.singleflight.SingleFlight` and share
+one result, across workers too when ``SINGLEFLIGHT_REDIS_URL`` is set.  A
+request is identified by the plugin (the expert) and all of its parameters:
+``user_id``, ``spread_id``, the pinned ``draw_date`` and ``nonce`` that fix
+the draw, plus the other answers such as deck, locale and question, so only
+requests with the same result are coalesced.  The parameters are hashed
+into the key, which keeps Redis key names short and free of user text.
+
+:func:`run_pipeline` and :func:`speculate` use a shared runner built by
+:func:`get_pipeline` on first use, since it starts a thread pool and may
+connect to Redis.  No bot handler calls them yet.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Callable, Mapping
+
+from app.core.observability import stage_attributes, stage_span
+from app.core.render import RENDER_EXECUTOR, RenderExecutor
+
+from . import Plugin, load
+from .manifest import MANIFEST
+from .singleflight import RedisLock, SingleFlight
+
+log = logging.getLogger(__name__)
+
+STAGES = ("prepare", "compose", "write", "verify")
+
+DEFAULT_TIMEOUTS: dict[str, float] = {
+    "prepare": 1.0,
+    "compose": 30.0,
+    "write": 60.0,
+    "verify": 5.0,
+}
+
+# Number of recent latencies kept per stage.
+LATENCY_WINDOW = 1024
+
+SPECULATION_TTL = 120.0
+MAX_SPECULATIONS = 1024
+
+_SPECULATIVE_SKIP = {spec.plugin_id: spec.speculative_skip for spec in MANIFEST}
+
+Staged = tuple[dict[str, Any], dict[str, float]]
+
+
+class PipelineError(RuntimeError):
+    """A pipeline stage failed."""
+
+    def __init__(self, plugin_id: str, stage: str, message: str) -> None:
+        super().__init__(f"{plugin_id}.{stage}: {message}")
+        self.plugin_id = plugin_id
+        self.stage = stage
+
+
+class PipelineTimeout(PipelineError):
+    """A pipeline stage exceeded its timeout."""
+
+
+@dataclass
+class PipelineResult:
+    """Output of one pipeline run."""
+
+    plugin_id: str
+    data: dict[str, Any]
+    verified: bool
+    timings: dict[str, float] = field(default_factory=dict)
+    speculative: bool = False
+
+    @property
+    def seconds(self) -> float:
+        return sum(self.timings.values())
+
+
+def _pin_date(params: Mapping[str, Any]) -> dict[str, Any]:
+    return {"draw_date": date.today(), **params}
+
+
+class PipelineRunner:
+    """Run plugin stages on their executors with timeouts and latencies."""
+
+    def __init__(
+        self,
+        renderer: RenderExecutor | None = None,
+        *,
+        timeouts: Mapping[str, float] | None = None,
+        io_workers: int = 8,
+        speculation_ttl: float = SPECULATION_TTL,
+        singleflight: SingleFlight[PipelineResult] | None = None,
+    ) -> None:
+        unknown = set(timeouts or {}) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+        self.renderer = renderer or RENDER_EXECUTOR
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.latencies: dict[str, deque[float]] = {
+            stage: deque(maxlen=LATENCY_WINDOW) for stage in STAGES
+        }
+        self._io = ThreadPoolExecutor(io_workers, thread_name_prefix="pipeline-io")
+        self.speculation_ttl = speculation_ttl
+        # An idle SingleFlight is empty and thus falsy.
+        self.singleflight = singleflight if singleflight is not None else SingleFlight()
+        self._speculations: OrderedDict[
+            tuple[str, str], tuple[float, asyncio.Task[Staged]]
+        ] = OrderedDict()
+
+    async def _stage(
+        self,
+        plugin_id: str,
+        stage: str,
+        timings: dict[str, float],
+        fn: Callable[[], Any],
+        data: dict[str, Any],
+    ) -> Any:
+        timeout = self.timeouts[stage]
+        start = time.perf_counter()
+        try:
+            with stage_span(plugin_id, stage, data) as span:
+                result = await asyncio.wait_for(fn(), timeout)
+                if isinstance(result, dict):
+                    span.set_attributes(stage_attributes(result))
+        except asyncio.TimeoutError as exc:
+            raise PipelineTimeout(
+                plugin_id, stage, f"timed out after {timeout}s"
+            ) from exc
+        except Exception as exc:
+            raise PipelineError(
+                plugin_id, stage, str(exc) or type(exc).__name__
+            ) from exc
+        elapsed = time.perf_counter() - start
+        timings[stage] = elapsed
+        self.latencies[stage].append(elapsed)
+        return result
+
+    async def _in_io(
+        self, fn: Callable[[dict[str, Any]], Any], data: dict[str, Any]
+    ) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._io, fn, data)
+
+    async def _write(
+        self, fn: Callable[[dict[str, Any]], Any], data: dict[str, Any]
+    ) -> dict[str, Any]:
+        if inspect.iscoroutinefunction(fn):
+            result: dict[str, Any] = await fn(data)
+            return result
+        written: dict[str, Any] = await self._in_io(fn, data)
+        return written
+
+    async def _prepare_compose(
+        self, plugin_id: str, plugin: Plugin, params: dict[str, Any]
+    ) -> Staged:
+        timings: dict[str, float] = {}
+        prepared = await self._stage(
+            plugin_id,
+            "prepare",
+            timings,
+            lambda: self._in_io(plugin.prepare, params),
+            params,
+        )
+        composed = await self._stage(
+            plugin_id,
+            "compose",
+            timings,
+            lambda: self.renderer.render(plugin_id, prepared),
+            prepared,
+        )
+        return composed, timings
+
+    @staticmethod
+    def _request_key(
+        plugin_id: str, params: Mapping[str, Any], skip: tuple[str, ...] = ()
+    ) -> tuple[str, str]:
+        relevant = {key: value for key, value in params.items() if key not in skip}
+        payload = json.dumps(relevant, sort_keys=True, default=str)
+        digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=16)
+        return plugin_id, digest.hexdigest()
+
+    def _speculation_key(
+        self, plugin_id: str, params: Mapping[str, Any]
+    ) -> tuple[str, str]:
+        return self._request_key(
+            plugin_id, params, _SPECULATIVE_SKIP.get(plugin_id, ())
+        )
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._speculations:
+            key, (expires, task) = next(iter(self._speculations.items()))
+            if expires > now and len(self._speculations) <= MAX_SPECULATIONS:
+                break
+            del self._speculations[key]
+            task.cancel()
+
+    def speculate(self, plugin_id: str, answers: dict[str, Any]) -> bool:
+        """Start ``prepare`` and ``compose`` ahead of the remaining answers.
+
+        Must be called from the event loop that later awaits :meth:`run`.
+        Nothing starts while a form step other than the plugin's
+        ``speculative_skip`` steps is unanswered.
+
+        Returns:
+            Whether a speculation for ``answers`` is in flight.
+        """
+
+        skip = _SPECULATIVE_SKIP.get(plugin_id, ())
+        if not skip:
+            return False
+        plugin = load(plugin_id)
+        steps = plugin.form_steps(answers.get("locale", "en"))
+        if any(step["id"] not in answers for step in steps if step["id"] not in skip):
+            return False
+        self._expire()
+        params = _pin_date(answers)
+        key = self._speculation_key(plugin_id, params)
+        if key in self._speculations:
+            return True
+        task = asyncio.get_running_loop().create_task(
+            self._prepare_compose(plugin_id, plugin, params)
+        )
+        # Failures of unclaimed speculations are not errors of any request.
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._speculations[key] = (time.monotonic() + self.speculation_ttl, task)
+        return True
+
+    def _claim(
+        self, plugin_id: str, params: dict[str, Any]
+    ) -> asyncio.Task[Staged] | None:
+        if not self._speculations:
+            return None
+        self._expire()
+        entry = self._speculations.pop(self._speculation_key(plugin_id, params), None)
+        return entry[1] if entry is not None else None
+
+    async def run(self, plugin_id: str, params: dict[str, Any]) -> PipelineResult:
+        """Run all stages of ``plugin_id`` on ``params``.
+
+        Concurrent calls with identical arguments share one run and its
+        :class:`PipelineResult`.  Prepare and compose are taken from a
+        matching :meth:`speculate` call when one is in flight and has not
+        failed.
+
+        Raises:
+            KeyError: If ``plugin_id`` is not registered.
+            PipelineTimeout: If a stage exceeds its timeout.
+            PipelineError: If a stage raises.
+        """
+
+        # The key and the draw must use the same date, also across midnight.
+        params = _pin_date(params)
+        key = ":".join(self._request_key(plugin_id, params))
+        return await self.singleflight.do(key, lambda: self._run(plugin_id, params))
+
+    async def _run(self, plugin_id: str, params: dict[str, Any]) -> PipelineResult:
+        plugin = load(plugin_id)
+        staged: Staged | None = None
+        task = self._claim(plugin_id, params)
+        if task is not None:
+            try:
+                staged = await task
+            except PipelineError:
+                log.debug("Speculation for %s failed, running again", plugin_id)
+        if staged is not None:
+            composed, timings = staged
+            skip = _SPECULATIVE_SKIP.get(plugin_id, ())
+            composed = {**composed, **{k: params[k] for k in skip if k in params}}
+        else:
+            composed, timings = await self._prepare_compose(plugin_id, plugin, params)
+        written = await self._stage(
+            plugin_id,
+            "write",
+            timings,
+            lambda: self._write(plugin.write, composed),
+            composed,
+        )
+        verified = await self._stage(
+            plugin_id,
+            "verify",
+            timings,
+            lambda: self._in_io(plugin.verify, written),
+            written,
+        )
+        if not verified:
+            log.warning("Verification of %s output failed", plugin_id)
+        return PipelineResult(
+            plugin_id, written, bool(verified), timings, staged is not None
+        )
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancel pending speculations and stop the write thread pool."""
+
+        for _, task in self._speculations.values():
+            task.cancel()
+        self._speculations.clear()
+        self._io.shutdown(wait=wait)
+
+
+_pipeline: PipelineRunner | None = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> PipelineRunner:
+    """Return the shared runner, building it from the environment once."""
+
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = PipelineRunner(
+                    io_workers=int(os.environ.get("PIPELINE_IO_WORKERS", "8")),
+                    singleflight=SingleFlight(RedisLock.from_env()),
+                )
+    return _pipeline
+
+
+async def run_pipeline(plugin_id: str, params: dict[str, Any]) -> PipelineResult:
+    """Run ``plugin_id`` on ``params`` with the shared runner."""
+
+    return await get_pipeline().run(plugin_id, params)
+
+
+def speculate(plugin_id: str, answers: dict[str, Any]) -> bool:
+    """Render ahead for partial ``answers`` on the shared runner."""
+
+    return get_pipeline().speculate(plugin_id, answers)
+
+
+__all__ = [
+    "DEFAULT_TIMEOUTS",
+    "PipelineError",
+    "PipelineResult",
+    "PipelineRunner",
+    "PipelineTimeout",
+    "STAGES",
+    "get_pipeline",
+    "run_pipeline",
+    "speculate",
+]
@@ -0,0 +1,165 @@
+"""Single-flight coalescing of identical plugin requests.
+
+Double taps and redelivered Telegram updates produce identical requests
+(same user, expert, spread, date and nonce) at the same time.  Draws are
+deterministic, so one computation can serve all of them: :class:`SingleFlight`
+keeps one task per key and concurrent callers with the same key await it and
+share its result.  A caller that is cancelled does not cancel the others.
+
+Workers of one deployment coordinate through an optional :class:`RedisLock`
+(``SINGLEFLIGHT_REDIS_URL``): the first worker takes a lock, renews it while
+it computes and publishes the pickled result for ``result_ttl`` seconds, the
+others poll for it.  The result key only has to outlive the waiters' next
+poll, so it is kept for a couple of seconds: it coalesces concurrent runs and
+is not a result cache.  If the holder fails or dies its lock expires within
+``lock_ttl`` and a waiter computes the result itself.
+
+Results are unpickled, so the Redis instance is a trust boundary: anyone who
+can write to it can run code in the workers.  Point ``SINGLEFLIGHT_REDIS_URL``
+only at a Redis reachable by this deployment alone.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import pickle
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+from uuid import uuid4
+
+try:  # pragma: no cover - optional dependency
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - optional dependency
+    aioredis = None  # type: ignore[assignment]
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Deletes the lock only if it still holds our token.
+_RELEASE = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Extends the lock only if it still holds our token.
+_RENEW = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisLock:
+    """Cross-process single-flight through a Redis lock and result key."""
+
+    def __init__(
+        self,
+        client: Any,
+        *,
+        prefix: str = "singleflight:",
+        lock_ttl: float = 10.0,
+        result_ttl: float = 2.0,
+        poll: float = 0.05,
+    ) -> None:
+        self.client = client
+        self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.poll = poll
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of ``fn`` computed once across processes."""
+
+        lock_key = f"{self.prefix}lock:{key}"
+        result_key = f"{self.prefix}result:{key}"
+        token = uuid4().hex
+        while True:
+            cached = await self.client.get(result_key)
+            if cached is not None:
+                result: T = pickle.loads(cached)
+                return result
+            locked = await self.client.set(
+                lock_key, token, nx=True, px=int(self.lock_ttl * 1000)
+            )
+            if locked:
+                break
+            await asyncio.sleep(self.poll)
+        renew = asyncio.get_running_loop().create_task(self._renew(lock_key, token))
+        try:
+            result = await fn()
+            await self.client.set(
+                result_key,
+                pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL),
+                px=int(self.result_ttl * 1000),
+            )
+            return result
+        finally:
+            renew.cancel()
+            await self.client.eval(_RELEASE, 1, lock_key, token)
+
+    async def _renew(self, lock_key: str, token: str) -> None:
+        # Keeps the lock alive however long the run takes; a dead holder
+        # stops renewing and its lock expires within ``lock_ttl``.
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                await self.client.eval(
+                    _RENEW, 1, lock_key, token, int(self.lock_ttl * 1000)
+                )
+            except Exception as exc:
+                log.warning("Could not renew single-flight lock %s: %s", lock_key, exc)
+
+    @classmethod
+    def from_env(cls) -> RedisLock | None:
+        """Return a lock for ``SINGLEFLIGHT_REDIS_URL`` if configured."""
+
+        url = os.environ.get("SINGLEFLIGHT_REDIS_URL")
+        if not url:
+            return None
+        if aioredis is None:  # pragma: no cover - optional dependency
+            log.warning("SINGLEFLIGHT_REDIS_URL is set but redis is not installed")
+            return None
+        return cls(aioredis.Redis.from_url(url))
+
+
+class SingleFlight(Generic[T]):
+    """Coalesce concurrent calls with the same key into one computation."""
+
+    def __init__(self, lock: RedisLock | None = None) -> None:
+        self.lock = lock
+        self.coalesced = 0
+        self._inflight: dict[str, asyncio.Task[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of ``fn``, shared with concurrent ``key`` calls.
+
+        Exceptions of ``fn`` are raised to every caller.
+        """
+
+        task = self._inflight.get(key)
+        if task is None:
+
+            async def leader() -> T:
+                try:
+                    if self.lock is not None:
+                        return await self.lock.run(key, fn)
+                    return await fn()
+                finally:
+                    self._inflight.pop(key, None)
+
+            task = asyncio.get_running_loop().create_task(leader())
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+
+__all__ = ["RedisLock", "SingleFlight"]
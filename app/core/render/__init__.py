@@ -0,0 +1,190 @@
+"""Off-event-loop execution of plugin compose stages.
+
+Collages, the astrology wheel and the numerology grid are rendered by
+CPU-bound synchronous ``compose`` functions.  Calling them from aiogram
+handlers or the webhook coroutine would block the event loop for every other
+user, so :func:`render` runs them in a process pool (``RENDER_MODE=process``,
+the default) or a thread pool (``RENDER_MODE=thread``).  When a process pool
+cannot be started or breaks, the executor falls back to threads.
+
+Inputs are pickled in the caller so unpicklable data fails fast, and workers
+send back only the keys produced by ``compose`` (encoded image bytes, facts)
+rather than echoing the whole input.  Drawn cards travel as
+:class:`~app.core.draw.compact.LazyCards`, i.e. as compact draws that the
+worker expands from its own deck index.  Pool workers keep the index they
+were forked with, so when one cannot expand a deck the render is retried
+with expanded cards and that deck's cards are sent expanded for
+``stale_ttl`` seconds, instead of paying two round trips and a warning on
+every request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from app.core.draw.compact import LazyCards, StaleDeckError, expand
+from app.core.observability import attach_context, capture, inject_context, replay
+
+log = logging.getLogger(__name__)
+
+
+# Key of histogram observations buffered by a worker in its result.
+_OBSERVATIONS = "__observations__"
+STALE_DECK_TTL = 300.0
+
+
+def _lazy_decks(data: dict[str, Any]) -> set[str]:
+    return {v.draw.deck_id for v in data.values() if isinstance(v, LazyCards)}
+
+
+def _render_in_worker(
+    plugin_id: str, payload: bytes, carrier: dict[str, str]
+) -> dict[str, Any]:
+    from app.core.plugins import discover
+
+    data = pickle.loads(payload)
+    plugin = discover()[plugin_id]
+    with attach_context(carrier), capture() as observations:
+        result = plugin.compose(data)
+    delta = {
+        key: value
+        for key, value in result.items()
+        if key not in data or data[key] is not value
+    }
+    delta[_OBSERVATIONS] = observations
+    return delta
+
+
+class RenderExecutor:
+    """Run plugin ``compose`` stages off the event loop."""
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        mode: str = "process",
+        *,
+        stale_ttl: float = STALE_DECK_TTL,
+    ) -> None:
+        if mode not in {"process", "thread"}:
+            raise ValueError("mode must be process or thread")
+        self.workers = workers or os.cpu_count() or 1
+        self.mode = mode
+        self.stale_ttl = stale_ttl
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+        # Decks whose cards are sent expanded, until a monotonic deadline.
+        self._stale: dict[str, float] = {}
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.mode == "process":
+                    try:
+                        self._executor = ProcessPoolExecutor(self.workers)
+                    except (OSError, NotImplementedError) as exc:
+                        log.warning("Process pool unavailable, using threads: %s", exc)
+                        self.mode = "thread"
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        self.workers, thread_name_prefix="render"
+                    )
+            return self._executor
+
+    def _fallback_to_threads(self) -> None:
+        with self._lock:
+            if self.mode == "thread":
+                return
+            log.warning("Process pool broken, falling back to threads")
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+            self.mode = "thread"
+            self._stale.clear()
+
+    def _is_stale(self, decks: set[str]) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            for deck_id in decks & self._stale.keys():
+                if self._stale[deck_id] > now:
+                    return True
+                del self._stale[deck_id]
+        return False
+
+    def _mark_stale(self, decks: set[str]) -> bool:
+        """Send cards of ``decks`` expanded; return whether any was new."""
+
+        until = time.monotonic() + self.stale_ttl
+        with self._lock:
+            new = bool(decks - self._stale.keys())
+            self._stale.update(dict.fromkeys(decks, until))
+        return new
+
+    async def render(self, plugin_id: str, data: dict[str, Any]) -> dict[str, Any]:
+        """Run ``compose`` of ``plugin_id`` on ``data`` and return its result."""
+
+        decks = _lazy_decks(data)
+        stale = bool(decks) and self._is_stale(decks)
+        try:
+            payload = pickle.dumps(
+                expand(data) if stale else data, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        except (pickle.PicklingError, TypeError, AttributeError) as exc:
+            raise TypeError(f"Render input for '{plugin_id}' is not picklable") from exc
+        loop = asyncio.get_running_loop()
+        carrier = inject_context()
+        try:
+            delta = await loop.run_in_executor(
+                self._get_executor(), _render_in_worker, plugin_id, payload, carrier
+            )
+        except BrokenProcessPool:
+            self._fallback_to_threads()
+            delta = await loop.run_in_executor(
+                self._get_executor(), _render_in_worker, plugin_id, payload, carrier
+            )
+        except StaleDeckError as exc:
+            if self._mark_stale(decks) or not decks:
+                log.warning(
+                    "Render workers cannot expand %s, sending expanded cards "
+                    "for %.0f s: %s",
+                    ", ".join(sorted(decks)),
+                    self.stale_ttl,
+                    exc,
+                )
+            payload = pickle.dumps(expand(data), protocol=pickle.HIGHEST_PROTOCOL)
+            delta = await loop.run_in_executor(
+                self._get_executor(), _render_in_worker, plugin_id, payload, carrier
+            )
+        replay(delta.pop(_OBSERVATIONS, []))
+        return {**data, **delta}
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop worker processes or threads."""
+
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+            self._stale.clear()
+
+
+RENDER_EXECUTOR = RenderExecutor(
+    int(os.environ.get("RENDER_WORKERS") or 0) or None,
+    os.environ.get("RENDER_MODE", "process"),
+)
+
+
+async def render(plugin_id: str, data: dict[str, Any]) -> dict[str, Any]:
+    """Render ``data`` with ``plugin_id`` on the shared executor."""
+
+    return await RENDER_EXECUTOR.render(plugin_id, data)
+
+
+__all__ = ["RENDER_EXECUTOR", "RenderExecutor", "render"]
@@ -1,10 +1,11 @@
 """initial
 
 Revision ID: 0f331d5c4ab1
-Revises: 
+Revises:
 Create Date: 2025-08-24 07:53:54.564269
 
 """
+
 from typing import Sequence, Union
 
 import sqlalchemy as sa
@@ -0,0 +1,47 @@
+"""deck manifest
+
+Revision ID: 7c2e9a1d4b6f
+Revises: 0f331d5c4ab1
+Create Date: 2026-10-17 09:12:41.118203
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "7c2e9a1d4b6f"
+down_revision: Union[str, Sequence[str], None] = "0f331d5c4ab1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("decks", sa.Column("deck_id", sa.String(), nullable=True))
+    op.add_column(
+        "decks",
+        sa.Column(
+            "manifest_json", postgresql.JSONB(astext_type=sa.Text()), nullable=True
+        ),
+    )
+    # Earlier ingests appended a row per deck on every run; keep the newest.
+    op.execute(
+        "UPDATE decks SET deck_id = "
+        "COALESCE(config_json->>'deck_id', config_json->>'set_id')"
+    )
+    op.execute(
+        "DELETE FROM decks AS d USING decks AS newer "
+        "WHERE d.deck_id = newer.deck_id AND d.id < newer.id"
+    )
+    op.create_index(op.f("ix_decks_deck_id"), "decks", ["deck_id"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_decks_deck_id"), table_name="decks")
+    op.drop_column("decks", "manifest_json")
+    op.drop_column("decks", "deck_id")
@@ -104,9 +104,11 @@ class Deck(Base):
     __tablename__ = "decks"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    deck_id: Mapped[str | None] = mapped_column(String, unique=True, index=True)
     type: Mapped[str] = mapped_column(String, nullable=False)
     name_json: Mapped[dict[str, Any]] = mapped_column(JSON, nullable=False)
     config_json: Mapped[dict[str, Any]] = mapped_column(JSON, nullable=False)
+    manifest_json: Mapped[dict[str, Any] | None] = mapped_column(JSON)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
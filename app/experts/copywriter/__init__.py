@@ -4,9 +4,9 @@ from datetime import date
 from pathlib import Path
 from typing import Any
 
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 
-from app.core.compose import save_image
+from app.core.compose import default_font, save_image
 from app.core.draw import draw_unique
 from app.core.plugins import Plugin
 from app.experts.messages import get_actions, get_cta, get_section_title
@@ -83,7 +83,7 @@ def compose(data: dict[str, Any]) -> dict[str, Any]:
     else:
         image = Image.new("RGB", (1200, 630), color="white")
         draw = ImageDraw.Draw(image)
-        font = ImageFont.load_default()
+        font = default_font()
         bbox = font.getbbox(theme)
         x = (image.width - (bbox[2] - bbox[0])) // 2
         y = (image.height - (bbox[3] - bbox[1])) // 2
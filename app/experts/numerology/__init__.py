@@ -6,9 +6,9 @@ from datetime import date
 from pathlib import Path
 from typing import Any, Dict, List
 
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 
-from app.core.compose import save_image
+from app.core.compose import default_font, save_image
 from app.core.plugins import Plugin
 from app.experts.messages import get_actions, get_cta
 from app.nlp.verifier import Verifier
@@ -234,7 +234,7 @@ def compose(data: dict[str, Any]) -> dict[str, Any]:
     height = matrix_h + 80
     img = Image.new("RGB", (width, height), "white")
     draw = ImageDraw.Draw(img)
-    font = ImageFont.load_default()
+    font = default_font()
     order = [1, 4, 7, 2, 5, 8, 3, 6, 9]
     for idx, num in enumerate(order):
         row, col = divmod(idx, 3)
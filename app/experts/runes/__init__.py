@@ -6,10 +6,10 @@ from datetime import date
 from pathlib import Path
 from typing import Any, Dict, List
 
-from PIL import Image
-
-from app.core.assets import ASSET_CACHE
-from app.core.draw import draw_unique
+from app.core.assets import ASSET_CACHE, DeckIndex, get_deck
+from app.core.draw import DrawItem
+from app.core.draw.compact import CompactDraw, LazyCards
+from app.core.draw.daily import DAILY_DRAWS
 from app.core.plugins import Plugin
 from app.experts.messages import get_actions, get_cta, get_disclaimers
 from app.nlp.verifier import Verifier
@@ -20,6 +20,9 @@ CardSpec: Any = compose_mod.CardSpec
 Layout: Any = compose_mod.Layout
 compose_cards = compose_mod.compose
 save_image = compose_mod.save_image
+collage_key = compose_mod.collage_key
+COLLAGE_CACHE = compose_mod.COLLAGE_CACHE
+pick_level = compose_mod.pick_level
 
 PLUGIN_ID = "runes"
 
@@ -56,6 +59,12 @@ def form_steps(locale: str) -> list[dict[str, Any]]:
     ]
 
 
+def draw_options(index: DeckIndex) -> dict[str, Any]:
+    """Orientation options of rune draws from ``index``."""
+
+    return {"allow_reversed": index.allow_reversed, "p_reversed": 0.33}
+
+
 def prepare(data: dict[str, Any]) -> dict[str, Any]:
     """Prepare deterministic rune draw and metadata."""
 
@@ -70,38 +79,33 @@ def prepare(data: dict[str, Any]) -> dict[str, Any]:
     nonce = int(data.get("nonce", 0))
     locale = data.get("locale", "en")
 
-    set_conf = ASSET_CACHE[set_id]["config"]
-    runes_manifest = set_conf["runes"]
-    pool = [r["key"] for r in runes_manifest]
-    allow_reversed = bool(set_conf.get("image", {}).get("allow_reversed", False))
+    deck = get_deck(set_id)
+    index: DeckIndex = deck["index"]
     spread = SPREADS[spread_id]
 
-    draw = draw_unique(
-        pool,
+    draw = DAILY_DRAWS.draw(
+        index.keys,
         len(spread.captions),
         user_id=user_id,
         expert=PLUGIN_ID,
         spread_id=spread_id,
+        deck_id=set_id,
         draw_date=draw_date,
         nonce=nonce,
-        allow_reversed=allow_reversed,
-        p_reversed=0.33,
+        **draw_options(index),
     )
 
-    by_key = {r["key"]: r for r in runes_manifest}
-    runes: List[Dict[str, Any]] = []
-    for item, caption in zip(draw, spread.captions, strict=True):
-        info = by_key[item.key]
-        can_reverse = bool(info.get("can_reverse", True))
-        runes.append(
-            {
-                "key": item.key,
-                "file": info["file"],
-                "display": info["display"],
-                "caption": caption,
-                "reversed": item.reversed if can_reverse else False,
-            }
-        )
+    compact = CompactDraw.from_items(
+        set_id,
+        spread_id,
+        [
+            DrawItem(
+                item.key, item.reversed and index.can_reverse[index.positions[item.key]]
+            )
+            for item in draw
+        ],
+        index,
+    )
 
     assets_root = Path(data.get("assets_root", "assets"))
 
@@ -109,9 +113,11 @@ def prepare(data: dict[str, Any]) -> dict[str, Any]:
         "set_id": set_id,
         "spread_id": spread_id,
         "spread": spread,
-        "runes": runes,
+        "draw": compact,
+        "runes": LazyCards(compact, spread.captions, index),
         "locale": locale,
         "assets_root": str(assets_root),
+        "content_hash": deck.get("content_hash", ""),
     }
 
 
@@ -124,28 +130,46 @@ def compose(data: dict[str, Any]) -> dict[str, Any]:
     assets_root = Path(data.get("assets_root", "assets"))
     set_path = assets_root / "runes" / set_id
 
-    frame_img = None
+    assets = ASSET_CACHE.get(set_id, {})
+    level = pick_level(
+        assets.get("pyramid", []),
+        spread.layout,
+        len(data["runes"]),
+    )
+    images_dir = set_path / (level["dir"] if level else "runes")
     frame_path = set_path / "frame.png"
-    if frame_path.exists():
-        frame_img = Image.open(frame_path)
+    frame = frame_path if frame_path.exists() else None
 
     rune_specs: List[CardSpec] = []
     names: List[str] = []
     orientations: List[str] = []
     for rune in data["runes"]:
-        img_path = set_path / "runes" / rune["file"]
-        image = Image.open(img_path)
+        img_path = images_dir / rune["file"]
         name = rune["display"].get(locale) or next(iter(rune["display"].values()))
         names.append(name)
         orientation = "reversed" if rune["reversed"] else "upright"
         orientations.append(orientation)
         caption = f"{rune['caption']}: {name}"
         rune_specs.append(
-            CardSpec(image=image, caption=caption, reversed=rune["reversed"])
+            CardSpec(image=img_path, caption=caption, reversed=rune["reversed"])
         )
 
-    collage = compose_cards(rune_specs, spread.layout, frame=frame_img)
-    image_bytes = save_image(collage, fmt="WEBP")
+    key = collage_key(
+        deck_id=set_id,
+        spread_id=spread.spread_id,
+        cards=data["draw"].token(),
+        locale=locale,
+        salt=data.get("content_hash") or assets.get("content_hash", ""),
+    )
+    image_bytes = COLLAGE_CACHE.get_or_render(
+        key,
+        lambda: save_image(
+            compose_cards(rune_specs, spread.layout, frame=frame),
+            fmt="WEBP",
+            mode="search",
+            hint=f"{set_id}:{spread.layout.value}",
+        ),
+    )
 
     facts: Dict[str, Any] = {}
     for i, (name, orientation) in enumerate(
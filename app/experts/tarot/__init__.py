@@ -5,12 +5,18 @@ from datetime import date
 from pathlib import Path
 from typing import Any, Dict, List
 
-from PIL import Image
-
-from app.core.assets import ASSET_CACHE
-from app.core.compose import CardSpec, Layout, save_image
+from app.core.assets import ASSET_CACHE, DeckIndex, get_deck
+from app.core.compose import (
+    COLLAGE_CACHE,
+    CardSpec,
+    Layout,
+    collage_key,
+    pick_level,
+    save_image,
+)
 from app.core.compose import compose as compose_cards
-from app.core.draw import draw_unique
+from app.core.draw.compact import CompactDraw, LazyCards
+from app.core.draw.daily import DAILY_DRAWS
 from app.core.plugins import Plugin
 from app.experts.messages import get_actions, get_cta
 from app.nlp.verifier import Verifier
@@ -84,6 +90,12 @@ def form_steps(locale: str) -> list[dict[str, Any]]:
     ]
 
 
+def draw_options(index: DeckIndex) -> dict[str, Any]:
+    """Orientation options of tarot card draws from ``index``."""
+
+    return {"allow_reversed": index.allow_reversed}
+
+
 def prepare(data: dict[str, Any]) -> dict[str, Any]:
     """Prepare deterministic draw and card metadata."""
 
@@ -98,36 +110,23 @@ def prepare(data: dict[str, Any]) -> dict[str, Any]:
     nonce = int(data.get("nonce", 0))
     locale = data.get("locale", "en")
 
-    deck_conf = ASSET_CACHE[deck_id]["config"]
-    cards_manifest = deck_conf["cards"]
-    pool = [c["key"] for c in cards_manifest]
-    allow_reversed = bool(deck_conf.get("image", {}).get("allow_reversed", False))
+    deck = get_deck(deck_id)
+    index: DeckIndex = deck["index"]
     spread = SPREADS[spread_id]
 
-    draw = draw_unique(
-        pool,
+    draw = DAILY_DRAWS.draw(
+        index.keys,
         len(spread.captions),
         user_id=user_id,
         expert=PLUGIN_ID,
         spread_id=spread_id,
+        deck_id=deck_id,
         draw_date=draw_date,
         nonce=nonce,
-        allow_reversed=allow_reversed,
+        **draw_options(index),
     )
 
-    by_key = {c["key"]: c for c in cards_manifest}
-    cards: List[Dict[str, Any]] = []
-    for item, caption in zip(draw, spread.captions, strict=True):
-        info = by_key[item.key]
-        cards.append(
-            {
-                "key": item.key,
-                "file": info["file"],
-                "display": info["display"],
-                "caption": caption,
-                "reversed": item.reversed,
-            }
-        )
+    compact = CompactDraw.from_items(deck_id, spread_id, draw, index)
 
     assets_root = Path(data.get("assets_root", "assets"))
 
@@ -135,9 +134,11 @@ def prepare(data: dict[str, Any]) -> dict[str, Any]:
         "deck_id": deck_id,
         "spread_id": spread_id,
         "spread": spread,
-        "cards": cards,
+        "draw": compact,
+        "cards": LazyCards(compact, spread.captions, index),
         "locale": locale,
         "assets_root": str(assets_root),
+        "content_hash": deck.get("content_hash", ""),
     }
 
 
@@ -150,25 +151,43 @@ def compose(data: dict[str, Any]) -> dict[str, Any]:
     assets_root = Path(data.get("assets_root", "assets"))
     deck_path = assets_root / "tarot" / deck_id
 
-    frame_img = None
+    assets = ASSET_CACHE.get(deck_id, {})
+    level = pick_level(
+        assets.get("pyramid", []),
+        spread.layout,
+        len(data["cards"]),
+    )
+    images_dir = deck_path / (level["dir"] if level else "cards")
     frame_path = deck_path / "frame.png"
-    if frame_path.exists():
-        frame_img = Image.open(frame_path)
+    frame = frame_path if frame_path.exists() else None
 
     card_specs: List[CardSpec] = []
     names: List[str] = []
     for card in data["cards"]:
-        img_path = deck_path / "cards" / card["file"]
-        image = Image.open(img_path)
+        img_path = images_dir / card["file"]
         name = card["display"].get(locale) or next(iter(card["display"].values()))
         names.append(name)
         caption = f"{card['caption']}: {name}"
         card_specs.append(
-            CardSpec(image=image, caption=caption, reversed=card["reversed"])
+            CardSpec(image=img_path, caption=caption, reversed=card["reversed"])
         )
 
-    collage = compose_cards(card_specs, spread.layout, frame=frame_img)
-    image_bytes = save_image(collage, fmt="WEBP")
+    key = collage_key(
+        deck_id=deck_id,
+        spread_id=spread.spread_id,
+        cards=data["draw"].token(),
+        locale=locale,
+        salt=data.get("content_hash") or assets.get("content_hash", ""),
+    )
+    image_bytes = COLLAGE_CACHE.get_or_render(
+        key,
+        lambda: save_image(
+            compose_cards(card_specs, spread.layout, frame=frame),
+            fmt="WEBP",
+            mode="search",
+            hint=f"{deck_id}:{spread.layout.value}",
+        ),
+    )
 
     facts = {f"card_{i + 1}": name for i, name in enumerate(names)}
 
@@ -22,6 +22,7 @@ from typing import Optional, cast
 from uuid import uuid4
 
 from minio import Minio
+from minio.error import S3Error
 
 try:  # pragma: no cover - optional dependency
     from weasyprint import HTML
@@ -123,6 +124,22 @@ class S3Storage:
         object_name = object_name or f"{uuid4().hex}.pdf"
         return self._put_bytes(pdf_bytes, object_name, "application/pdf")
 
+    def download(self, object_name: str) -> bytes | None:
+        """Return stored object bytes or ``None`` if the object is missing."""
+
+        try:
+            response = self.client.get_object(self.config.bucket, object_name)
+        except S3Error as exc:
+            if exc.code in {"NoSuchKey", "NoSuchObject"}:
+                return None
+            raise
+        try:
+            data: bytes = response.read()
+            return data
+        finally:
+            response.close()
+            response.release_conn()
+
     def generate_presigned_url(
         self, object_name: str, expires: timedelta | None = None
     ) -> str:
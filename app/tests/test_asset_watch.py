@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import json
+import shutil
+import time
+from pathlib import Path
+
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.sqlite import JSON as SQLITE_JSON
+from sqlalchemy.orm import sessionmaker
+
+from app.core.assets import ASSET_CACHE, AssetCache, load_assets
+from app.core.assets.watch import AssetSync, AssetWatcher, try_lock
+from app.db import models
+from app.db.base import Base
+
+
+def _make_deck(root: Path, deck_id: str) -> Path:
+    deck_dir = root / "tarot" / deck_id
+    cards_dir = deck_dir / "cards"
+    cards_dir.mkdir(parents=True)
+    Image.new("RGB", (300, 500), "white").save(deck_dir / "back.png")
+    Image.new("RGB", (300, 500), "white").save(cards_dir / "0.png")
+    manifest = {
+        "deck_id": deck_id,
+        "name": {"en": deck_id},
+        "type": "tarot",
+        "image": {"aspect_ratio": "3:5", "default_back": "back.png"},
+        "cards": [{"key": "a", "display": {"en": "A"}, "file": "0.png"}],
+    }
+    (deck_dir / "deck.json").write_text(json.dumps(manifest), encoding="utf-8")
+    return deck_dir
+
+
+def test_asset_cache_swaps_snapshots() -> None:
+    cache = AssetCache()
+    cache["a"] = {"n": 1}
+    before = cache.snapshot()
+    cache.update({"b": {"n": 2}}, remove=["a"])
+    assert dict(before) == {"a": {"n": 1}}
+    assert dict(cache.items()) == {"b": {"n": 2}}
+    assert cache.get("a") is None
+    del cache["b"]
+    assert len(cache) == 0
+
+
+def test_watcher_reloads_changed_deck_only(tmp_path: Path) -> None:
+    ASSET_CACHE.clear()
+    engine = create_engine("sqlite:///:memory:", future=True)
+    models.JSONB = SQLITE_JSON  # type: ignore[attr-defined]
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, future=True)
+    changed_dir = _make_deck(tmp_path, "one")
+    other_dir = _make_deck(tmp_path, "two")
+    with factory() as session:
+        load_assets(tmp_path, session)
+    watcher = AssetWatcher(tmp_path, factory, use_inotify=False)
+    watcher.poll()
+    old_one = ASSET_CACHE["one"]
+    old_two = ASSET_CACHE["two"]
+
+    assert watcher.deck_dirs([other_dir / "thumbs" / "0.png"]) == set()
+    Image.new("RGB", (150, 250), "black").save(changed_dir / "cards" / "0.png")
+    changed = watcher.poll()
+    assert watcher.deck_dirs(changed) == {changed_dir}
+    reports = watcher.reload(changed)
+    assert [r.deck_id for r in reports] == ["one"]
+    assert ASSET_CACHE["one"]["content_hash"] != old_one["content_hash"]
+    assert ASSET_CACHE["two"] is old_two
+    assert watcher.poll() == set()
+
+    (changed_dir / "deck.json").write_text("{", encoding="utf-8")
+    assert watcher.reload(watcher.poll()) == []
+    assert ASSET_CACHE["one"]["content_hash"] != old_one["content_hash"]
+
+    shutil.rmtree(changed_dir)
+    watcher.reload(watcher.poll())
+    assert "one" not in ASSET_CACHE
+    assert "two" in ASSET_CACHE
+
+
+def test_only_lock_holder_ingests_and_followers_reload(tmp_path: Path) -> None:
+    ASSET_CACHE.clear()
+    engine = create_engine("sqlite:///:memory:", future=True)
+    models.JSONB = SQLITE_JSON  # type: ignore[attr-defined]
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, future=True)
+    deck_dir = _make_deck(tmp_path, "one")
+    with factory() as session:
+        load_assets(tmp_path, session)
+    lock = tmp_path / ".watch.lock"
+    held = try_lock(lock)
+    assert held is not None and try_lock(lock) is None
+
+    follower = AssetSync(AssetWatcher(tmp_path, factory, use_inotify=False))
+    assert follower.follow() == []
+    # The leader re-ingests a changed deck and publishes it to the database.
+    Image.new("RGB", (150, 250), "black").save(deck_dir / "cards" / "0.png")
+    ingested = AssetCache()
+    ingested.update(ASSET_CACHE.snapshot())
+    old_hash = ASSET_CACHE["one"]["content_hash"]
+    with factory() as session:
+        load_assets(tmp_path, session, decks={deck_dir})
+    new_hash = ASSET_CACHE["one"]["content_hash"]
+    assert new_hash != old_hash
+    ASSET_CACHE.replace(ingested.snapshot())
+
+    assert follower.follow() == ["one"]
+    assert ASSET_CACHE["one"]["content_hash"] == new_hash
+    assert not ASSET_CACHE["one"]["validated"]
+    shutil.rmtree(deck_dir)
+    follower.follow()
+    assert "one" not in ASSET_CACHE
+
+    held.close()
+    follower.interval = 0.01
+    follower.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not follower.leader and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert follower.leader
+    finally:
+        follower.stop()
+    assert try_lock(lock) is not None
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
+from typing import Any
 
 import pytest
 from PIL import Image
@@ -9,7 +10,14 @@ from sqlalchemy import create_engine
 from sqlalchemy.dialects.sqlite import JSON as SQLITE_JSON
 from sqlalchemy.orm import Session, sessionmaker
 
-from app.core.assets import ASSET_CACHE, AssetValidationError, load_assets
+from app.core.assets import (
+    ASSET_CACHE,
+    AssetValidationError,
+    get_deck,
+    load_assets,
+    loader,
+    warm_start,
+)
 from app.db import models
 from app.db.base import Base
 from app.db.models import Deck
@@ -60,6 +68,12 @@ def test_load_assets(tmp_path: Path) -> None:
     decks = session.query(Deck).all()
     assert len(decks) == 1
     assert "testdeck" in ASSET_CACHE
+    index = ASSET_CACHE["testdeck"]["index"]
+    assert index.keys == ("major_0",)
+    assert index.positions == {"major_0": 0}
+    assert index.files == ("0.png",)
+    assert index.display[0]["ru"] == "Ноль"
+    assert index.allow_reversed is True
     assert (deck_dir / "thumbs" / "0.png").exists()
     assert (deck_dir / "thumbs" / "back.png").exists()
 
@@ -96,3 +110,201 @@ def test_load_assets_bad_ratio(tmp_path: Path) -> None:
     session = _setup_session()
     with pytest.raises(AssetValidationError):
         load_assets(assets_root, session)
+
+
+def test_load_assets_builds_pyramid(tmp_path: Path) -> None:
+    ASSET_CACHE.clear()
+    deck_dir = tmp_path / "lenormand" / "big"
+    cards_dir = deck_dir / "cards"
+    cards_dir.mkdir(parents=True)
+    _create_image(deck_dir / "back.png", size=(600, 1000))
+    _create_image(cards_dir / "0.png", size=(600, 1000))
+    manifest = {
+        "deck_id": "big",
+        "name": {"en": "Big"},
+        "type": "lenormand",
+        "image": {"aspect_ratio": "3:5", "default_back": "back.png"},
+        "cards": [{"key": "k", "display": {"en": "e"}, "file": "0.png"}],
+    }
+    (deck_dir / "deck.json").write_text(json.dumps(manifest), encoding="utf-8")
+    load_assets(tmp_path, _setup_session())
+
+    pyramid = ASSET_CACHE["big"]["pyramid"]
+    assert [level["level"] for level in pyramid] == ["thumb", "medium", "full"]
+    assert [level["size"] for level in pyramid] == [
+        [154, 256],
+        [307, 512],
+        [600, 1000],
+    ]
+    assert pyramid[-1]["dir"] == "cards"
+    assert not (deck_dir / "atlas").exists()
+    with Image.open(deck_dir / "medium" / "0.png") as img:
+        assert img.size == (307, 512)
+
+
+def test_load_assets_is_incremental(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    ASSET_CACHE.clear()
+    deck_dir = tmp_path / "tarot" / "inc"
+    cards_dir = deck_dir / "cards"
+    cards_dir.mkdir(parents=True)
+    _create_image(deck_dir / "back.png")
+    _create_image(cards_dir / "0.png")
+    _create_image(cards_dir / "1.png")
+    manifest = {
+        "deck_id": "inc",
+        "name": {"en": "Inc"},
+        "type": "tarot",
+        "image": {"aspect_ratio": "3:5", "default_back": "back.png"},
+        "cards": [
+            {"key": "a", "display": {"en": "A"}, "file": "0.png"},
+            {"key": "b", "display": {"en": "B"}, "file": "1.png"},
+        ],
+    }
+    (deck_dir / "deck.json").write_text(json.dumps(manifest), encoding="utf-8")
+    session = _setup_session()
+    load_assets(tmp_path, session)
+    first_hash = ASSET_CACHE["inc"]["content_hash"]
+
+    processed: list[str] = []
+    original = loader._process_image
+
+    def tracking(src: Path, *args: Any) -> dict[str, Any]:
+        processed.append(src.name)
+        return original(src, *args)
+
+    monkeypatch.setattr(loader, "_process_image", tracking)
+    load_assets(tmp_path, session)
+    assert processed == []
+    assert session.query(Deck).count() == 1
+    assert ASSET_CACHE["inc"]["content_hash"] == first_hash
+
+    _create_image(cards_dir / "1.png", size=(150, 250))
+    (deck_dir / "thumbs" / "0.png").unlink()
+    load_assets(tmp_path, session)
+    assert sorted(processed) == ["0.png", "1.png"]
+    assert (deck_dir / "thumbs" / "0.png").exists()
+    decks = session.query(Deck).all()
+    assert len(decks) == 1
+    assert decks[0].deck_id == "inc"
+    assert decks[0].manifest_json is not None
+    assert decks[0].manifest_json["hash"] == ASSET_CACHE["inc"]["content_hash"]
+    assert ASSET_CACHE["inc"]["content_hash"] != first_hash
+
+    # The frame is overlaid by compose, so it is part of the content hash.
+    second_hash = ASSET_CACHE["inc"]["content_hash"]
+    processed.clear()
+    _create_image(deck_dir / "frame.png")
+    load_assets(tmp_path, session)
+    third_hash = ASSET_CACHE["inc"]["content_hash"]
+    assert third_hash != second_hash and processed == []
+    Image.new("RGB", (300, 500), "black").save(deck_dir / "frame.png")
+    load_assets(tmp_path, session)
+    assert ASSET_CACHE["inc"]["content_hash"] != third_hash
+
+
+def test_load_assets_parallel_matches_serial(tmp_path: Path) -> None:
+    manifests = []
+    for root in (tmp_path / "serial", tmp_path / "parallel"):
+        ASSET_CACHE.clear()
+        deck_dir = root / "lenormand" / "par"
+        cards_dir = deck_dir / "cards"
+        cards_dir.mkdir(parents=True)
+        _create_image(deck_dir / "back.png", size=(600, 1000))
+        cards = []
+        for i in range(6):
+            _create_image(cards_dir / f"{i}.png", size=(600, 1000))
+            cards.append({"key": f"k{i}", "display": {"en": "e"}, "file": f"{i}.png"})
+        manifest = {
+            "deck_id": "par",
+            "name": {"en": "Par"},
+            "type": "lenormand",
+            "image": {"aspect_ratio": "3:5", "default_back": "back.png"},
+            "cards": cards,
+        }
+        (deck_dir / "deck.json").write_text(json.dumps(manifest), encoding="utf-8")
+        session = _setup_session()
+        workers = 2 if root.name == "parallel" else 1
+        reports = load_assets(root, session, workers=workers)
+        assert [(r.deck_id, r.images, r.processed) for r in reports] == [("par", 7, 7)]
+        assert (deck_dir / "medium" / "5.png").exists()
+        deck = session.query(Deck).one()
+        assert deck.manifest_json is not None
+        manifests.append(
+            {
+                rel: (entry["sha256"], entry["dims"], entry["levels"])
+                for rel, entry in deck.manifest_json["files"].items()
+            }
+        )
+    assert manifests[0] == manifests[1]
+
+
+def test_warm_start_validates_lazily(tmp_path: Path) -> None:
+    ASSET_CACHE.clear()
+    deck_dir = tmp_path / "tarot" / "warm"
+    cards_dir = deck_dir / "cards"
+    cards_dir.mkdir(parents=True)
+    _create_image(deck_dir / "back.png")
+    _create_image(cards_dir / "0.png")
+    manifest = {
+        "deck_id": "warm",
+        "name": {"en": "Warm"},
+        "type": "tarot",
+        "image": {"aspect_ratio": "3:5", "default_back": "back.png"},
+        "cards": [{"key": "a", "display": {"en": "A"}, "file": "0.png"}],
+    }
+    (deck_dir / "deck.json").write_text(json.dumps(manifest), encoding="utf-8")
+    session = _setup_session()
+    load_assets(tmp_path, session)
+    ingested = dict(ASSET_CACHE["warm"])
+
+    ASSET_CACHE.clear()
+    assert warm_start(session, tmp_path) == 1
+    entry = ASSET_CACHE["warm"]
+    assert entry["validated"] is False
+    assert entry["pyramid"] == ingested["pyramid"]
+    assert entry["content_hash"] == ingested["content_hash"]
+    assert get_deck("warm")["validated"] is True
+    assert entry["content_hash"] == ingested["content_hash"]
+
+    ASSET_CACHE.clear()
+    warm_start(session, tmp_path)
+    (deck_dir / "thumbs" / "0.png").unlink()
+    _create_image(cards_dir / "0.png", size=(150, 250))
+    assert get_deck("warm")["content_hash"] != ingested["content_hash"]
+    assert (deck_dir / "thumbs" / "0.png").exists()
+
+    ASSET_CACHE.clear()
+    warm_start(session, tmp_path)
+    _create_image(cards_dir / "0.png", size=(100, 100))
+    with pytest.raises(AssetValidationError):
+        get_deck("warm")
+
+
+def test_load_assets_packs_atlases(tmp_path: Path) -> None:
+    ASSET_CACHE.clear()
+    deck_dir = tmp_path / "lenormand" / "packed"
+    cards_dir = deck_dir / "cards"
+    cards_dir.mkdir(parents=True)
+    _create_image(deck_dir / "back.png", size=(600, 1000))
+    _create_image(cards_dir / "0.png", size=(600, 1000))
+    manifest = {
+        "deck_id": "packed",
+        "name": {"en": "Packed"},
+        "type": "lenormand",
+        "image": {"aspect_ratio": "3:5", "default_back": "back.png"},
+        "cards": [{"key": "k", "display": {"en": "e"}, "file": "0.png"}],
+    }
+    (deck_dir / "deck.json").write_text(json.dumps(manifest), encoding="utf-8")
+    load_assets(tmp_path, _setup_session(), atlas=True)
+
+    atlas_dir = deck_dir / "atlas"
+    assert sorted(p.name for p in atlas_dir.glob("*.json")) == [
+        "cards.json",
+        "medium.json",
+        "thumbs.json",
+    ]
+    assert sum(p.stat().st_size for p in atlas_dir.glob("thumbs.*.rgba")) == (
+        154 * 256 * 4
+    )
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Iterator
+
+import pytest
+
+import app.core.plugins as plugins
+import app.core.plugins.batch as batch
+from app.core.plugins.batch import group_key, run_batch
+
+
+def _plugin() -> plugins.Plugin:
+    def compose(data: dict[str, Any]) -> dict[str, Any]:
+        if data["n"] < 0:
+            raise ValueError("bad input")
+        return {**data, "image": b"img"}
+
+    return plugins.Plugin(
+        plugin_id="dummy",
+        form_steps=lambda locale: [],
+        prepare=lambda data: data,
+        compose=compose,
+        write=lambda data: {"n": data["n"]},
+        verify=lambda data: True,
+        cost=0,
+        cta=lambda locale: [],
+        products_supported=("basic",),
+    )
+
+
+def test_run_batch_groups_and_streams(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(plugins, "_registry", {"dummy": _plugin()})
+    groups: list[set[tuple[Any, ...]]] = []
+    run_group = batch._run_group
+
+    def spy(plugin_id: str, items: list[tuple[int, dict[str, Any]]]) -> Any:
+        groups.append({group_key(params) for _, params in items})
+        return run_group(plugin_id, items)
+
+    monkeypatch.setattr(batch, "_run_group", spy)
+    consumed = 0
+
+    def inputs() -> Iterator[dict[str, Any]]:
+        nonlocal consumed
+        for n in range(100):
+            consumed += 1
+            yield {"n": -1 if n == 7 else n, "deck_id": f"d{n % 2}", "spread_id": "s"}
+
+    stream = run_batch(
+        "dummy", inputs(), workers=1, mode="thread", chunk_size=8, max_pending=1
+    )
+    first = next(stream)
+    assert consumed <= 16
+    results = [first, *stream]
+    assert sorted(r.index for r in results) == list(range(100))
+    assert all(len(keys) == 1 for keys in groups)
+    failed = [r for r in results if r.error]
+    assert [r.index for r in failed] == [7]
+    assert "bad input" in (failed[0].error or "")
+    ok = next(r for r in results if r.index == 3)
+    assert ok.output == {"n": 3} and ok.image == b"img" and ok.verified
+
+
+def test_run_batch_splits_large_groups(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(plugins, "_registry", {"dummy": _plugin()})
+    sizes: list[int] = []
+    run_group = batch._run_group
+
+    def spy(plugin_id: str, items: list[tuple[int, dict[str, Any]]]) -> Any:
+        sizes.append(len(items))
+        return run_group(plugin_id, items)
+
+    monkeypatch.setattr(batch, "_run_group", spy)
+    inputs = [{"n": n, "deck_id": "d", "spread_id": "s"} for n in range(16)]
+    results = list(run_batch("dummy", inputs, workers=4, mode="thread", chunk_size=16))
+    assert len(results) == 16
+    assert sizes == [4, 4, 4, 4]
+    with pytest.raises(ValueError):
+        next(run_batch("dummy", inputs, mode="async"))
+
+
+def test_run_batch_real_plugin_in_processes() -> None:
+    inputs = [
+        {
+            "full_name": name,
+            "birth_date": date(1990, 5, 17),
+            "target_date": date(2024, 1, 1),
+            "locale": "en",
+        }
+        for name in ("John Smith", "Jane Doe", "Ann Lee")
+    ]
+    results = list(run_batch("numerology", inputs, workers=2, chunk_size=2))
+    assert sorted(r.index for r in results) == [0, 1, 2]
+    assert all(r.error is None and r.verified and r.image for r in results)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+import app.storage as storage_mod
+from app.core.compose.collages import (
+    CollageCache,
+    DiskBackend,
+    S3Backend,
+    collage_key,
+)
+
+
+def _key(**overrides: object) -> str:
+    params: dict[str, object] = {
+        "deck_id": "rider_waite",
+        "spread_id": "tarot_three_ppf",
+        "cards": [("c0", False), ("c1", True), ("c2", False)],
+        "locale": "en",
+    }
+    params.update(overrides)
+    return collage_key(**params)  # type: ignore[arg-type]
+
+
+def test_collage_key_is_stable_and_sensitive() -> None:
+    assert _key() == _key()
+    assert _key(locale="ru") != _key()
+    assert _key(cards=[("c0", False), ("c1", False), ("c2", False)]) != _key()
+    assert _key(spread_id="tarot_yes_no_3") != _key()
+    assert _key(salt="v2") != _key()
+
+
+def test_memory_tier_renders_once_and_evicts() -> None:
+    cache = CollageCache(max_bytes=10)
+    calls: list[int] = []
+
+    def render() -> bytes:
+        calls.append(1)
+        return b"abcdef"
+
+    assert cache.get_or_render("a", render) == b"abcdef"
+    assert cache.get_or_render("a", render) == b"abcdef"
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.put("b", b"123456")
+    assert len(cache) == 1
+    assert cache.get("a") is None
+
+
+def test_disk_tier_survives_memory_loss(tmp_path: Path) -> None:
+    cache = CollageCache(backend=DiskBackend(tmp_path))
+    cache.put("ab" + "0" * 62, b"webp-bytes")
+    assert (tmp_path / "ab" / ("ab" + "0" * 62)).read_bytes() == b"webp-bytes"
+
+    cache.clear()
+    assert cache.get("ab" + "0" * 62) == b"webp-bytes"
+    assert len(cache) == 1
+    assert cache.get("missing") is None
+
+
+def test_s3_tier_sets_content_type_and_connects_lazily(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    uploads: list[tuple[str, str | None]] = []
+
+    class Storage:
+        def __init__(self) -> None:
+            created.append(1)
+
+        def upload_image(
+            self, data: bytes, content_type: str, object_name: str | None = None
+        ) -> str:
+            uploads.append((content_type, object_name))
+            return object_name or ""
+
+    created: list[int] = []
+    monkeypatch.setattr(storage_mod, "S3Storage", Storage)
+    backend = S3Backend(prefix="c/")
+    assert not created
+
+    for fmt in ("WEBP", "JPEG", "PNG"):
+        buffer = BytesIO()
+        Image.new("RGB", (4, 4)).save(buffer, format=fmt)
+        backend.put(fmt, buffer.getvalue())
+    assert uploads == [
+        ("image/webp", "c/WEBP"),
+        ("image/jpeg", "c/JPEG"),
+        ("image/png", "c/PNG"),
+    ]
+    assert len(created) == 1
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+import pickle
+import time
+from typing import Any
+
+import pytest
+
+import app.core.plugins as plugins
+import app.core.render as render_mod
+from app.core.assets import ASSET_CACHE, DeckIndex
+from app.core.compose import collage_key
+from app.core.draw import DrawItem
+from app.core.draw.compact import (
+    CompactDraw,
+    LazyCards,
+    StaleDeckError,
+    pack_varints,
+    unpack_varints,
+)
+from app.core.observability import stage_attributes
+from app.core.render import RenderExecutor
+
+MANIFEST = {
+    "image": {"allow_reversed": True},
+    "cards": [
+        {
+            "key": f"c{i}",
+            "file": f"{i}.png",
+            "display": {"en": f"Card {i}", "ru": f"Карта {i}"},
+        }
+        for i in range(200)
+    ],
+}
+
+
+def _index() -> DeckIndex:
+    return DeckIndex.from_manifest("big", MANIFEST, "cards")
+
+
+def _draw(index: DeckIndex) -> CompactDraw:
+    items = [DrawItem("c3", True), DrawItem("c150", False), DrawItem("c0", True)]
+    return CompactDraw.from_items("big", "three", items, index)
+
+
+def test_varints_round_trip() -> None:
+    values = [0, 1, 127, 128, 300, 2**35]
+    data = pack_varints(values)
+    assert len(pack_varints([127])) == 1 and len(pack_varints([128])) == 2
+    assert unpack_varints(data) == (values, len(data))
+    with pytest.raises(ValueError):
+        unpack_varints(data[:-1])
+
+
+def test_compact_draw_round_trip() -> None:
+    index = _index()
+    draw = _draw(index)
+    assert draw.count == 3
+    assert draw.positions() == [3, 150, 0]
+    assert draw.reversed() == [True, False, True]
+    assert CompactDraw.from_token(draw.token()) == draw
+    assert CompactDraw.from_bytes(draw.to_bytes()) == draw
+    assert len(draw.to_bytes()) < 24
+    assert draw.items(index.keys)[1] == DrawItem("c150", False)
+    with pytest.raises(StaleDeckError):
+        draw.items(index.keys[::-1])
+    with pytest.raises(ValueError):
+        CompactDraw.from_bytes(draw.to_bytes()[:-1])
+
+
+def test_lazy_cards_pickle_compactly() -> None:
+    index = _index()
+    cards = LazyCards(_draw(index), ["Past", "Present", "Future"], index)
+    expanded = list(cards)
+    assert expanded[1] == {
+        "key": "c150",
+        "file": "150.png",
+        "display": {"en": "Card 150", "ru": "Карта 150"},
+        "caption": "Present",
+        "reversed": False,
+    }
+    assert stage_attributes({"cards": cards})["card_count"] == 3
+
+    positions = list(range(0, 200, 20))
+    draw = CompactDraw.from_positions("big", "ten", index.keys, positions, [True] * 10)
+    captions = [f"Position {i}" for i in range(10)]
+    ten = LazyCards(draw, captions, index)
+    # Captions are pickled once with the spread they come from.
+    payload = pickle.dumps(ten)
+    lazy = pickle.dumps({"captions": captions, "cards": ten})
+    assert len(lazy) * 3 < len(pickle.dumps({"captions": captions, "cards": list(ten)}))
+    ASSET_CACHE["big"] = {"index": index}
+    try:
+        restored = pickle.loads(payload)
+        assert restored == ten and restored == list(ten)
+    finally:
+        del ASSET_CACHE["big"]
+    with pytest.raises(StaleDeckError):
+        list(pickle.loads(payload))
+
+
+def test_collage_key_of_compact_draw() -> None:
+    draw = _draw(_index())
+    key = collage_key(deck_id="big", spread_id="three", cards=draw.token(), locale="en")
+    again = CompactDraw.from_token(draw.token()).token()
+    assert key == collage_key(
+        deck_id="big", spread_id="three", cards=again, locale="en"
+    )
+
+
+def test_render_expands_cards_for_stale_worker(
+    monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    calls: list[bool] = []
+
+    def compose(data: dict[str, Any]) -> dict[str, Any]:
+        calls.append(isinstance(data["cards"], LazyCards))
+        return {**data, "facts": {"keys": [card["key"] for card in data["cards"]]}}
+
+    monkeypatch.setattr(
+        plugins,
+        "_registry",
+        {
+            "dummy": plugins.Plugin(
+                plugin_id="dummy",
+                form_steps=lambda locale: [],
+                prepare=lambda data: data,
+                compose=compose,
+                write=lambda data: data,
+                verify=lambda data: True,
+                cost=0,
+                cta=lambda locale: [],
+                products_supported=("basic",),
+            )
+        },
+    )
+    index = _index()
+    cards = LazyCards(_draw(index), ["Past", "Present", "Future"], index)
+    executor = RenderExecutor(mode="thread")
+
+    async def main() -> list[dict[str, Any]]:
+        return [await executor.render("dummy", {"cards": cards}) for _ in range(3)]
+
+    try:
+        # The deck is not in ASSET_CACHE, as in a worker that never loaded it.
+        results = asyncio.run(main())
+        # Once a worker missed the deck, its cards go out expanded.
+        assert calls == [True, False, False, False]
+        assert len([r for r in caplog.records if "expand" in r.message]) == 1
+        # After stale_ttl the compact form is tried again.
+        later = time.monotonic() + executor.stale_ttl + 1
+        clock = type("Clock", (), {"monotonic": staticmethod(lambda: later)})
+        monkeypatch.setattr(render_mod, "time", clock)
+        asyncio.run(main())
+        assert calls[4:] == [True, False, False, False]
+    finally:
+        executor.shutdown()
+    assert all(r["facts"] == {"keys": ["c3", "c150", "c0"]} for r in results)
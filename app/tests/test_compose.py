@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import threading
 from pathlib import Path
 
+import pytest
 from PIL import Image, ImageDraw
 
 from app.core.compose import CardSpec, Layout, compose, save_image
@@ -59,3 +61,78 @@ def test_other_layouts() -> None:
         compose(make_cards(8), Layout.GRID_3X3)
     with pytest.raises(ValueError):
         compose(make_cards(35), Layout.GRAND_TABLEAU)
+
+
+def test_save_image_search_mode(monkeypatch: pytest.MonkeyPatch) -> None:
+    import app.core.compose as compose_mod
+
+    img = Image.effect_noise((300, 200), 60).convert("RGB")
+    limit = len(save_image(img, fmt="JPEG", quality=45, max_bytes=1 << 30))
+    linear = save_image(img, fmt="JPEG", max_bytes=limit)
+    assert len(linear) <= limit
+
+    encodes: list[int] = []
+    encode = compose_mod._encode
+
+    def counting(*args: object) -> int:
+        encodes.append(1)
+        return encode(*args)  # type: ignore[arg-type]
+
+    monkeypatch.setattr(compose_mod, "_BPP_STATS", compose_mod._BppStats())
+    monkeypatch.setattr(compose_mod, "_encode", counting)
+    cold = save_image(img, fmt="JPEG", max_bytes=limit, mode="search", hint="h")
+    assert len(cold) <= limit
+    assert len(encodes) <= 3
+
+    encodes.clear()
+    warm = save_image(img, fmt="JPEG", max_bytes=limit, mode="search", hint="h")
+    assert len(warm) <= limit
+    assert len(warm) >= len(linear)
+    assert len(encodes) <= 2
+
+    with pytest.raises(ValueError):
+        save_image(img, mode="bogus")
+
+
+def test_bpp_stats_are_bounded() -> None:
+    import app.core.compose as compose_mod
+
+    stats = compose_mod._BppStats(max_hints=2, max_samples=3)
+    for q in range(90, 80, -1):
+        stats.record("a", q, q / 100)
+    assert [q for q, _ in stats.samples("a")] == [81, 82, 83]
+    stats.record("b", 80, 0.5)
+    stats.samples("a")
+    stats.record("c", 80, 0.5)
+    assert len(stats) == 2
+    assert stats.samples("b") == [] and stats.samples("a")
+
+    def record(start: int) -> None:
+        for i in range(500):
+            stats.record(f"h{(start + i) % 7}", i % 50, 0.1)
+            stats.samples(f"h{i % 7}")
+
+    threads = [threading.Thread(target=record, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(stats) == 2
+    assert all(len(stats.samples(f"h{i}")) <= 3 for i in range(7))
+
+
+def test_pick_level_uses_smallest_sufficient_resolution() -> None:
+    from app.core.compose import pick_level
+
+    pyramid = [
+        {"level": "thumb", "dir": "thumbs", "size": [154, 256]},
+        {"level": "medium", "dir": "medium", "size": [307, 512]},
+        {"level": "full", "dir": "cards", "size": [1200, 2000]},
+    ]
+    gt = pick_level(pyramid, Layout.GRAND_TABLEAU, 36)
+    assert gt is not None and gt["level"] == "medium"
+    row = pick_level(pyramid, Layout.ROW, 3)
+    assert row is not None and row["level"] == "full"
+    wide = pick_level(pyramid, Layout.ROW, 13)
+    assert wide is not None and wide["level"] == "thumb"
+    assert pick_level([], Layout.ROW, 3) is None
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.sqlite import JSON as SQLITE_JSON
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.assets import ASSET_CACHE, DeckIndex
+from app.core.draw import draw_unique
+from app.core.draw.daily import DailyDraws, DrawTable, precompute, write_table
+from app.db import models
+from app.db.base import Base
+from app.experts import runes, tarot
+
+DAY = date(2024, 1, 2)
+DECK = [f"card{i}" for i in range(78)]
+
+
+def _setup_session() -> Session:
+    engine = create_engine("sqlite:///:memory:", future=True)
+    models.JSONB = SQLITE_JSON  # type: ignore[attr-defined]
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, future=True)()
+
+
+def test_table_hits_match_draw_unique(tmp_path: Path) -> None:
+    draws = DailyDraws(tmp_path)
+    path = draws.path("tarot", "tarot_celtic_cross", "rws", DAY)
+    users = [7, 10**12, 3, 7]
+    rows = write_table(
+        path,
+        users,
+        DECK,
+        10,
+        expert="tarot",
+        spread_id="tarot_celtic_cross",
+        draw_date=DAY,
+        allow_reversed=True,
+    )
+    assert rows == 3
+    assert len(DrawTable(path)) == 3
+
+    kwargs: dict[str, Any] = {
+        "expert": "tarot",
+        "spread_id": "tarot_celtic_cross",
+        "draw_date": DAY,
+        "allow_reversed": True,
+    }
+    for user_id in (3, 7, 10**12):
+        drawn = draws.draw(DECK, 10, user_id=user_id, deck_id="rws", **kwargs)
+        assert drawn == draw_unique(DECK, 10, user_id=user_id, **kwargs)
+    assert (draws.hits, draws.misses) == (3, 0)
+
+    # Unknown user, other nonce, other deck order and other day all fall back.
+    assert draws.draw(DECK, 10, user_id=4, deck_id="rws", **kwargs) == draw_unique(
+        DECK, 10, user_id=4, **kwargs
+    )
+    draws.draw(DECK, 10, user_id=3, deck_id="rws", nonce=1, **kwargs)
+    shuffled = DECK[1:] + DECK[:1]
+    assert draws.draw(shuffled, 10, user_id=3, deck_id="rws", **kwargs) == draw_unique(
+        shuffled, 10, user_id=3, **kwargs
+    )
+    draws.draw(
+        DECK,
+        10,
+        user_id=3,
+        deck_id="rws",
+        **{**kwargs, "draw_date": DAY + timedelta(days=1)},
+    )
+    assert (draws.hits, draws.misses) == (3, 4)
+
+
+def test_disabled_lookup_uses_draw_unique() -> None:
+    draws = DailyDraws()
+    drawn = draws.draw(
+        DECK,
+        3,
+        user_id=1,
+        expert="tarot",
+        spread_id="tarot_three_ppf",
+        deck_id="rws",
+        draw_date=DAY,
+    )
+    assert drawn == draw_unique(
+        DECK, 3, user_id=1, expert="tarot", spread_id="tarot_three_ppf", draw_date=DAY
+    )
+    assert draws.misses == 1
+
+
+def test_precompute_active_users_and_popular_spreads(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    session = _setup_session()
+    now = datetime.now(timezone.utc)
+    session.add_all(
+        [
+            models.User(id=1, tg_id=101, last_seen=now),
+            models.User(id=2, tg_id=102, last_seen=now - timedelta(days=1)),
+            models.User(id=3, tg_id=103, last_seen=now - timedelta(days=30)),
+        ]
+    )
+    manifests: dict[str, dict[str, Any]] = {
+        "rws": {"image": {"allow_reversed": True}, "cards": DECK, "type": "tarot"},
+        "elder": {"image": {"allow_reversed": True}, "runes": DECK[:24]},
+    }
+    for i, (deck_id, manifest) in enumerate(manifests.items(), 1):
+        items_key = "runes" if deck_id == "elder" else "cards"
+        manifest = {
+            **manifest,
+            items_key: [
+                {"key": key, "file": f"{key}.png", "display": {}}
+                for key in manifest[items_key]
+            ],
+        }
+        session.add(
+            models.Deck(
+                id=i, deck_id=deck_id, type="tarot", name_json={}, config_json=manifest
+            )
+        )
+    popular = [("tarot", "tarot_three_ppf", "rws")] * 2 + [
+        ("runes", "runes_three_ppf", "elder")
+    ]
+    for i, (expert, spread_id, deck_id) in enumerate(popular, 1):
+        session.add(
+            models.Draw(
+                id=i,
+                user_id=1,
+                expert=expert,
+                deck_id=deck_id,
+                spread_id=spread_id,
+                seed="",
+                facts_json={},
+            )
+        )
+    session.commit()
+
+    draws = DailyDraws(tmp_path)
+    written = precompute(session, DAY, draws=draws)
+    assert written == {
+        ("tarot", "tarot_three_ppf", "rws"): 2,
+        ("runes", "runes_three_ppf", "elder"): 2,
+    }
+    assert list(written) == [popular[0], popular[2]]
+
+    index = DeckIndex.from_manifest(
+        "elder",
+        {
+            "image": {"allow_reversed": True},
+            "runes": [{"key": k, "file": "", "display": {}} for k in DECK[:24]],
+        },
+        "runes",
+    )
+    options = runes.draw_options(index)
+    kwargs: dict[str, Any] = {
+        "expert": "runes",
+        "spread_id": "runes_three_ppf",
+        "draw_date": DAY,
+    }
+    # Tables are keyed on users.id, not on Telegram ids.
+    assert draws.draw(
+        index.keys, 3, user_id=2, deck_id="elder", **kwargs, **options
+    ) == draw_unique(index.keys, 3, user_id=2, **kwargs, **options)
+    assert draws.hits == 1
+    draws.draw(index.keys, 3, user_id=3, deck_id="elder", **kwargs, **options)
+    draws.draw(index.keys, 3, user_id=102, deck_id="elder", **kwargs, **options)
+    assert draws.misses == 2
+    assert tarot.draw_options(index) == {"allow_reversed": True}
+
+    # The expert's prepare finds the row of the user it is called for.
+    rws = DeckIndex.from_manifest(
+        "rws",
+        {
+            "image": {"allow_reversed": True},
+            "cards": [{"key": k, "file": "", "display": {}} for k in DECK],
+        },
+        "cards",
+    )
+    monkeypatch.setattr(tarot, "DAILY_DRAWS", draws)
+    monkeypatch.setitem(ASSET_CACHE, "rws", {"index": rws})
+    params = {"deck_id": "rws", "spread_id": "tarot_three_ppf", "user_id": 1}
+    prepared = tarot.prepare({**params, "draw_date": DAY})
+    assert draws.hits == 2
+    assert prepared["draw"].items(rws.keys) == draw_unique(
+        rws.keys,
+        3,
+        user_id=1,
+        expert="tarot",
+        spread_id="tarot_three_ppf",
+        draw_date=DAY,
+        allow_reversed=True,
+    )
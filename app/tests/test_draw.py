@@ -1,8 +1,13 @@
 from __future__ import annotations
 
 from datetime import date
+from typing import Any
+
+import numpy as np
+import pytest
 
 from app.core.draw import draw_unique
+from app.core.draw.batch import draw_many, philox4x32
 
 
 def test_deterministic_draw_and_nonce() -> None:
@@ -66,3 +71,75 @@ def test_deterministic_draw_and_nonce() -> None:
         nonce=0,
     )
     assert all(not item.reversed for item in without_rev)
+
+
+def test_draw_many_compat_matches_draw_unique() -> None:
+    deck = [f"card{i}" for i in range(78)]
+    users: list[int | str] = [0, 42, 10**12, "guest"]
+    batch = draw_many(
+        len(deck),
+        5,
+        user_ids=users,
+        expert="tarot",
+        spread_id="tarot_celtic_cross",
+        draw_date=date(2024, 1, 1),
+        nonces=[0, 1, 2, 3],
+        allow_reversed=True,
+        compat=True,
+    )
+    assert batch.indices.dtype == np.uint8
+    for row, user_id in enumerate(users):
+        assert batch.items(row, deck) == draw_unique(
+            deck,
+            5,
+            user_id=user_id,
+            expert="tarot",
+            spread_id="tarot_celtic_cross",
+            draw_date=date(2024, 1, 1),
+            nonce=row,
+            allow_reversed=True,
+        )
+
+
+def test_draw_many_philox_is_deterministic_and_unique() -> None:
+    users = np.arange(1000)
+    kwargs: dict[str, Any] = {
+        "expert": "tarot",
+        "spread_id": "tarot_three_ppf",
+        "draw_date": date(2024, 1, 1),
+        "allow_reversed": True,
+    }
+    batch = draw_many(78, 3, user_ids=users, **kwargs)
+    assert batch.indices.shape == batch.reversed.shape == (1000, 3)
+    assert all(len(set(row)) == 3 for row in batch.indices.tolist())
+    assert int(batch.indices.max()) < 78
+    # Rows do not depend on the batch they are drawn in.
+    tail = draw_many(78, 3, user_ids=users[500:], **kwargs)
+    assert np.array_equal(tail.indices, batch.indices[500:])
+    assert np.array_equal(tail.reversed, batch.reversed[500:])
+    other = draw_many(78, 3, user_ids=users, nonces=1, **kwargs)
+    assert not np.array_equal(other.indices, batch.indices)
+    assert 0.4 < batch.reversed.mean() < 0.6
+    upright = draw_many(78, 3, user_ids=users, **{**kwargs, "allow_reversed": False})
+    assert not upright.reversed.any()
+
+
+def test_draw_many_validates_input() -> None:
+    with pytest.raises(ValueError):
+        draw_many(3, 4, user_ids=[1], expert="e", spread_id="s", draw_date=date.today())
+    with pytest.raises(ValueError):
+        draw_many(
+            3, 1, user_ids=[-1], expert="e", spread_id="s", draw_date=date.today()
+        )
+    empty = draw_many(
+        3, 1, user_ids=[], expert="e", spread_id="s", draw_date=date.today()
+    )
+    assert len(empty) == 0
+
+
+def test_philox4x32_known_answers() -> None:
+    zero = philox4x32(np.zeros((1, 4), dtype=np.uint64), (0, 0))
+    assert zero.tolist() == [[0x6627E8D5, 0xE169C58D, 0xBC57AC4C, 0x9B00DBD8]]
+    counter = np.array([[0x243F6A88, 0x85A308D3, 0x13198A2E, 0x03707344]], np.uint64)
+    pi = philox4x32(counter, (0xA4093822, 0x299F31D0))
+    assert pi.tolist() == [[0xD16CFE09, 0x94FDCCEB, 0x5001E420, 0x24126EA1]]
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Any
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.sqlite import JSON as SQLITE_JSON
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.draw import draw_unique, generate_seed
+from app.core.draw.audit import audit_draws, iter_chunks, load_decks
+from app.core.draw.compact import CompactDraw, draw_facts
+from app.db import models
+from app.db.base import Base
+
+KEYS = [f"card{i}" for i in range(22)]
+
+
+def _setup_session() -> Session:
+    engine = create_engine("sqlite:///:memory:", future=True)
+    models.JSONB = SQLITE_JSON  # type: ignore[attr-defined]
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, future=True)()
+
+
+def _populate(session: Session, rows: int) -> None:
+    manifest = {
+        "image": {"allow_reversed": True},
+        "cards": [{"key": key, "file": f"{key}.png", "display": {}} for key in KEYS],
+    }
+    session.add(models.User(id=1, tg_id=100))
+    session.add(
+        models.Deck(
+            id=1, deck_id="major", type="tarot", name_json={}, config_json=manifest
+        )
+    )
+    for i in range(1, rows + 1):
+        params: dict[str, Any] = {
+            "user_id": 100 + i,
+            "expert": "tarot",
+            "spread_id": "tarot_three_ppf",
+            "draw_date": date(2024, 1, 1),
+            "nonce": i % 3,
+        }
+        drawn = draw_unique(KEYS, 3, allow_reversed=True, **params)
+        session.add(
+            models.Draw(
+                id=i,
+                user_id=1,
+                expert="tarot",
+                deck_id="major",
+                spread_id="tarot_three_ppf",
+                seed=str(generate_seed(**params)),
+                facts_json={
+                    "cards": [
+                        {"key": item.key, "reversed": item.reversed} for item in drawn
+                    ]
+                },
+            )
+        )
+    session.commit()
+
+
+def test_iter_chunks_paginates_by_id() -> None:
+    session = _setup_session()
+    _populate(session, 7)
+    chunks = list(iter_chunks(session, chunk_size=3, start_id=1))
+    assert [[row[0] for row in chunk] for chunk in chunks] == [[2, 3, 4], [5, 6, 7]]
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_audit_reports_changed_draws(mode: str) -> None:
+    session = _setup_session()
+    _populate(session, 25)
+    tampered = session.get(models.Draw, 7)
+    assert tampered is not None
+    cards = [dict(card) for card in tampered.facts_json["cards"]]
+    cards[1]["key"] = next(k for k in KEYS if k not in {c["key"] for c in cards})
+    tampered.facts_json = {"cards": cards}
+    flipped = session.get(models.Draw, 12)
+    assert flipped is not None
+    cards = [dict(card) for card in flipped.facts_json["cards"]]
+    cards[0]["reversed"] = not cards[0]["reversed"]
+    flipped.facts_json = {"cards": cards}
+    session.add(
+        models.Draw(
+            id=26,
+            user_id=1,
+            expert="tarot",
+            deck_id="gone",
+            spread_id="tarot_three_ppf",
+            seed="1",
+            facts_json={"cards": []},
+        )
+    )
+    session.commit()
+
+    report = audit_draws(session, workers=2, mode=mode, chunk_size=4)
+    assert (report.checked, report.skipped, report.mismatched) == (25, 1, 2)
+    assert [m.draw_id for m in report.mismatches] == [7, 12]
+    assert "item 1" in report.mismatches[0].reason
+    assert "reversed" in report.mismatches[1].reason
+    assert report.last_id == 26
+    assert not report.ok
+
+    resumed = audit_draws(
+        session, workers=1, mode="thread", start_id=10, max_mismatches=0
+    )
+    assert (resumed.checked, resumed.mismatched, resumed.mismatches) == (15, 1, [])
+
+
+def test_load_decks_uses_expert_draw_options() -> None:
+    session = _setup_session()
+    _populate(session, 0)
+    decks = load_decks(session)
+    assert decks[("tarot", "major")][2:] == (True, 0.5)
+    assert decks[("runes", "major")][2:] == (True, 0.33)
+    assert decks[("lenormand", "major")][2] is False
+    keys, can_reverse = decks[("tarot", "major")][:2]
+    assert list(can_reverse) == list(keys)
+    assert decks[("runes", "major")][1] is can_reverse
+
+
+def test_audit_reads_compact_draws() -> None:
+    session = _setup_session()
+    _populate(session, 3)
+    for draw_id in (1, 2):
+        row = session.get(models.Draw, draw_id)
+        assert row is not None
+        cards = row.facts_json["cards"]
+        compact = CompactDraw.from_positions(
+            "major",
+            "tarot_three_ppf",
+            KEYS,
+            [KEYS.index(card["key"]) for card in cards],
+            [card["reversed"] for card in cards] if draw_id == 1 else [True] * 3,
+        )
+        row.facts_json = draw_facts(compact, {**row.facts_json, "card_1": "Fool"})
+        assert set(row.facts_json) == {"card_1", "draw"}
+    session.commit()
+
+    report = audit_draws(session, workers=1, mode="thread")
+    assert (report.checked, report.mismatched) == (3, 1)
+    assert report.mismatches[0].draw_id == 2
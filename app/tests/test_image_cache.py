@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from PIL import Image
+
+from app.core.compose import CardSpec, ImageCache, Layout, compose
+from app.core.compose.atlas import atlas_is_current, write_atlas
+
+
+def _create_image(path: Path, color: str = "white") -> None:
+    Image.new("RGB", (30, 50), color).save(path)
+
+
+def test_cache_hits_and_mtime_invalidation(tmp_path: Path) -> None:
+    path = tmp_path / "card.png"
+    _create_image(path)
+    cache = ImageCache()
+
+    first = cache.get(path)
+    second = cache.get(path)
+    assert first is second
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert first.mode == "RGBA"
+
+    _create_image(path, "red")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    third = cache.get(path)
+    assert third is not first
+    assert third.getpixel((0, 0)) == (255, 0, 0, 255)
+    assert len(cache) == 1
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.png"
+        _create_image(path)
+        paths.append(path)
+    one_image = 30 * 50 * 4
+    cache = ImageCache(max_bytes=2 * one_image)
+
+    cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])
+    cache.get(paths[2])
+    assert len(cache) == 2
+    assert cache.nbytes == 2 * one_image
+    assert cache.evictions == 1
+
+    cache.get(paths[0])
+    assert cache.misses == 3
+
+    cache.configure(one_image)
+    assert len(cache) == 1
+
+
+def test_compose_accepts_paths(tmp_path: Path) -> None:
+    path = tmp_path / "card.png"
+    _create_image(path, "blue")
+    img = compose([CardSpec(path, None, False)] * 3, Layout.ROW)
+    assert img.size == (3 * 30 + 2 * 10, 50)
+    assert img.getpixel((0, 0)) == (0, 0, 255, 255)
+
+
+def test_reversed_variant_is_cached(tmp_path: Path) -> None:
+    path = tmp_path / "card.png"
+    img = Image.new("RGB", (30, 50), "white")
+    img.paste((255, 0, 0), (0, 0, 30, 10))
+    img.save(path)
+    cache = ImageCache()
+
+    upright = cache.get(path)
+    flipped = cache.get(path, reversed=True)
+    assert flipped is cache.get(path, reversed=True)
+    assert upright.getpixel((0, 0)) == (255, 0, 0, 255)
+    assert flipped.getpixel((0, 49)) == (255, 0, 0, 255)
+    assert len(cache) == 2
+
+
+def test_frame_resized_once_with_mask(tmp_path: Path) -> None:
+    path = tmp_path / "frame.png"
+    frame = Image.new("RGBA", (60, 100), (0, 0, 0, 0))
+    frame.paste((0, 0, 0, 255), (0, 0, 60, 4))
+    frame.save(path)
+    cache = ImageCache()
+
+    img, mask = cache.frame(path, (30, 50))
+    assert img.size == mask.size == (30, 50)
+    assert mask.mode == "L"
+    assert cache.frame(path, (30, 50)) == (img, mask)
+    assert cache.misses == 3
+
+    # A frame already of the target size is not cached a second time.
+    before = cache.nbytes
+    same, _ = cache.frame(path, (60, 100))
+    assert same is cache.get(path)
+    assert cache.nbytes == before + 60 * 100
+
+    card = tmp_path / "card.png"
+    _create_image(card)
+    collage = compose([CardSpec(card, None, False)], Layout.ROW, frame=path)
+    assert collage.getpixel((5, 0)) == (0, 0, 0, 255)
+    assert collage.getpixel((5, 25)) == (255, 255, 255, 255)
+
+
+def test_atlas_tiles_replace_decoding(tmp_path: Path) -> None:
+    cards_dir = tmp_path / "deck" / "cards"
+    cards_dir.mkdir(parents=True)
+    names = []
+    for i, color in enumerate(("red", "blue")):
+        _create_image(cards_dir / f"{i}.png", color)
+        names.append(f"{i}.png")
+    assert not atlas_is_current(cards_dir, names)
+    write_atlas(cards_dir, names)
+    assert atlas_is_current(cards_dir, names)
+    cache = ImageCache()
+
+    tile = cache.get(cards_dir / "1.png")
+    assert tile.readonly
+    assert tile.getpixel((0, 0)) == (0, 0, 255, 255)
+    assert (cache.atlas_hits, cache.misses, len(cache)) == (1, 0, 0)
+    flipped = cache.get(cards_dir / "1.png", reversed=True)
+    assert flipped.getpixel((0, 0)) == (0, 0, 255, 255)
+    assert len(cache) == 1
+
+    _create_image(cards_dir / "0.png", "green")
+    stat = (cards_dir / "0.png").stat()
+    os.utime(cards_dir / "0.png", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert not atlas_is_current(cards_dir, names)
+    decoded = cache.get(cards_dir / "0.png")
+    assert not decoded.readonly
+    assert decoded.getpixel((0, 0)) == (0, 128, 0, 255)
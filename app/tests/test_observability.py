@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import date
+from typing import Any
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from PIL import Image
+from prometheus_client import REGISTRY, generate_latest
+
+import app.core.observability as observability
+import app.core.plugins as plugins
+from app.core.compose import save_image
+from app.core.plugins.pipeline import PipelineRunner
+from app.core.render import RenderExecutor
+
+
+@pytest.fixture
+def spans(monkeypatch: pytest.MonkeyPatch) -> InMemorySpanExporter:
+    monkeypatch.delenv("OTEL_SDK_DISABLED", raising=False)
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(observability, "tracer", provider.get_tracer("test"))
+    return exporter
+
+
+def _sample(name: str, labels: dict[str, str]) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_pipeline_stages_emit_spans_and_histograms(
+    spans: InMemorySpanExporter, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def compose(data: dict[str, Any]) -> dict[str, Any]:
+        image = save_image(Image.new("RGB", (64, 64), "red"), fmt="JPEG")
+        return {**data, "image": image}
+
+    plugin = plugins.Plugin(
+        plugin_id="dummy",
+        form_steps=lambda locale: [],
+        prepare=lambda data: {**data, "cards": [{"key": "a"}, {"key": "b"}]},
+        compose=compose,
+        write=lambda data: {"text": "ok"},
+        verify=lambda data: True,
+        cost=0,
+        cta=lambda locale: [],
+        products_supported=("basic",),
+    )
+    monkeypatch.setattr(plugins, "_registry", {"dummy": plugin})
+    labels = {"plugin_id": "dummy", "stage": "compose"}
+    before = _sample("plugin_stage_seconds_count", labels)
+    quality_before = _sample("image_encode_quality_count", {"format": "JPEG"})
+    runner = PipelineRunner(RenderExecutor(workers=1, mode="thread"))
+    try:
+        asyncio.run(runner.run("dummy", {"spread_id": "one"}))
+    finally:
+        runner.renderer.shutdown()
+        runner.shutdown()
+
+    by_name = {span.name: span for span in spans.get_finished_spans()}
+    assert {"plugin.prepare", "plugin.compose", "plugin.write", "plugin.verify"} <= set(
+        by_name
+    )
+    compose_span = by_name["plugin.compose"]
+    assert compose_span.attributes is not None
+    assert compose_span.attributes["plugin_id"] == "dummy"
+    assert compose_span.attributes["spread_id"] == "one"
+    assert compose_span.attributes["card_count"] == 2
+    assert isinstance(compose_span.attributes["image_bytes"], int)
+    assert compose_span.attributes["image_bytes"] > 0
+    encode_span = by_name["image.encode"]
+    assert encode_span.attributes is not None
+    assert encode_span.attributes["quality"] == 80
+    assert encode_span.parent is not None
+    assert encode_span.parent.span_id == compose_span.context.span_id
+    assert _sample("plugin_stage_seconds_count", labels) == before + 1
+    assert (
+        _sample("image_encode_quality_count", {"format": "JPEG"}) == quality_before + 1
+    )
+    assert b"plugin_stage_seconds_bucket" in generate_latest()
+
+
+def test_stage_attributes_count_runes() -> None:
+    spread = type("Spread", (), {"spread_id": "runes_three_ppf"})()
+    runes = [{"key": "fehu"}, {"key": "uruz"}, {"key": "thurisaz"}]
+    attributes = observability.stage_attributes({"spread": spread, "runes": runes})
+    assert attributes == {"spread_id": "runes_three_ppf", "card_count": 3}
+
+
+def test_failed_stage_marks_span_as_error(spans: InMemorySpanExporter) -> None:
+    with pytest.raises(ValueError):
+        with observability.stage_span("dummy", "prepare", {}):
+            raise ValueError("boom")
+    (span,) = spans.get_finished_spans()
+    assert not span.status.is_ok
+
+
+def test_worker_observations_are_replayed_in_parent() -> None:
+    labels = {"format": "WEBP", "mode": "linear"}
+    before = _sample("image_encode_seconds_count", labels)
+    with observability.capture() as observations:
+        save_image(Image.new("RGB", (32, 32), "blue"))
+    assert _sample("image_encode_seconds_count", labels) == before
+    assert [name for name, _, _ in observations] == [
+        "encode_seconds",
+        "encode_bytes",
+        "encode_quality",
+    ]
+
+    executor = RenderExecutor(workers=1, mode="process")
+    try:
+        from app.experts import numerology
+
+        data = numerology.prepare(
+            {
+                "full_name": "John Smith",
+                "birth_date": date(1990, 5, 17),
+                "target_date": date(2024, 1, 1),
+                "locale": "en",
+            }
+        )
+        result = asyncio.run(executor.render("numerology", data))
+    finally:
+        executor.shutdown()
+    assert "__observations__" not in result
+    assert _sample("image_encode_seconds_count", labels) == before + 1
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from datetime import date
+from typing import Any
+
+import pytest
+
+import app.core.plugins as plugins
+import app.core.plugins.pipeline as pipeline
+from app.core.plugins.pipeline import (
+    STAGES,
+    PipelineError,
+    PipelineResult,
+    PipelineRunner,
+    PipelineTimeout,
+)
+from app.core.render import RenderExecutor
+
+
+def _plugin(**stages: Any) -> plugins.Plugin:
+    defaults: dict[str, Any] = {
+        "form_steps": lambda locale: [],
+        "prepare": lambda data: data,
+        "compose": lambda data: {**data, "image": b"img"},
+        "write": lambda data: {**data, "text": "ok"},
+        "verify": lambda data: True,
+        "cta": lambda locale: [],
+    }
+    defaults.update(stages)
+    return plugins.Plugin(
+        plugin_id="dummy", cost=0, products_supported=("basic",), **defaults
+    )
+
+
+def _runner(**kwargs: Any) -> PipelineRunner:
+    return PipelineRunner(RenderExecutor(workers=2, mode="thread"), **kwargs)
+
+
+def test_pipeline_runs_stages_and_records_latencies(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    ran_on: list[str] = []
+
+    def prepare(data: dict[str, Any]) -> dict[str, Any]:
+        ran_on.append(threading.current_thread().name)
+        return data
+
+    def write(data: dict[str, Any]) -> dict[str, Any]:
+        ran_on.append(threading.current_thread().name)
+        return {**data, "text": "ok"}
+
+    monkeypatch.setattr(
+        plugins, "_registry", {"dummy": _plugin(prepare=prepare, write=write)}
+    )
+    runner = _runner()
+    try:
+        result = asyncio.run(runner.run("dummy", {"n": 1}))
+    finally:
+        runner.renderer.shutdown()
+        runner.shutdown()
+    assert result.verified
+    assert isinstance(result.data.pop("draw_date"), date)
+    assert result.data == {"n": 1, "image": b"img", "text": "ok"}
+    assert list(result.timings) == list(STAGES)
+    assert all(len(runner.latencies[stage]) == 1 for stage in STAGES)
+    # Prepare and write both stay off the event loop.
+    assert all(name.startswith("pipeline-io") for name in ran_on)
+
+
+def test_compose_overlaps_write_of_another_request(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    writing_first = threading.Event()
+    composed_second = threading.Event()
+
+    def compose(data: dict[str, Any]) -> dict[str, Any]:
+        if data["n"] == 2:
+            composed_second.set()
+        return data
+
+    def write(data: dict[str, Any]) -> dict[str, Any]:
+        # The first write only finishes once the second compose has run.
+        if data["n"] == 1:
+            writing_first.set()
+            assert composed_second.wait(5)
+        return data
+
+    monkeypatch.setattr(
+        plugins, "_registry", {"dummy": _plugin(compose=compose, write=write)}
+    )
+    runner = _runner()
+
+    async def main() -> tuple[Any, ...]:
+        first = asyncio.create_task(runner.run("dummy", {"n": 1}))
+        assert await asyncio.to_thread(writing_first.wait, 5)
+        return await asyncio.gather(first, runner.run("dummy", {"n": 2}))
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        runner.renderer.shutdown()
+        runner.shutdown()
+    assert [r.data["n"] for r in results] == [1, 2]
+
+
+def test_stage_timeout_and_errors(monkeypatch: pytest.MonkeyPatch) -> None:
+    release = threading.Event()
+
+    async def slow_write(data: dict[str, Any]) -> dict[str, Any]:
+        await asyncio.Event().wait()
+        return data
+
+    def slow_prepare(data: dict[str, Any]) -> dict[str, Any]:
+        release.wait(5)
+        return data
+
+    def broken(data: dict[str, Any]) -> dict[str, Any]:
+        raise LookupError("no deck")
+
+    runner = _runner(timeouts={"write": 0.05, "prepare": 0.01})
+    try:
+        monkeypatch.setattr(plugins, "_registry", {"dummy": _plugin(write=slow_write)})
+        with pytest.raises(PipelineTimeout) as timeout:
+            asyncio.run(runner.run("dummy", {}))
+        assert timeout.value.stage == "write"
+
+        monkeypatch.setattr(
+            plugins, "_registry", {"dummy": _plugin(prepare=slow_prepare)}
+        )
+        with pytest.raises(PipelineTimeout) as late:
+            asyncio.run(runner.run("dummy", {}))
+        assert late.value.stage == "prepare"
+        release.set()
+
+        monkeypatch.setattr(plugins, "_registry", {"dummy": _plugin(compose=broken)})
+        with pytest.raises(PipelineError) as error:
+            asyncio.run(runner.run("dummy", {}))
+        assert error.value.stage == "compose"
+        assert isinstance(error.value.__cause__, LookupError)
+    finally:
+        runner.renderer.shutdown()
+        runner.shutdown()
+    with pytest.raises(ValueError):
+        PipelineRunner(timeouts={"render": 1.0})
+
+
+def test_pipeline_runs_real_plugin() -> None:
+    runner = _runner()
+    try:
+        result = asyncio.run(
+            runner.run(
+                "numerology",
+                {
+                    "full_name": "John Smith",
+                    "birth_date": date(1990, 5, 17),
+                    "target_date": date(2024, 1, 1),
+                    "locale": "en",
+                },
+            )
+        )
+    finally:
+        runner.renderer.shutdown()
+        runner.shutdown()
+    assert result.verified
+    assert result.data["sections"]
+
+
+def _form_plugin(
+    composed: list[dict[str, Any]],
+    written: list[Any],
+    composes: threading.Semaphore | None = None,
+) -> plugins.Plugin:
+    def compose(data: dict[str, Any]) -> dict[str, Any]:
+        composed.append(data)
+        if composes is not None:
+            composes.release()
+        return {**data, "image": b"img"}
+
+    def write(data: dict[str, Any]) -> dict[str, Any]:
+        written.append(data)
+        return {"text": data.get("question")}
+
+    return _plugin(
+        form_steps=lambda locale: [
+            {"id": "deck_id"},
+            {"id": "spread_id"},
+            {"id": "question"},
+        ],
+        compose=compose,
+        write=write,
+    )
+
+
+def test_speculative_compose_is_claimed_by_run(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    composed: list[dict[str, Any]] = []
+    written: list[Any] = []
+    composes = threading.Semaphore(0)
+    monkeypatch.setattr(
+        plugins, "_registry", {"dummy": _form_plugin(composed, written, composes)}
+    )
+    monkeypatch.setattr(pipeline, "_SPECULATIVE_SKIP", {"dummy": ("question",)})
+    runner = _runner()
+    answers = {"deck_id": "d", "user_id": 7}
+
+    async def main() -> PipelineResult:
+        assert not runner.speculate("dummy", answers)
+        answers["spread_id"] = "s"
+        assert runner.speculate("dummy", answers)
+        assert runner.speculate("dummy", dict(answers))
+        assert await asyncio.to_thread(composes.acquire, timeout=5)
+        assert len(composed) == 1
+        return await runner.run("dummy", {**answers, "question": "Q?"})
+
+    try:
+        result = asyncio.run(main())
+    finally:
+        runner.renderer.shutdown()
+        runner.shutdown()
+    assert result.speculative
+    assert len(composed) == 1
+    assert written[0]["question"] == "Q?"
+    assert result.data == {"text": "Q?"}
+    assert set(result.timings) == set(STAGES)
+
+
+def test_unclaimed_speculation_expires(monkeypatch: pytest.MonkeyPatch) -> None:
+    composed: list[dict[str, Any]] = []
+    composes = threading.Semaphore(0)
+    monkeypatch.setattr(
+        plugins, "_registry", {"dummy": _form_plugin(composed, [], composes)}
+    )
+    monkeypatch.setattr(pipeline, "_SPECULATIVE_SKIP", {"dummy": ("question",)})
+    now = [0.0]
+    clock = {"monotonic": lambda: now[0], "perf_counter": time.perf_counter}
+    monkeypatch.setattr(
+        pipeline,
+        "time",
+        type("Clock", (), {k: staticmethod(v) for k, v in clock.items()}),
+    )
+    runner = _runner(speculation_ttl=60.0)
+    answers = {"deck_id": "d", "spread_id": "s"}
+
+    async def main() -> list[PipelineResult]:
+        assert runner.speculate("dummy", answers)
+        assert await asyncio.to_thread(composes.acquire, timeout=5)
+        now[0] += 61.0
+        expired = await runner.run("dummy", {**answers, "question": "Q"})
+        other = {**answers, "user_id": 1}
+        assert runner.speculate("dummy", other)
+        # A different user does not claim the speculation of another.
+        missed = await runner.run("dummy", {**answers, "user_id": 2})
+        # The expired run, the new speculation and the missed run.
+        for _ in range(3):
+            assert await asyncio.to_thread(composes.acquire, timeout=5)
+        return [expired, missed]
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        runner.renderer.shutdown()
+        runner.shutdown()
+    assert [r.speculative for r in results] == [False, False]
+    assert len(composed) == 4
+
+
+def test_speculation_does_not_cross_midnight(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    composed: list[dict[str, Any]] = []
+    monkeypatch.setattr(plugins, "_registry", {"dummy": _form_plugin(composed, [])})
+    monkeypatch.setattr(pipeline, "_SPECULATIVE_SKIP", {"dummy": ("question",)})
+    today = [date(2024, 1, 1)]
+    monkeypatch.setattr(
+        pipeline, "date", type("Clock", (), {"today": staticmethod(lambda: today[0])})
+    )
+    runner = _runner()
+    answers = {"deck_id": "d", "spread_id": "s"}
+
+    async def main() -> PipelineResult:
+        assert runner.speculate("dummy", answers)
+        today[0] = date(2024, 1, 2)
+        return await runner.run("dummy", {**answers, "question": "Q"})
+
+    try:
+        result = asyncio.run(main())
+    finally:
+        runner.renderer.shutdown()
+        runner.shutdown()
+    assert not result.speculative
+    assert date(2024, 1, 2) in [data["draw_date"] for data in composed]
+
+
+def test_shared_runner_is_built_on_first_use(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(pipeline, "_pipeline", None)
+    monkeypatch.setenv("PIPELINE_IO_WORKERS", "2")
+    monkeypatch.delenv("SINGLEFLIGHT_REDIS_URL", raising=False)
+    runner = pipeline.get_pipeline()
+    try:
+        assert pipeline.get_pipeline() is runner
+        assert runner._io._max_workers == 2
+        assert runner.singleflight.lock is None
+    finally:
+        runner.shutdown()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import app.core.plugins as plugins
+import app.core.plugins.__main__ as cli
+from app.core.plugins.bench import percentile
+from app.core.plugins.manifest import MANIFEST
+from app.core.plugins.pipeline import STAGES
+
+# Generous bound for importing and discovering plugins in a fresh process.
+IMPORT_BUDGET = 0.5
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.core.plugins as plugins
+import app.core.plugins.__main__ as cli
+from app.core.plugins.bench import percentile
+plugins.discover()
+ids = plugins.available()
+seconds = time.perf_counter() - start
+heavy = [m for m in sys.modules if m.split(".")[0] in {"matplotlib", "swisseph", "PIL"}
+         or m.startswith(("app.core.assets", "app.nlp", "app.experts."))]
+print(json.dumps({"seconds": seconds, "ids": ids, "heavy": heavy}))
+"""
+
+
+def test_discover_stays_within_import_budget() -> None:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=os.environ.copy(),
+    )
+    probe: dict[str, Any] = json.loads(out.stdout)
+    assert probe["ids"] == sorted(spec.plugin_id for spec in MANIFEST)
+    assert [m for m in probe["heavy"] if m != "app.experts.messages"] == []
+    assert probe["seconds"] < IMPORT_BUDGET
+
+
+@pytest.mark.parametrize("spec", MANIFEST, ids=lambda spec: spec.plugin_id)
+def test_manifest_matches_plugin_modules(
+    spec: plugins.PluginSpec, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(plugins, "_registry", {})
+    lazy = plugins.discover()[spec.plugin_id]
+    assert lazy.cost == spec.cost
+    real = plugins.load(spec.plugin_id)
+    assert real is not lazy
+    assert (real.plugin_id, real.cost) == (spec.plugin_id, spec.cost)
+    assert tuple(real.products_supported) == tuple(spec.products_supported)
+    assert plugins.discover()[spec.plugin_id] is real
+    steps = {step["id"] for step in real.form_steps("en")}
+    assert set(spec.speculative_skip) <= steps
+
+
+def test_lazy_stage_forwards_to_module(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(plugins, "_registry", {})
+    steps = plugins.discover()["numerology"].form_steps("en")
+    assert steps == plugins.load("numerology").form_steps("en")
+
+
+def test_percentiles() -> None:
+    values = [float(v) for v in range(1, 101)]
+    assert [percentile(values, q) for q in (50, 95, 99)] == [50.0, 95.0, 99.0]
+    assert percentile([], 50) == 0.0
+
+
+def test_cli_lists_and_benchmarks(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    cli.main([])
+    assert capsys.readouterr().out.split() == plugins.available()
+
+    out = tmp_path / "bench.json"
+    cli.main(
+        ["bench", "runes", "dreams", "-n", "3", "--card-width", "32"]
+        + ["--json", str(out)]
+    )
+    table = capsys.readouterr().out
+    assert "runes:runes_five_cross" in table
+    report = json.loads(out.read_text(encoding="utf-8"))
+    cases = {f"{case['plugin']}:{case['case']}": case for case in report["cases"]}
+    assert set(cases) == {
+        "runes:runes_one",
+        "runes:runes_three_ppf",
+        "runes:runes_five_cross",
+        "dreams:long_text",
+    }
+    for case in cases.values():
+        assert case["errors"] == 0 and case["iterations"] == 3
+        assert set(case["stages"]) == {*STAGES, "total"}
+        assert case["stages"]["total"]["p99_ms"] >= case["stages"]["total"]["p50_ms"]
+        assert case["throughput_rps"] > 0
+        assert 0 <= case["rss_growth_kb"] <= case["rss_high_water_kb"]
+    assert report["peak_rss_kb"] > 0
+    assert report["peak_rss_kb"] >= max(c["rss_high_water_kb"] for c in cases.values())
+    with pytest.raises(SystemExit):
+        cli.main(["bench", "nope"])
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from datetime import date
+from typing import Any
+
+import pytest
+
+import app.core.plugins as plugins
+from app.core.render import RenderExecutor
+from app.experts import numerology
+
+
+def _dummy_plugin(compose: Any) -> plugins.Plugin:
+    return plugins.Plugin(
+        plugin_id="dummy",
+        form_steps=lambda locale: [],
+        prepare=lambda data: data,
+        compose=compose,
+        write=lambda data: data,
+        verify=lambda data: True,
+        cost=0,
+        cta=lambda locale: [],
+        products_supported=("basic",),
+    )
+
+
+def test_thread_render_returns_compose_output(monkeypatch: pytest.MonkeyPatch) -> None:
+    threads: list[str] = []
+
+    def compose(data: dict[str, Any]) -> dict[str, Any]:
+        threads.append(threading.current_thread().name)
+        return {**data, "image": b"bytes", "facts": {"n": data["n"]}}
+
+    monkeypatch.setattr(plugins, "_registry", {"dummy": _dummy_plugin(compose)})
+    executor = RenderExecutor(workers=2, mode="thread")
+    try:
+        result = asyncio.run(executor.render("dummy", {"n": 3}))
+    finally:
+        executor.shutdown()
+    assert result == {"n": 3, "image": b"bytes", "facts": {"n": 3}}
+    assert threads and threads[0].startswith("render")
+
+
+def test_render_rejects_unpicklable_input() -> None:
+    executor = RenderExecutor(mode="thread")
+    with pytest.raises(TypeError):
+        asyncio.run(executor.render("dummy", {"fn": lambda: None}))
+
+
+def test_process_render_of_real_plugin() -> None:
+    data = numerology.prepare(
+        {
+            "full_name": "John Smith",
+            "birth_date": date(1990, 5, 17),
+            "target_date": date(2024, 1, 1),
+            "locale": "en",
+        }
+    )
+    executor = RenderExecutor(workers=1, mode="process")
+    try:
+        result = asyncio.run(executor.render("numerology", data))
+    finally:
+        executor.shutdown()
+    assert result["image_format"] == "WEBP"
+    assert result["image"] == numerology.compose(data)["image"]
+    assert result["numbers"] == data["numbers"]
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import gc
+import http.client
+import json
+import os
+import signal
+import socket
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.sqlite import JSON as SQLITE_JSON
+from sqlalchemy.orm import sessionmaker
+
+import app.api.server as server
+from app.core.assets import ASSET_CACHE, load_assets
+from app.core.compose import IMAGE_CACHE
+from app.db import models
+from app.db.base import Base
+
+
+def test_preload_warms_index_and_images(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    deck_dir = tmp_path / "lenormand" / "pre"
+    (deck_dir / "cards").mkdir(parents=True)
+    Image.new("RGB", (660, 1100), "white").save(deck_dir / "back.png")
+    for i in range(2):
+        Image.new("RGB", (660, 1100), "white").save(deck_dir / "cards" / f"{i}.png")
+    manifest = {
+        "deck_id": "pre",
+        "name": {"en": "Pre"},
+        "type": "lenormand",
+        "image": {"aspect_ratio": "3:5", "default_back": "back.png"},
+        "cards": [
+            {"key": f"k{i}", "display": {"en": "e"}, "file": f"{i}.png"}
+            for i in range(2)
+        ],
+    }
+    (deck_dir / "deck.json").write_text(json.dumps(manifest), encoding="utf-8")
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}", future=True)
+    models.JSONB = SQLITE_JSON  # type: ignore[attr-defined]
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, future=True)
+    with factory() as session:
+        load_assets(tmp_path, session)
+    ASSET_CACHE.clear()
+    IMAGE_CACHE.clear()
+    monkeypatch.setattr(server, "SessionLocal", factory)
+    monkeypatch.setattr(server, "engine", engine)
+
+    # Thumbs and medium fit the default edge, the 1100 px originals do not.
+    assert server.preload(tmp_path) == 4
+    assert ASSET_CACHE["pre"]["validated"] is True
+    assert len(IMAGE_CACHE) == 4
+    IMAGE_CACHE.clear()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def test_serve_forks_workers_and_stops(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(server, "preload", lambda: 0)
+    port = _free_port()
+    responses: list[int] = []
+
+    def probe() -> None:
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+                conn.request("GET", "/health")
+                responses.append(conn.getresponse().status)
+                break
+            except OSError:
+                time.sleep(0.2)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    previous = signal.getsignal(signal.SIGTERM)
+    thread = threading.Thread(target=probe)
+    thread.start()
+    try:
+        server.serve("127.0.0.1", port, 2)
+    finally:
+        thread.join()
+        gc.unfreeze()
+    assert responses == [200]
+    assert signal.getsignal(signal.SIGTERM) == previous
+
+
+def test_exit_reason_decodes_wait_status() -> None:
+    for code, reason in ((0, "exited with code 0"), (3, "exited with code 3")):
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - child
+            os._exit(code)
+        assert server._exit_reason(os.waitpid(pid, 0)[1]) == reason
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - child
+        signal.pause()
+        os._exit(0)
+    os.kill(pid, signal.SIGKILL)
+    assert server._exit_reason(os.waitpid(pid, 0)[1]) == "was killed by SIGKILL"
@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable
+
+import pytest
+
+import app.core.plugins as plugins
+from app.core.plugins.pipeline import PipelineResult, PipelineRunner
+from app.core.plugins.singleflight import RedisLock, SingleFlight
+from app.core.render import RenderExecutor
+
+
+class FakeRedis:
+    """In-memory subset of ``redis.asyncio.Redis`` used by ``RedisLock``.
+
+    Keys expire against ``now``, which only moves when a test advances it.
+    ``contended`` is set when a lock is refused and ``renewed`` on every
+    lock renewal, so tests can wait for either.
+    """
+
+    def __init__(self) -> None:
+        self.data: dict[str, tuple[Any, float | None]] = {}
+        self.now = 0.0
+        self.contended = asyncio.Event()
+        self.renewed = asyncio.Event()
+
+    def _live(self, key: str) -> Any:
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires <= self.now:
+            self.data.pop(key, None)
+            return None
+        return value
+
+    async def get(self, key: str) -> Any:
+        return self._live(key)
+
+    async def set(
+        self, key: str, value: Any, *, nx: bool = False, px: int | None = None
+    ) -> bool:
+        if nx and self._live(key) is not None:
+            self.contended.set()
+            return False
+        expires = self.now + px / 1000 if px else None
+        self.data[key] = (value, expires)
+        return True
+
+    async def eval(
+        self, script: str, numkeys: int, key: str, token: str, *args: Any
+    ) -> int:
+        if self._live(key) != token:
+            return 0
+        if "pexpire" in script:
+            self.renewed.set()
+            self.data[key] = (token, self.now + int(args[0]) / 1000)
+        else:
+            del self.data[key]
+        return 1
+
+
+def test_singleflight_shares_one_computation() -> None:
+    flight: SingleFlight[int] = SingleFlight()
+    calls: list[str] = []
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    def compute(key: str) -> Callable[[], Awaitable[int]]:
+        async def run() -> int:
+            calls.append(key)
+            if key == "b":
+                started.set()
+            await release.wait()
+            return ord(key)
+
+        return run
+
+    async def main() -> list[int]:
+        results = asyncio.gather(*(flight.do(key, compute(key)) for key in "aaab"))
+        # Every caller has joined once the last computation starts.
+        await started.wait()
+        release.set()
+        return await results
+
+    assert asyncio.run(main()) == [97, 97, 97, 98]
+    assert calls == ["a", "b"]
+    assert flight.coalesced == 2
+    assert len(flight) == 0
+
+
+def test_singleflight_raises_to_every_caller() -> None:
+    flight: SingleFlight[int] = SingleFlight()
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def fail() -> int:
+        started.set()
+        await release.wait()
+        raise ValueError("boom")
+
+    async def main() -> list[Any]:
+        errors = asyncio.gather(
+            *(flight.do("k", fail) for _ in range(3)), return_exceptions=True
+        )
+        await started.wait()
+        release.set()
+        return await errors
+
+    errors = asyncio.run(main())
+    assert [type(e) for e in errors] == [ValueError] * 3
+
+
+def test_singleflight_survives_cancelled_caller() -> None:
+    flight: SingleFlight[str] = SingleFlight()
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def compute() -> str:
+        started.set()
+        await release.wait()
+        return "done"
+
+    async def main() -> str:
+        first = asyncio.create_task(flight.do("k", compute))
+        second = asyncio.create_task(flight.do("k", compute))
+        await started.wait()
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        release.set()
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_redis_lock_coalesces_across_instances() -> None:
+    redis = FakeRedis()
+    workers = [
+        SingleFlight[int](RedisLock(redis, poll=0.005)),
+        SingleFlight[int](RedisLock(redis, poll=0.005)),
+    ]
+    calls = 0
+    release = asyncio.Event()
+
+    async def compute() -> int:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return 42
+
+    async def main() -> list[int]:
+        results = asyncio.gather(*(w.do("k", compute) for w in workers))
+        # The second worker polls once it finds the lock taken.
+        await redis.contended.wait()
+        release.set()
+        return await results
+
+    assert asyncio.run(main()) == [42, 42]
+    assert calls == 1
+    assert not any(key.startswith("singleflight:lock:") for key in redis.data)
+
+
+def test_redis_lock_released_on_failure() -> None:
+    redis = FakeRedis()
+    lock = RedisLock(redis, poll=0.005)
+
+    async def fail() -> int:
+        raise RuntimeError("boom")
+
+    async def ok() -> int:
+        return 7
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(lock.run("k", fail))
+    assert asyncio.run(lock.run("k", ok)) == 7
+
+
+def test_redis_lock_renewed_while_running() -> None:
+    redis = FakeRedis()
+    lock = RedisLock(redis, lock_ttl=0.03, poll=0.001)
+    leader = SingleFlight[int](lock)
+    waiter = SingleFlight[int](RedisLock(redis, lock_ttl=0.03, poll=0.001))
+    started = asyncio.Event()
+    release = asyncio.Event()
+    calls = 0
+
+    async def compute() -> int:
+        nonlocal calls
+        calls += 1
+        started.set()
+        await release.wait()
+        return 42
+
+    async def renewed() -> None:
+        redis.renewed.clear()
+        await redis.renewed.wait()
+
+    async def main() -> list[int]:
+        first = asyncio.create_task(leader.do("k", compute))
+        await started.wait()
+        # Ten lock lifetimes pass, each covered by a renewal.
+        for _ in range(10):
+            await renewed()
+            redis.now += 0.02
+        second = asyncio.create_task(waiter.do("k", compute))
+        await renewed()
+        release.set()
+        return [await first, await second]
+
+    assert asyncio.run(main()) == [42, 42]
+    assert calls == 1
+    # The result only outlives the waiters' next poll.
+    redis.now += lock.result_ttl
+    assert asyncio.run(redis.get("singleflight:result:k")) is None
+
+
+def test_redis_lock_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("SINGLEFLIGHT_REDIS_URL", raising=False)
+    assert RedisLock.from_env() is None
+    monkeypatch.setenv("SINGLEFLIGHT_REDIS_URL", "redis://localhost:6379/0")
+    assert isinstance(RedisLock.from_env(), RedisLock)
+
+
+def test_pipeline_coalesces_identical_runs(monkeypatch: pytest.MonkeyPatch) -> None:
+    composed: list[dict[str, Any]] = []
+    # Both distinct runs compose at once, so the duplicate joins in flight.
+    both = threading.Barrier(2, timeout=5)
+
+    def compose(data: dict[str, Any]) -> dict[str, Any]:
+        composed.append(data)
+        both.wait()
+        return {**data, "image": b"img"}
+
+    monkeypatch.setattr(
+        plugins,
+        "_registry",
+        {
+            "dummy": plugins.Plugin(
+                plugin_id="dummy",
+                cost=0,
+                products_supported=("basic",),
+                form_steps=lambda locale: [],
+                prepare=lambda data: data,
+                compose=compose,
+                write=lambda data: {**data, "text": "ok"},
+                verify=lambda data: True,
+                cta=lambda locale: [],
+            )
+        },
+    )
+    runner = PipelineRunner(RenderExecutor(workers=2, mode="thread"))
+
+    async def main() -> tuple[PipelineResult, PipelineResult, PipelineResult]:
+        return await asyncio.gather(
+            runner.run("dummy", {"user_id": 1}),
+            runner.run("dummy", {"user_id": 1}),
+            runner.run("dummy", {"user_id": 2}),
+        )
+
+    try:
+        first, second, other = asyncio.run(main())
+    finally:
+        runner.renderer.shutdown()
+        runner.shutdown()
+    assert first is second
+    assert other.data["user_id"] == 2
+    assert len(composed) == 2
+    assert runner.singleflight.coalesced == 1
+
+
+def test_pipeline_hashes_redis_keys(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        plugins,
+        "_registry",
+        {
+            "dummy": plugins.Plugin(
+                plugin_id="dummy",
+                cost=0,
+                products_supported=("basic",),
+                form_steps=lambda locale: [],
+                prepare=lambda data: data,
+                compose=lambda data: data,
+                write=lambda data: {"text": data["question"]},
+                verify=lambda data: True,
+                cta=lambda locale: [],
+            )
+        },
+    )
+    redis = FakeRedis()
+    runner = PipelineRunner(
+        RenderExecutor(workers=1, mode="thread"),
+        singleflight=SingleFlight(RedisLock(redis)),
+    )
+    question = "Will my secret plan work out? " * 20
+
+    async def main() -> list[PipelineResult]:
+        return [
+            await runner.run("dummy", {"user_id": 1, "question": q})
+            for q in (question, question, "Other?")
+        ]
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        runner.renderer.shutdown()
+        runner.shutdown()
+    assert [r.data["text"] for r in results] == [question, question, "Other?"]
+    # Results stay cached for result_ttl; one per distinct request.
+    assert len(redis.data) == 2
+    assert all("secret" not in key and len(key) < 80 for key in redis.data)
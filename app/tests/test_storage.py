@@ -70,3 +70,34 @@ def test_upload_pdf_from_html(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr("app.storage.HTML", DummyHTML)
     name = storage.upload_pdf_from_html("<p>hi</p>")
     assert name.endswith(".pdf")
+
+
+def test_download_returns_object_or_none() -> None:
+    from minio.error import S3Error
+
+    class Response:
+        def __init__(self, data: bytes) -> None:
+            self.data = data
+
+        def read(self) -> bytes:
+            return self.data
+
+        def close(self) -> None:
+            return None
+
+        def release_conn(self) -> None:
+            return None
+
+    class DownloadMinio(DummyMinio):
+        def get_object(self, bucket: str, object_name: str) -> Response:
+            if object_name not in self.objects:
+                raise S3Error(
+                    None, "NoSuchKey", "missing", object_name, None, None  # type: ignore[arg-type]
+                )
+            return Response(self.objects[object_name])
+
+    config = S3Config(endpoint="e", access_key="a", secret_key="s", bucket="b")
+    storage = S3Storage(config=config, client=DownloadMinio())  # type: ignore[arg-type]
+    storage.upload_image(b"img", "image/png", object_name="c.png")
+    assert storage.download("c.png") == b"img"
+    assert storage.download("missing.png") is None
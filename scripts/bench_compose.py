@@ -0,0 +1,133 @@
+"""Micro-benchmarks for the collage composer.
+
+Run with ``python scripts/bench_compose.py``.  A synthetic deck is generated
+in a temporary directory so the numbers do not depend on the bundled assets.
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+from typing import Callable
+
+from PIL import Image, ImageDraw
+
+from app.core.compose import IMAGE_CACHE, CardSpec, Layout, compose, save_image
+from app.core.compose.atlas import write_atlas
+
+CARD_SIZE = (600, 1000)
+CELTIC_CROSS = 10
+GRAND_TABLEAU = 36
+
+
+def _make_deck(root: Path, count: int) -> list[Path]:
+    paths = []
+    for i in range(count):
+        img = Image.new("RGB", CARD_SIZE, (i * 20 % 256, 90, 160))
+        ImageDraw.Draw(img).rectangle((40, 40, 560, 480), fill=(240, 220, 40))
+        path = root / f"{i:02d}.png"
+        img.save(path)
+        paths.append(path)
+    return paths
+
+
+def _timeit(fn: Callable[[], object], iterations: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def bench_reversed(paths: list[Path], iterations: int) -> None:
+    """Compare per-request rotation with cached reversed variants."""
+
+    reversed_flags = [i % 2 == 1 for i in range(len(paths))]
+    decoded = [IMAGE_CACHE.get(p) for p in paths]
+
+    def rotate_per_request() -> None:
+        specs = [
+            CardSpec(img, None, flag)
+            for img, flag in zip(decoded, reversed_flags, strict=True)
+        ]
+        compose(specs, Layout.ROW)
+
+    def cached_variants() -> None:
+        specs = [
+            CardSpec(p, None, flag)
+            for p, flag in zip(paths, reversed_flags, strict=True)
+        ]
+        compose(specs, Layout.ROW)
+
+    before = _timeit(rotate_per_request, iterations)
+    after = _timeit(cached_variants, iterations)
+    print(f"celtic cross, 5/10 reversed, {iterations} iterations")
+    print(f"  rotate per request: {before:8.2f} ms")
+    print(f"  cached variants:    {after:8.2f} ms")
+    print(f"  saving:             {before - after:8.2f} ms ({1 - after / before:.0%})")
+
+
+def bench_atlas(paths: list[Path], iterations: int) -> None:
+    """Compare decoding PNGs on a cold cache with memory-mapped atlas tiles."""
+
+    def load_all() -> None:
+        IMAGE_CACHE.clear()
+        for path in paths:
+            IMAGE_CACHE.get(path)
+
+    decode = _timeit(load_all, iterations)
+    write_atlas(paths[0].parent, [p.name for p in paths])
+    tiles = _timeit(load_all, iterations)
+    print(f"celtic cross, cold cache, {iterations} iterations")
+    print(f"  decode PNG: {decode:8.2f} ms")
+    print(f"  atlas tile: {tiles:8.2f} ms")
+
+
+def bench_save_image(iterations: int) -> None:
+    """Compare the linear quality loop with the search mode on a tableau."""
+
+    tile_size = (CARD_SIZE[0] // 3, CARD_SIZE[1] // 3)
+    tiles = [
+        Image.effect_noise(tile_size, 40 + i).convert("RGB")
+        for i in range(GRAND_TABLEAU)
+    ]
+    collage = compose([CardSpec(t, None, False) for t in tiles], Layout.GRAND_TABLEAU)
+    print(f"grand tableau {collage.width}x{collage.height}, {iterations} iterations")
+    for fmt in ("WEBP", "JPEG"):
+        # A limit that the linear loop only meets after several steps.
+        max_bytes = len(save_image(collage, fmt=fmt, quality=42, max_bytes=1 << 30))
+        results = {}
+        for mode in ("linear", "search"):
+            encode = partial(
+                save_image,
+                collage,
+                fmt=fmt,
+                max_bytes=max_bytes,
+                mode=mode,
+                hint=f"bench:{fmt}",
+            )
+            size = len(encode())
+            results[mode] = _timeit(encode, iterations)
+            print(f"  {fmt:4} {mode:6}: {results[mode]:8.2f} ms, {size} B")
+        saving = 1 - results["search"] / results["linear"]
+        print(f"  {fmt:4} saving: {saving:.0%} (limit {max_bytes} B)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--iterations", type=int, default=20)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        cards_dir = Path(tmp) / "cards"
+        cards_dir.mkdir()
+        paths = _make_deck(cards_dir, CELTIC_CROSS)
+        bench_reversed(paths, args.iterations)
+        bench_atlas(paths, args.iterations)
+    bench_save_image(max(args.iterations // 4, 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark of serial versus parallel asset ingest.
+
+Run with ``python scripts/bench_ingest.py``.  A synthetic 78 card tarot deck
+is generated in a temporary directory and ingested into an in-memory SQLite
+database, once per worker count.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.assets import load_assets
+from app.db.base import Base
+
+CARD_SIZE = (1200, 2000)
+TAROT_CARDS = 78
+
+
+def _make_deck(root: Path, count: int) -> None:
+    deck_dir = root / "tarot" / "bench"
+    cards_dir = deck_dir / "cards"
+    cards_dir.mkdir(parents=True)
+    Image.new("RGB", CARD_SIZE, (20, 20, 60)).save(deck_dir / "back.png")
+    cards = []
+    for i in range(count):
+        img = Image.new("RGB", CARD_SIZE, (i * 3 % 256, 90, 160))
+        ImageDraw.Draw(img).ellipse((100, 100, 1100, 1100), fill=(240, 220, 40))
+        img.save(cards_dir / f"{i:02d}.png")
+        cards.append(
+            {"key": f"c{i}", "display": {"en": str(i)}, "file": f"{i:02d}.png"}
+        )
+    manifest = {
+        "deck_id": "bench",
+        "name": {"en": "Bench"},
+        "type": "tarot",
+        "image": {"aspect_ratio": "3:5", "default_back": "back.png"},
+        "cards": cards,
+    }
+    (deck_dir / "deck.json").write_text(json.dumps(manifest), encoding="utf-8")
+
+
+def _ingest(root: Path, workers: int) -> float:
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine, future=True)() as session:
+        start = time.perf_counter()
+        load_assets(root, session, workers=workers)
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        _make_deck(root, TAROT_CARDS)
+        print(f"tarot deck, {TAROT_CARDS} cards at {CARD_SIZE[0]}x{CARD_SIZE[1]}")
+        serial = _ingest(root, 1)
+        print(f"  1 worker:   {serial:8.2f} s")
+        parallel = _ingest(root, args.workers)
+        print(f"  {args.workers} workers: {parallel:8.2f} s ({serial / parallel:.1f}x)")
+        engine = create_engine("sqlite:///:memory:", future=True)
+        Base.metadata.create_all(engine)
+        with sessionmaker(bind=engine, future=True)() as session:
+            load_assets(root, session, workers=args.workers)
+            start = time.perf_counter()
+            load_assets(root, session, workers=args.workers)
+            unchanged = time.perf_counter() - start
+        print(f"  unchanged:  {unchanged * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Micro-benchmark of the card ``prepare`` lookups.
+
+Run with ``python scripts/bench_prepare.py``.  Compares rebuilding the key
+pool and key-to-item map from the raw manifest on every request with the
+compiled :class:`~app.core.assets.DeckIndex`, for a tarot sized deck and a
+large synthetic one.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import date
+from typing import Any, Callable
+
+from app.core.assets import DeckIndex
+from app.core.draw import draw_unique
+
+SPREAD_SIZE = 10
+
+
+def _manifest(count: int) -> dict[str, Any]:
+    return {
+        "image": {"allow_reversed": True},
+        "cards": [
+            {
+                "key": f"card_{i}",
+                "file": f"{i}.png",
+                "display": {"en": f"Card {i}", "ru": f"Карта {i}"},
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def _timeit(fn: Callable[[int], object], iterations: int) -> float:
+    fn(0)
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def bench(count: int, iterations: int) -> None:
+    manifest = _manifest(count)
+    index = DeckIndex.from_manifest("bench", manifest, "cards")
+
+    def per_request(nonce: int) -> list[dict[str, Any]]:
+        cards_manifest = manifest["cards"]
+        pool = [c["key"] for c in cards_manifest]
+        allow_reversed = bool(manifest["image"].get("allow_reversed", False))
+        draw = draw_unique(
+            pool,
+            SPREAD_SIZE,
+            user_id=1,
+            expert="tarot",
+            spread_id="bench",
+            draw_date=date(2024, 1, 1),
+            nonce=nonce,
+            allow_reversed=allow_reversed,
+        )
+        by_key = {c["key"]: c for c in cards_manifest}
+        return [
+            {
+                "key": item.key,
+                "file": by_key[item.key]["file"],
+                "display": by_key[item.key]["display"],
+            }
+            for item in draw
+        ]
+
+    def compiled(nonce: int) -> list[dict[str, Any]]:
+        draw = draw_unique(
+            index.keys,
+            SPREAD_SIZE,
+            user_id=1,
+            expert="tarot",
+            spread_id="bench",
+            draw_date=date(2024, 1, 1),
+            nonce=nonce,
+            allow_reversed=index.allow_reversed,
+        )
+        out = []
+        for item in draw:
+            pos = index.positions[item.key]
+            out.append(
+                {
+                    "key": item.key,
+                    "file": index.files[pos],
+                    "display": index.display[pos],
+                }
+            )
+        return out
+
+    assert per_request(7) == compiled(7)
+    before = _timeit(per_request, iterations)
+    after = _timeit(compiled, iterations)
+    print(f"{count} cards, {SPREAD_SIZE} drawn, {iterations} iterations")
+    print(f"  per-request dicts: {before:8.2f} us")
+    print(f"  compiled index:    {after:8.2f} us ({1 - after / before:.0%} saved)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    for count in (78, 1000):
+        bench(count, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import asyncio
+import os
 from pathlib import Path
 
 from aiogram import Bot
@@ -25,7 +26,12 @@ def ingest_assets() -> None:
     if not assets_root.exists():
         return
     with SessionLocal() as session:
-        load_assets(assets_root, session)
+        load_assets(
+            assets_root,
+            session,
+            workers=int(os.environ.get("INGEST_WORKERS") or 0) or os.cpu_count() or 1,
+            atlas=os.environ.get("ASSET_ATLAS", "").lower() in {"1", "true", "yes"},
+        )
 
 
 async def register_webhook() -> None:
@@ -1,4 +1,7 @@
 #!/usr/bin/env bash
 set -e
 python scripts/prestart.py
+if [ "${SERVER_MODE:-uvicorn}" = "preload" ]; then
+    exec python -m app.api.server --host 0.0.0.0 --port 8000
+fi
 exec uvicorn app.api.main:app --host 0.0.0.0 --port 8000